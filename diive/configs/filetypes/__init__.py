@@ -2,11 +2,14 @@ import os
 import pathlib
 from pathlib import Path
 
+# Folder of the built-in filetypes
+FILETYPES_DIR = pathlib.Path(__file__).parent.resolve()
+
 
 def get_filetypes() -> dict:
     """Search files in path and store in dictionary as filename/filepath pairs"""
     filetypes = {}
-    path = pathlib.Path(__file__).parent.resolve()  # Search in this file's folder
+    path = FILETYPES_DIR  # Search in this file's folder
     for file in os.listdir(path):
         filepath = path / file
         if os.path.isfile(filepath):
@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 from pandas import Series
 
@@ -9,6 +11,17 @@ def validate_id_string(idstr: str):
     return idstr
 
 
+def validate_n_jobs(n_jobs: int) -> int:
+    """Number of parallel jobs for *n_jobs*, *-1* means all available CPUs
+
+    Raises:
+        ValueError: if *n_jobs* is not a positive integer or -1
+    """
+    if not isinstance(n_jobs, int) or (n_jobs < 1 and n_jobs != -1):
+        raise ValueError(f"n_jobs must be a positive integer or -1 for all available CPUs ({n_jobs} given).")
+    return os.cpu_count() if n_jobs == -1 else n_jobs
+
+
 def filter_strings_by_elements(list1: list[str], list2: list[str]) -> list[str]:
     """Returns a list of strings from list1 that contain all of the elements in list2.
 
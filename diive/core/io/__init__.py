@@ -1,3 +1,4 @@
 from . import dirs
+from . import filecache
 from . import filereader
 from . import files
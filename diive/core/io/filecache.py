@@ -0,0 +1,180 @@
+"""
+FILECACHE
+=========
+This package is part of the diive library.
+
+Persistent on-disk cache for data that were parsed from data files.
+
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame
+
+
+class ParsedFileCache:
+    """Cache parsed data files as Parquet files in a cache directory
+
+    Each cache entry is identified by the path of the source file and by the
+    state of the source file (size and modification time), the filetype
+    settings and the reading options. A cached entry is only returned if none
+    of these changed since the entry was stored, otherwise the file is parsed
+    again and the outdated entry is replaced.
+
+    The size of the cache directory is limited to *max_size_mb*. When this
+    limit is exceeded, the least recently used entries are removed first.
+
+    The cache can be shared by concurrent readers, e.g. in *MultiDataFileReader*
+    with *n_jobs*: entries are written to temporary files that are moved into
+    place when complete, and entries removed by another reader are skipped.
+    Failing to store an entry only gives a warning.
+
+    Example:
+        cache = ParsedFileCache(cachedir='diive_cache', max_size_mb=2000)
+        df, meta = ReadFileType(filepath=FILE, filetype='EDDYPRO-FLUXNET-30MIN', cache=cache).get_filedata()
+
+    """
+
+    def __init__(self, cachedir: str or Path, max_size_mb: float = 1000):
+        """
+        Args:
+            cachedir: Folder where cached data are stored, created if it does not exist
+            max_size_mb: Maximum total size of all cached files in MB
+        """
+        self.cachedir = Path(cachedir)
+        self.max_size_mb = max_size_mb
+        self.cachedir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, filepath: str or Path, filetypeconfig: dict, **readoptions) -> tuple[DataFrame, DataFrame] or None:
+        """Return cached data and metadata for *filepath*, or *None* if there is no valid entry"""
+        datafile, metafile = self._entry_paths(filepath=filepath, filetypeconfig=filetypeconfig, **readoptions)
+        if not (datafile.is_file() and metafile.is_file()):
+            return None
+        try:
+            data_df = pd.read_parquet(datafile)
+            with open(metafile, 'rb') as f:
+                meta = pickle.load(f)
+        except Exception:
+            # Broken entry, e.g. from an interrupted write
+            self._remove_entry(datafile=datafile)
+            return None
+        if meta['freq']:
+            data_df.index.freq = meta['freq']
+        # Mark as recently used, the entry might have been removed by another reader in the meantime
+        for f in [datafile, metafile]:
+            try:
+                os.utime(f)
+            except FileNotFoundError:
+                pass
+        return data_df, meta['metadata_df']
+
+    def put(self, filepath: str or Path, filetypeconfig: dict,
+            data_df: DataFrame, metadata_df: DataFrame, **readoptions):
+        """Store parsed data and metadata of *filepath* in the cache
+
+        If the data cannot be stored, e.g. because a column cannot be
+        converted to Parquet, a warning is shown and nothing is stored.
+        """
+        try:
+            datafile, metafile = self._entry_paths(filepath=filepath, filetypeconfig=filetypeconfig, **readoptions)
+            # Entries for previous versions of the file are outdated, entries with other options are kept
+            self._remove_outdated(datafile=datafile)
+            freq = data_df.index.freqstr if isinstance(data_df.index, pd.DatetimeIndex) else None
+            # Metadata first, an entry is only valid when its data file exists
+            self._write_atomic(targetfile=metafile,
+                               write=lambda f: pickle.dump({'metadata_df': metadata_df, 'freq': freq}, f))
+            self._write_atomic(targetfile=datafile, write=lambda f: data_df.to_parquet(f))
+            self._evict()
+        except Exception as e:
+            print(f"(!)WARNING Storing file {Path(filepath).name} in cache failed ({e}), "
+                  f"file is not cached.")
+
+    def _write_atomic(self, targetfile: Path, write):
+        """Write to temporary file and move it to *targetfile* when complete"""
+        fd, tmpfile = tempfile.mkstemp(dir=self.cachedir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmpfile, targetfile)
+        except BaseException:
+            os.unlink(tmpfile)
+            raise
+
+    def invalidate(self, filepath: str or Path = None):
+        """Remove cached entries of *filepath*, or all entries if *filepath* is *None*"""
+        pattern = f"{self._path_key(filepath)}_*" if filepath else "*_*"
+        for datafile in self.cachedir.glob(f"{pattern}.parquet"):
+            self._remove_entry(datafile=datafile)
+
+    def _remove_outdated(self, datafile: Path):
+        """Remove entries of the same source file that were stored for another state of the file"""
+        pathkey, statekey, _ = datafile.stem.split('_')
+        for f in self.cachedir.glob(f"{pathkey}_*.parquet"):
+            if f.stem.split('_')[1] != statekey:
+                self._remove_entry(datafile=f)
+
+    def clear(self):
+        """Remove all cached entries"""
+        self.invalidate(filepath=None)
+
+    @property
+    def size_mb(self) -> float:
+        """Total size of all cached files in MB"""
+        # Only complete entries, temporary files of entries that are being written are not counted
+        files = [*self.cachedir.glob('*_*.parquet'), *self.cachedir.glob('*_*.pickle')]
+        return sum(_file_size(f) for f in files) / 1024 ** 2
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits into *max_size_mb*"""
+        entries = []
+        for datafile in self.cachedir.glob('*_*.parquet'):
+            try:
+                stat = datafile.stat()
+            except FileNotFoundError:
+                # Removed by another reader
+                continue
+            size = stat.st_size + _file_size(datafile.with_suffix('.pickle'))
+            entries.append((stat.st_mtime, size, datafile))
+        total_size = sum(e[1] for e in entries)
+        max_size = self.max_size_mb * 1024 ** 2
+        for _, size, datafile in sorted(entries):
+            if total_size <= max_size:
+                break
+            self._remove_entry(datafile=datafile)
+            total_size -= size
+
+    def _entry_paths(self, filepath: str or Path, filetypeconfig: dict, **readoptions) -> tuple[Path, Path]:
+        # Name is <path>_<size-mtime>_<options>, the state of the file is part of the name to
+        # find outdated entries of the file, see *_remove_outdated*
+        stat = Path(filepath).stat()
+        options = json.dumps({'filetypeconfig': filetypeconfig,
+                              'readoptions': readoptions},
+                             sort_keys=True, default=str)
+        options_key = hashlib.sha1(options.encode('utf-8')).hexdigest()[:16]
+        name = f"{self._path_key(filepath)}_{stat.st_size}-{stat.st_mtime_ns}_{options_key}"
+        return self.cachedir / f"{name}.parquet", self.cachedir / f"{name}.pickle"
+
+    @staticmethod
+    def _path_key(filepath: str or Path) -> str:
+        return hashlib.sha1(str(Path(filepath).resolve()).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _remove_entry(datafile: Path):
+        for f in [datafile, datafile.with_suffix('.pickle')]:
+            try:
+                f.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _file_size(filepath: Path) -> int:
+    """Size of *filepath*, 0 if the file does not exist (anymore)"""
+    try:
+        return filepath.stat().st_size
+    except FileNotFoundError:
+        return 0
@@ -8,6 +8,8 @@ import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
+from diive.core.io.filereader import FILETYPES, ReadFileType
+
 pd.set_option('display.max_columns', 15)
 pd.set_option('display.width', 1000)
 
@@ -19,7 +21,8 @@ class FileDetector:
                  file_date_format: str,
                  file_generation_res: str,
                  data_res: float,
-                 files_how_many: int = None):
+                 files_how_many: int = None,
+                 filetype: str = None):
         """Create overview dataframe of available and missing (expected) files.
 
         Args:
@@ -29,6 +32,10 @@ class FileDetector:
             file_generation_res: Regular interval at which files were created, e.g. '6h' for every 6 hours
             data_res: Interval in seconds at which data are logged, e.g. 0.05
             files_how_many:
+            filetype: If given, the number of records in each file is estimated from
+                the start of the file and the file size, without reading the full file
+                (column 'estimated_records'), see *DataFileProbe*. Only files that are
+                left after restricting to *files_how_many* are opened.
         """
 
         # self.dir_input = indir
@@ -37,6 +44,9 @@ class FileDetector:
         self.file_generation_res = file_generation_res
         self.data_res = data_res
         self.files_how_many = files_how_many
+        self.filetypeconfig = None
+        if filetype:
+            self.filetypeconfig = FILETYPES.get_config(filetype=filetype)
 
         # Check if there are files listed in filelist
         if not self.filelist:
@@ -44,6 +54,7 @@ class FileDetector:
             sys.exit()
 
         self._files_overview_df = DataFrame()
+        self._found_files_df = None
 
     @property
     def files_overview_df(self) -> DataFrame:
@@ -63,21 +74,47 @@ class FileDetector:
         self._files_overview_df.loc[:, 'file_available'] = self.files_overview_df.loc[:, 'file_available'].fillna(0,
                                                                                                                   inplace=False)
         self._files_overview_df = self.restrict_numfiles()
+        if self.filetypeconfig:
+            self._files_overview_df = self.add_estimated_records()
 
     def restrict_numfiles(self):
-        # Consider file limit
+        # Consider file limit, keep files until the limit of available files is reached
         _files_overview_df = self.files_overview_df.copy()
 
         if self.files_how_many:
-            for idx, file in _files_overview_df.iterrows():
-                _restricted_df = _files_overview_df.loc[_files_overview_df.index[0]:idx]
-                num_available_files = _restricted_df['file_available'].sum()
-                if num_available_files >= self.files_how_many:
-                    _files_overview_df = _restricted_df.copy()
-                    break
+            num_available_files = _files_overview_df['file_available'].cumsum().to_numpy()
+            limit_reached = np.flatnonzero(num_available_files >= self.files_how_many)
+            if limit_reached.size > 0:
+                _files_overview_df = _files_overview_df.iloc[:limit_reached[0] + 1].copy()
 
         return _files_overview_df
 
+    @property
+    def found_files_df(self) -> DataFrame:
+        """Found files with their start time, detected once for all files"""
+        if self._found_files_df is None:
+            self._found_files_df = self._detect_found_files()
+        return self._found_files_df
+
+    def _detect_found_files(self) -> DataFrame:
+        """Get start time and file size of all found files
+
+        Start times are parsed from all file names at once, file sizes
+        are collected with one directory scan per folder.
+        """
+        filepaths = [f if isinstance(f, Path) else Path(f) for f in self.filelist]
+        filenames = [os.path.basename(f) for f in filepaths]
+        starts = pd.to_datetime(pd.Series(filenames), format=self.file_date_format).to_numpy()
+        found_df = DataFrame({'file_available': 1.0,
+                              'filename': filenames,
+                              'start': starts,
+                              'filepath': filepaths,
+                              'filesize': get_filesizes(filepaths=filepaths)},
+                             index=pd.DatetimeIndex(starts))
+        # Files with the same start time: the last file in the list is used
+        found_df = found_df.loc[~found_df.index.duplicated(keep='last')]
+        return found_df
+
     def add_expected(self):
         """Create index of expected files (regular start time) and check
         which of these regular files are available.
@@ -85,24 +122,14 @@ class FileDetector:
         :return: DataFrame with info about regular (expected) files
         :rtype: pandas DataFrame
         """
-        first_file_dt = dt.datetime.strptime(self.filelist[0].name, self.file_date_format)
-        last_file_dt = dt.datetime.strptime(self.filelist[-1].name, self.file_date_format)
+        found_df = self.found_files_df
+        first_file_dt = dt.datetime.strptime(Path(self.filelist[0]).name, self.file_date_format)
+        last_file_dt = dt.datetime.strptime(Path(self.filelist[-1]).name, self.file_date_format)
         expected_end_dt = last_file_dt + pd.Timedelta(self.file_generation_res)
         expected_index_dt = pd.date_range(first_file_dt, expected_end_dt, freq=self.file_generation_res)
-        files_df = pd.DataFrame(index=expected_index_dt)
-
-        for file_idx, filepath in enumerate(self.filelist):
-            filename = filepath.name
-            file_start_dt = dt.datetime.strptime(filename, self.file_date_format)
-
-            if file_start_dt in files_df.index:
-                files_df.loc[file_start_dt, 'file_available'] = 1
-                files_df.loc[file_start_dt, 'filename'] = filename
-                files_df.loc[file_start_dt, 'start'] = file_start_dt
-                files_df.loc[file_start_dt, 'filepath'] = filepath
-                files_df.loc[file_start_dt, 'filesize'] = Path(filepath).stat().st_size
-                # files_df.loc[file_start_dt, 'expected_file'] = file_start_dt
 
+        # Found files at expected start times, missing files are NaN
+        files_df = found_df.reindex(expected_index_dt)
         files_df.insert(0, 'expected_file', files_df.index)  # inplace
         return files_df
 
@@ -113,20 +140,29 @@ class FileDetector:
         :rtype: pandas DataFrame
         """
         files_df = self.files_overview_df.copy()
-        for file_idx, filepath in enumerate(self.filelist):
-            filename = filepath.name
-            file_start_dt = dt.datetime.strptime(filename, self.file_date_format)
-
-            if file_start_dt not in files_df.index:
-                files_df.loc[file_start_dt, 'file_available'] = 1
-                files_df.loc[file_start_dt, 'filename'] = filename
-                files_df.loc[file_start_dt, 'start'] = file_start_dt
-                files_df.loc[file_start_dt, 'filepath'] = filepath
-                files_df.loc[file_start_dt, 'filesize'] = Path(filepath).stat().st_size
-
+        found_df = self.found_files_df
+        unexpected_df = found_df.loc[~found_df.index.isin(files_df.index)]
+        if not unexpected_df.empty:
+            files_df = pd.concat([files_df, unexpected_df], axis=0)
         files_df = files_df.sort_index(inplace=False)
         return files_df
 
+    def add_estimated_records(self) -> DataFrame:
+        """Add estimated number of records of available files, other files are NaN"""
+        files_df = self.files_overview_df.copy()
+        files_df['estimated_records'] = [self._estimate_records(filepath=f) if available == 1 else None
+                                         for f, available in zip(files_df['filepath'], files_df['file_available'])]
+        return files_df
+
+    def _estimate_records(self, filepath: Path) -> int or None:
+        """Estimate number of records in file from the start of the file, *None* for unreadable files"""
+        datafilereader = ReadFileType(filepath=filepath, filetypeconfig=self.filetypeconfig,
+                                      read_data=False).get_datafilereader()
+        try:
+            return datafilereader.get_probe().estimated_records
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError, OSError):
+            return None
+
     def calc_expected_values(self):
         """Calculate expected end time, duration and records of files
 
@@ -143,6 +179,24 @@ class FileDetector:
         return files_df
 
 
+def get_filesizes(filepaths: list) -> list:
+    """Get sizes of files in bytes, with one directory scan for each folder
+
+    Scanning a folder returns the sizes of all files in the folder at once,
+    which is much faster than getting the size of each file separately in
+    folders with many files.
+    """
+    filepaths = [os.fspath(f) for f in filepaths]
+    sizes = {}
+    for folder in {os.path.dirname(f) for f in filepaths}:
+        with os.scandir(folder or '.') as entries:
+            for entry in entries:
+                if entry.is_file():
+                    sizes[os.path.join(folder, entry.name)] = entry.stat().st_size
+    # Files that were not found during the scan
+    return [sizes[f] if f in sizes else os.stat(f).st_size for f in filepaths]
+
+
 def read_segments_file(filepath):
     """
     Read file.
@@ -186,7 +240,7 @@ def read_segments_file(filepath):
 
 
 
-def add_data_stats(df, true_resolution, filename, found_records) -> DataFrame:
+def add_data_stats(df, true_resolution, filename, found_records, estimated_records: int = None) -> DataFrame:
     # Detect overall frequency
     cols = [
         'first_record',
@@ -195,6 +249,9 @@ def add_data_stats(df, true_resolution, filename, found_records) -> DataFrame:
         'found_records',
         'data_freq'
     ]
+    if estimated_records is not None:
+        # Estimated from the start of the file, see DataFileProbe
+        cols.append('estimated_records')
     filestats_df = DataFrame(columns=cols)
 
     data_duration = found_records * true_resolution
@@ -205,6 +262,8 @@ def add_data_stats(df, true_resolution, filename, found_records) -> DataFrame:
     filestats_df.loc[filename, 'file_duration'] = (df.index[-1] - df.index[0]).total_seconds()
     filestats_df.loc[filename, 'found_records'] = found_records
     filestats_df.loc[filename, 'data_freq'] = data_freq
+    if estimated_records is not None:
+        filestats_df.loc[filename, 'estimated_records'] = estimated_records
 
     return filestats_df
 
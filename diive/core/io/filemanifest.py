@@ -0,0 +1,147 @@
+"""
+FILEMANIFEST
+============
+This package is part of the diive library.
+
+Persistent record of files that were already processed.
+
+"""
+import fnmatch
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame
+
+
+class FileManifest:
+    """Keep track of processed files in an SQLite database
+
+    The manifest stores the path, size and modification time of each file
+    that was added. A scan of the search folders then returns only files
+    that are new or that changed since they were added, files that are
+    unchanged are skipped without being opened. This allows e.g. a daily
+    job to process only the newly arrived files of a large file archive.
+
+    Example:
+        manifest = FileManifest(manifestfile='processed_files.sqlite')
+        newfiles = search_files(searchdirs=SEARCHDIRS, pattern='*.csv', manifest=manifest)
+
+    """
+
+    def __init__(self, manifestfile: str or Path):
+        """
+        Args:
+            manifestfile: Path to the SQLite database file, created if it does not exist
+        """
+        self.manifestfile = Path(manifestfile)
+        self.manifestfile.parent.mkdir(parents=True, exist_ok=True)
+        # Stats of files found during the last scan
+        self._scanned = {}
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS files "
+                        "(filepath TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, added TEXT)")
+
+    def scan(self, searchdirs: str or list, pattern: str) -> list:
+        """Search files matching *pattern* and return files that are new or changed
+
+        Files are not added to the manifest, see *add*.
+        """
+        if isinstance(searchdirs, (str, Path)):
+            searchdirs = [searchdirs]
+        self._scanned = {}
+        foundfiles = []
+        for searchdir in searchdirs:
+            for entry in _walk_files(searchdir=searchdir):
+                if fnmatch.fnmatch(entry.name, pattern):
+                    stat = entry.stat()
+                    self._scanned[_key(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+                    foundfiles.append(entry.path)
+        return self.changed_files(filepaths=foundfiles)
+
+    def changed_files(self, filepaths: list) -> list:
+        """Return sorted files from *filepaths* that are new or changed since they were added"""
+        known = self._known_files()
+        changed = []
+        for filepath in filepaths:
+            key = _key(filepath)
+            if known.get(key) != self._get_stat(key):
+                changed.append(Path(filepath))
+        changed.sort()
+        return changed
+
+    def add(self, filepaths: list):
+        """Add files with their current size and modification time
+
+        Files that were found by the last *scan* are added with the
+        size and modification time they had during the scan.
+        """
+        added = pd.Timestamp.now().isoformat(timespec='seconds')
+        rows = []
+        for filepath in filepaths:
+            key = _key(filepath)
+            size, mtime_ns = self._get_stat(key)
+            rows.append((key, size, mtime_ns, added))
+        with self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows)
+
+    def remove(self, filepaths: list = None):
+        """Remove files from the manifest, or all files if *filepaths* is *None*"""
+        with self._connect() as con:
+            if filepaths is None:
+                con.execute("DELETE FROM files")
+            else:
+                con.executemany("DELETE FROM files WHERE filepath = ?",
+                                [(_key(f),) for f in filepaths])
+
+    @property
+    def files_df(self) -> DataFrame:
+        """Return all files in the manifest"""
+        with self._connect() as con:
+            return pd.read_sql_query("SELECT * FROM files ORDER BY filepath", con, index_col='filepath')
+
+    def __len__(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def _known_files(self) -> dict:
+        with self._connect() as con:
+            rows = con.execute("SELECT filepath, size, mtime_ns FROM files").fetchall()
+        return {filepath: (size, mtime_ns) for filepath, size, mtime_ns in rows}
+
+    def _get_stat(self, filepath: str) -> tuple[int, int]:
+        if filepath in self._scanned:
+            return self._scanned[filepath]
+        stat = os.stat(filepath)
+        return stat.st_size, stat.st_mtime_ns
+
+    @contextmanager
+    def _connect(self):
+        """Connection to the database, changes are committed when the connection is closed"""
+        con = sqlite3.connect(self.manifestfile)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+
+def _key(filepath: str or Path) -> str:
+    """Files are identified by their absolute path"""
+    return os.path.abspath(os.fspath(filepath))
+
+
+def _walk_files(searchdir: str or Path):
+    """Yield directory entries of all files in *searchdir* and its subfolders
+
+    Symbolic links to folders are not followed, same as in *os.walk*, they
+    could otherwise lead to endless recursion.
+    """
+    with os.scandir(searchdir) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(searchdir=entry.path)
+            elif entry.is_file():
+                yield entry
@@ -4,25 +4,59 @@ FILEREADER
 This package is part of the diive library.
 
 """
+import copy
 import datetime
 import fnmatch
+import gzip
+import io
 import os
+import queue
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 import pandas.errors
 import yaml
 from pandas import DataFrame
+from pandas.api.types import is_numeric_dtype
+from pandas.io.common import get_handle
 
 from diive import core
-from diive.configs.filetypes import get_filetypes
+from diive.configs.filetypes import FILETYPES_DIR
 from diive.core import dfun
-from diive.core.times.times import continuous_timestamp_freq, TimestampSanitizer
-
+from diive.core.funcs.funcs import validate_n_jobs
+from diive.core.io.filecache import ParsedFileCache
+from diive.core.io.filemanifest import FileManifest
+from diive.core.times.times import continuous_timestamp_freq, TimestampSanitizer, calc_true_resolution, \
+    create_timestamp, parse_timestamp_columns
+
+
+def search_files(searchdirs: str or list, pattern: str,
+                 manifest: FileManifest = None, update_manifest: bool = True) -> list:
+    """ Search files and store their filename and the path to the file in dictionary.
+
+    Args:
+        searchdirs: Folder or list of folders that are searched, including subfolders
+        pattern: Pattern of file names, e.g. '*.csv'
+        manifest: If given, only files that are new or changed since they were
+            added to the manifest are returned (incremental search).
+        update_manifest: If *True*, the returned files are added to *manifest*.
+            Use *False* to add files only after they were processed successfully
+            with *manifest.add*.
+    """
+    if manifest is not None:
+        foundfiles = manifest.scan(searchdirs=searchdirs, pattern=pattern)
+        if update_manifest:
+            manifest.add(filepaths=foundfiles)
+        return foundfiles
 
-def search_files(searchdirs: str or list, pattern: str) -> list:
-    """ Search files and store their filename and the path to the file in dictionary. """
     # found_files_dict = {}
     foundfiles = []
     if isinstance(searchdirs, str):
@@ -63,13 +97,125 @@ class ConfigFileReader:
         self.validation = validation
 
     def read(self) -> dict:
+        if self.validation == 'filetype':
+            # Parsed and validated only once, see FiletypeRegistry
+            return FILETYPES.load(filepath=self.configfilepath).as_dict()
         with open(self.configfilepath, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
-        if self.validation == 'filetype':
-            validate_filetype_config(config=config)
         return config
 
 
+@dataclass(frozen=True)
+class FiletypeConfig:
+    """Parsed and validated settings of one filetype
+
+    Attributes:
+        name: Name of the filetype, same as the name of the YAML file
+        filepath: Path to the YAML file
+        mtime_ns: Modification time of the YAML file when it was parsed
+        config: Validated settings, use *as_dict* to get a copy that can be changed
+    """
+    name: str
+    filepath: Path
+    mtime_ns: int
+    config: dict
+
+    def as_dict(self) -> dict:
+        """Return copy of the settings"""
+        return copy.deepcopy(self.config)
+
+
+class FiletypeRegistry:
+    """Registry of filetype settings, each YAML file is parsed and validated only once
+
+    Filetypes are searched in the folder of the built-in filetypes and in
+    folders added with *add_dir*. Folders are scanned once, the settings of a
+    filetype are parsed when the filetype is first used. Parsed settings are
+    kept until the YAML file is modified.
+
+    The registry of the process is available as *FILETYPES*.
+
+    Example:
+        FILETYPES.add_dir('my_filetypes')  # Contains e.g. MY-LOGGER-10MIN.yml
+        config = FILETYPES.get_config(filetype='MY-LOGGER-10MIN')
+        df, meta = ReadFileType(filepath=FILE, filetype='MY-LOGGER-10MIN').get_filedata()
+    """
+
+    def __init__(self):
+        self._dirs = [FILETYPES_DIR]
+        self._filepaths = None
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    def add_dir(self, folder: str or Path):
+        """Add folder with YAML files of custom filetypes
+
+        Custom filetypes replace built-in filetypes with the same name.
+        """
+        folder = Path(folder).resolve()
+        with self._lock:
+            if folder not in self._dirs:
+                self._dirs.append(folder)
+            if self._filepaths is not None:
+                self._filepaths.update(self._scan_dir(folder=folder))
+
+    @property
+    def filepaths(self) -> dict:
+        """Return names and paths of all available filetypes"""
+        with self._lock:
+            if self._filepaths is None:
+                self._filepaths = {}
+                for folder in self._dirs:
+                    self._filepaths.update(self._scan_dir(folder=folder))
+            return dict(self._filepaths)
+
+    def get(self, filetype: str) -> FiletypeConfig:
+        """Return parsed settings of *filetype*"""
+        filepaths = self.filepaths
+        if filetype not in filepaths:
+            # The filetype might have been added to one of the folders after they were scanned
+            self.refresh()
+            filepaths = self.filepaths
+        if filetype not in filepaths:
+            raise KeyError(f"Filetype {filetype} is not available, available filetypes: {sorted(filepaths)}")
+        return self.load(filepath=filepaths[filetype])
+
+    def get_config(self, filetype: str) -> dict:
+        """Return copy of the parsed settings of *filetype* as dict"""
+        return self.get(filetype=filetype).as_dict()
+
+    def load(self, filepath: str or Path) -> FiletypeConfig:
+        """Return parsed settings from YAML file, the file is parsed again only if it was modified"""
+        filepath = Path(filepath)
+        mtime_ns = filepath.stat().st_mtime_ns
+        parsed = self._parsed.get(filepath)
+        if parsed and parsed.mtime_ns == mtime_ns:
+            return parsed
+        with open(filepath, 'r', encoding='utf-8') as f:
+            config = validate_filetype_config(config=yaml.safe_load(f))
+        parsed = FiletypeConfig(name=filepath.stem, filepath=filepath, mtime_ns=mtime_ns, config=config)
+        with self._lock:
+            self._parsed[filepath] = parsed
+        return parsed
+
+    def refresh(self):
+        """Scan folders again on next access, e.g. after filetypes were added"""
+        with self._lock:
+            self._filepaths = None
+
+    def clear(self):
+        """Remove all parsed settings"""
+        with self._lock:
+            self._parsed = {}
+            self._filepaths = None
+
+    @staticmethod
+    def _scan_dir(folder: Path) -> dict:
+        with os.scandir(folder) as entries:
+            return {Path(e.name).stem: Path(e.path) for e in entries
+                    if e.is_file() and e.name.endswith(('.yml', '.yaml'))}
+
+
 def validate_filetype_config(config: dict):
     """Convert to required types"""
 
@@ -108,9 +254,21 @@ def validate_filetype_config(config: dict):
     config['DATA']['FREQUENCY'] = str(config['DATA']['FREQUENCY'])
     config['DATA']['DELIMITER'] = str(config['DATA']['DELIMITER'])
 
+    # Optional: columns that contain strings, e.g. { "filename": "drop" }, these
+    # columns are either dropped ("drop") or kept as categoricals ("category")
+    string_columns = config['DATA'].get('STRING_COLUMNS', None)
+    config['DATA']['STRING_COLUMNS'] = {str(k): str(v) for k, v in string_columns.items()} if string_columns else {}
+    for col, action in config['DATA']['STRING_COLUMNS'].items():
+        if action not in ['drop', 'category']:
+            raise Exception(f"STRING_COLUMNS: action for column {col} must be 'drop' or 'category' ('{action}' given)")
+
     return config
 
 
+# Filetype registry of this process
+FILETYPES = FiletypeRegistry()
+
+
 def _convert_timestamp_idx_col(var: int or list):
     """Convert to list of tuples if needed
 
@@ -212,21 +370,302 @@ class ColumnNamesSanitizer:
             self.df.columns = newcols
 
 
+def _read_datafile(filepath: Path,
+                   filetypeconfig: dict,
+                   output_middle_timestamp: bool,
+                   parsing_engine: str,
+                   cache: ParsedFileCache = None,
+                   usecols: list = None,
+                   dtype_policy: str = 'default') -> tuple[DataFrame, DataFrame] or None:
+    """Read one file for MultiDataFileReader, returns *None* for empty files
+
+    Defined on module level so it can be pickled and sent to worker processes.
+    """
+    try:
+        return ReadFileType(filepath=filepath, filetypeconfig=filetypeconfig,
+                            output_middle_timestamp=output_middle_timestamp,
+                            parsing_engine=parsing_engine, cache=cache,
+                            usecols=usecols, dtype_policy=dtype_policy).get_filedata()
+    except pandas.errors.EmptyDataError:
+        return None
+
+
+def decompress_datafile(filepath: str or Path,
+                        compression: str,
+                        member_pattern: str = '*') -> list[tuple[str, bytes]]:
+    """Decompress ZIP or GZIP file into memory
+
+    ZIP files can contain multiple members, e.g. several daily files, all
+    members that match *member_pattern* are decompressed, in archive order.
+
+    Args:
+        filepath: Compressed file
+        compression: Compression of the file, 'zip' or 'gzip'
+        member_pattern: Only ZIP members with matching filename are decompressed,
+            e.g. '*.csv'
+
+    Returns:
+        list of (member name, decompressed content)
+    """
+    filepath = Path(filepath)
+    if compression == 'zip':
+        with zipfile.ZipFile(filepath) as archive:
+            return [(info.filename, archive.read(info)) for info in _zip_members(archive, member_pattern)]
+    elif compression == 'gzip':
+        with gzip.open(filepath, 'rb') as f:
+            return [(filepath.stem, f.read())]
+    raise Exception(f"Decompression of files with compression {compression} is not supported.")
+
+
+def _zip_members(archive: zipfile.ZipFile, member_pattern: str = '*') -> list[zipfile.ZipInfo]:
+    """Members of ZIP *archive* that are decompressed, directories are skipped
+
+    Args:
+        archive: Opened ZIP file
+        member_pattern: Only members with matching filename are returned, e.g. '*.csv'
+
+    Returns:
+        list of members, in archive order
+    """
+    return [info for info in archive.infolist()
+            if not info.is_dir() and fnmatch.fnmatch(Path(info.filename).name, member_pattern)]
+
+
+def iter_decompressed(filepaths: list,
+                      compression: str,
+                      member_pattern: str = '*',
+                      prefetch: int = 2):
+    """Yield decompressed files while the next files are decompressed in the background
+
+    Files are decompressed by a background thread (see *decompress_datafile*)
+    and passed on through a queue that holds at most *prefetch* files. This way,
+    decompression of the next files overlaps with the processing of the current
+    file, while memory use is limited to *prefetch* decompressed files.
+
+    Args:
+        filepaths: Compressed files, yielded in this order
+        compression: Compression of the files, 'zip' or 'gzip'
+        member_pattern: Only ZIP members with matching filename are decompressed
+        prefetch: Maximum number of decompressed files that wait for processing
+
+    Yields:
+        tuple of filepath and list of (member name, decompressed content),
+        errors during decompression are raised when the file is yielded
+    """
+    buffer = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Waits until there is space in the buffer, gives up when the consumer stopped
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def decompress_all():
+        for filepath in filepaths:
+            try:
+                item = (filepath, decompress_datafile(filepath=filepath, compression=compression,
+                                                      member_pattern=member_pattern))
+            except Exception as e:
+                item = (filepath, e)
+            if not put(item):
+                return
+        put(None)
+
+    thread = threading.Thread(target=decompress_all, daemon=True)
+    thread.start()
+    try:
+        while (item := buffer.get()) is not None:
+            filepath, members = item
+            if isinstance(members, Exception):
+                raise members
+            yield filepath, members
+    finally:
+        stop.set()
+        thread.join()
+
+
+def merge_frames_first_valid(frames: list[DataFrame]) -> DataFrame:
+    """Merge frames in one pass, with the same result as chained *combine_first*
+
+    The result is the same as frames[0].combine_first(frames[1]).combine_first(frames[2])...
+    but avoids the quadratic cost of growing the merged frame file by file.
+    For each index and column, the first non-missing value across *frames*
+    (in list order) is kept.
+
+    Like *combine_first*, the union of indexes and columns is only sorted if
+    they differ between frames, otherwise the original order is kept. The
+    frequency of the index is not set, see *continuous_timestamp_freq*.
+    """
+    if len(frames) == 1:
+        return frames[0].copy()
+    same_index = all(f.index.equals(frames[0].index) for f in frames)
+    same_cols = all(f.columns.equals(frames[0].columns) for f in frames)
+    merged = pd.concat(frames, axis=0, sort=not same_cols)
+    # Records with missing timestamp (NaT) are kept, like in *combine_first*
+    merged = merged.groupby(level=0, sort=not same_index, dropna=False).first()
+    merged.index.name = frames[0].index.name
+    return merged
+
+
+FLAG_COLUMN_PATTERNS = ['*_TEST', 'qc_*', 'QC_*', 'FLAG_*']
+
+
+def compact_dtypes(df: DataFrame, flag_patterns: list = None, verbose: bool = True) -> DataFrame:
+    """Convert columns to data types that need less memory
+
+    - Flag columns (names matching *flag_patterns*) that contain only integer
+      values and no missing values are converted to the smallest integer type
+      that can hold all values, e.g. int8. Flag columns with missing values
+      are converted to float32.
+    - Other float64 columns are converted to float32. Columns with integer
+      values larger than 2**24 are kept as float64, because float32 cannot
+      represent them exactly (e.g. timestamps given as YYYYMMDDhhmm).
+    - Columns with strings are converted to categoricals.
+    - Other columns, e.g. integer measurements, are not changed.
+
+    float32 stores about 7 significant digits, which is enough for measured
+    variables but not for all derived results. Convert columns back to float64
+    with *astype* where more precision is needed.
+
+    Args:
+        df: Data with one variable per column, names can be tuples (e.g. with units)
+        flag_patterns: Name patterns of flag columns (fnmatch syntax, case-sensitive),
+            *FLAG_COLUMN_PATTERNS* if *None*
+        verbose: Print memory usage before and after the conversion
+
+    Returns:
+        copy of *df* with converted columns
+    """
+    flag_patterns = FLAG_COLUMN_PATTERNS if flag_patterns is None else flag_patterns
+    mem_before = df.memory_usage(deep=True).sum() if verbose else None
+    df = df.copy()
+    for ix, col in enumerate(df.columns):
+        series = df.iloc[:, ix]
+        name = str(col[0] if isinstance(col, tuple) else col)
+        is_flag = any(fnmatch.fnmatchcase(name, p) for p in flag_patterns)
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if is_numeric_dtype(series):
+            values = series.to_numpy()
+            finite = values[np.isfinite(values)] if values.dtype.kind == 'f' else values
+            is_integral = bool(np.all(np.mod(finite, 1) == 0)) if values.dtype.kind == 'f' else True
+            if is_flag and is_integral and len(finite) == len(values):
+                df.isetitem(ix, pd.to_numeric(series, downcast='integer'))
+            elif values.dtype == np.float64:
+                if is_integral and len(finite) and np.abs(finite).max() > 2 ** 24:
+                    continue
+                df.isetitem(ix, series.astype(np.float32))
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            df.isetitem(ix, series.astype('category'))
+    if verbose:
+        mem_after = df.memory_usage(deep=True).sum()
+        print(f"Memory usage of data: {mem_before / 1024 ** 2:.2f} MB before, "
+              f"{mem_after / 1024 ** 2:.2f} MB after converting to compact data types")
+    return df
+
+
+def detect_changed_ranges(old_df: DataFrame, new_df: DataFrame) -> list:
+    """Detect timestamp ranges in which *new_df* adds or changes values of *old_df*
+
+    A record is changed if *new_df* has a value that is missing in *old_df*
+    or that is different from the value in *old_df*. Missing values in
+    *new_df* are not changes. Only records of *new_df* are compared.
+
+    Returns:
+        list of (start, end) timestamps of consecutive changed records,
+        consecutive in the merged index of *old_df* and *new_df*
+    """
+    compared_df = old_df.reindex(index=new_df.index, columns=new_df.columns)
+    changed = np.zeros(len(new_df), dtype=bool)
+    for ix in range(len(new_df.columns)):
+        new = new_df.iloc[:, ix]
+        old = compared_df.iloc[:, ix]
+        if is_numeric_dtype(new) and is_numeric_dtype(old):
+            different = new.to_numpy() != old.to_numpy()
+        else:
+            different = new.astype(object).to_numpy() != old.astype(object).to_numpy()
+        changed |= new.notna().to_numpy() & (old.isna().to_numpy() | different)
+    if not changed.any():
+        return []
+
+    # Split changed records where unchanged records are between them
+    merged_index = old_df.index.union(new_df.index)
+    locs = np.sort(merged_index.get_indexer(new_df.index[changed]))
+    breaks = np.flatnonzero(np.diff(locs) > 1)
+    starts = np.concatenate([[locs[0]], locs[breaks + 1]])
+    ends = np.concatenate([locs[breaks], [locs[-1]]])
+    return [(merged_index[start], merged_index[end]) for start, end in zip(starts, ends)]
+
+
 class MultiDataFileReader:
     """Read and merge multiple datafiles of the same filetype"""
 
-    def __init__(self, filepaths: list, filetype: str, output_middle_timestamp: bool = True):
+    def __init__(self,
+                 filepaths: list,
+                 filetype: str,
+                 output_middle_timestamp: bool = True,
+                 parsing_engine: Literal['auto', 'c', 'python'] = 'auto',
+                 n_jobs: int = 1,
+                 pool: Literal['process', 'thread'] = 'process',
+                 cache: ParsedFileCache = None,
+                 usecols: list = None,
+                 prefetch: int = 0,
+                 dtype_policy: Literal['default', 'compact'] = 'default'):
+        """
+        Args:
+            filepaths: List of files that are read and merged
+            filetype: The diive internal filetype of the files as defined in diive/configs/filetypes
+            output_middle_timestamp: Convert the timestamp index to show middle of averaging period
+            parsing_engine: Parser engine used by pandas to read the files, see
+                *DataFileReader* for details.
+            n_jobs: Number of files that are parsed concurrently, a positive integer or *-1*.
+                With *1* files are read one after another, *-1* uses all available CPUs.
+            pool: Type of worker pool used when *n_jobs* is not 1. Worker processes
+                ('process') parse files truly in parallel, but must be started from
+                within an `if __name__ == '__main__':` block on Windows. Threads ('thread')
+                have less overhead, but parts of the parsing are limited by the GIL.
+            cache: If given, parsed files are stored in and loaded from this cache,
+                files that did not change since they were cached are not parsed again.
+            usecols: Names of the variables that are read from the files, other variables
+                are skipped by the parser, see *DataFileReader* for details.
+                All variables are read if *None*.
+            prefetch: Only used for compressed filetypes (ZIP or GZIP) when *n_jobs* is 1.
+                If larger than 0, files are decompressed in a background thread while
+                the previous file is parsed, up to *prefetch* files ahead, see
+                *iter_decompressed*. ZIP files with multiple members are supported,
+                each member is read as separate file. Members of multi-member ZIP
+                files are not cached.
+            dtype_policy: With 'compact', data of each file and the merged data are
+                converted to data types that need less memory, e.g. float32 instead of
+                float64, see *compact_dtypes*. With 'default', data types are not changed.
+        """
 
         # Getting configs for filetype
-        configfilepath = get_filetypes()[filetype]
-        self.filetypeconfig = ConfigFileReader(configfilepath=configfilepath, validation='filetype').read()
+        self.filetypeconfig = FILETYPES.get_config(filetype=filetype)
         self.filepaths = filepaths
         self.output_middle_timestamp = output_middle_timestamp
+        self.parsing_engine = parsing_engine
+        self.n_jobs = validate_n_jobs(n_jobs)
+        self.pool = pool
+        self.cache = cache
+        self.usecols = usecols
+        self.prefetch = prefetch
+        self.dtype_policy = dtype_policy
 
         # Collect data from all files listed in filepaths
         self._data_df, self._metadata_df = self._get_incoming_data()
 
-        self._data_df = continuous_timestamp_freq(data=self._data_df, freq=self.filetypeconfig['DATA']['FREQUENCY'])
+        if self._data_df is not None:
+            self._data_df = continuous_timestamp_freq(data=self._data_df,
+                                                      freq=self.filetypeconfig['DATA']['FREQUENCY'])
+            if self.dtype_policy == 'compact':
+                # Records or variables missing in some files were added as float64
+                self._data_df = compact_dtypes(df=self._data_df)
 
     @property
     def data_df(self):
@@ -242,35 +681,98 @@ class MultiDataFileReader:
             raise Exception('metadata is empty')
         return self._metadata_df
 
+    def merge_into(self, data_df: DataFrame) -> tuple[DataFrame, list]:
+        """Merge data of the files into existing merged data *data_df*
+
+        Only the files of this reader are parsed, *data_df* is not read again.
+        The same rule as in *merge_frames_first_valid* is used: values in
+        *data_df* are kept, values from the files only fill records and columns
+        that are missing in *data_df*. The result is therefore the same as
+        loading the previous files and the files of this reader together
+        (previous files first). The merged data have a continuous timestamp,
+        see *continuous_timestamp_freq*.
+
+        Args:
+            data_df: Existing merged data, e.g. *data_df* of a previous reader
+
+        Returns:
+            merged data and list of (start, end) timestamp ranges in which
+            values changed or were added, see *detect_changed_ranges*
+
+        Example:
+            new = MultiDataFileReader(filepaths=NEWFILES, filetype='EDDYPRO-FLUXNET-30MIN')
+            data_df, changed_ranges = new.merge_into(data_df=data_df)
+        """
+        if self._data_df is None:
+            return data_df, []
+        new_df = self._data_df
+        index = data_df.index.union(new_df.index)
+        same_cols = new_df.columns.isin(data_df.columns).all()
+        columns = data_df.columns if same_cols else data_df.columns.union(new_df.columns, sort=False)
+        merged_df = data_df.reindex(index=index, columns=columns)
+        merged_df = merged_df.fillna(new_df.reindex(index=index, columns=columns))
+        # Only values that were filled are changes, existing values are kept
+        changed_ranges = detect_changed_ranges(old_df=data_df,
+                                               new_df=merged_df.reindex(index=new_df.index, columns=new_df.columns))
+        # Restore data types of columns that were upcast by new records, e.g. integers to floats
+        for ix, col in enumerate(merged_df.columns):
+            dtype = data_df[col].dtype if col in data_df.columns else new_df[col].dtype
+            if merged_df[col].dtype != dtype and merged_df[col].notna().all():
+                merged_df.isetitem(ix, merged_df[col].astype(dtype))
+        if not same_cols:
+            merged_df = dfun.frames.sort_multiindex_columns_names(df=merged_df, priority_vars=None)
+        merged_df = continuous_timestamp_freq(data=merged_df, freq=self.filetypeconfig['DATA']['FREQUENCY'])
+        if self.dtype_policy == 'compact':
+            merged_df = compact_dtypes(df=merged_df)
+        return merged_df, changed_ranges
+
     def _get_incoming_data(self) -> tuple[DataFrame, DataFrame]:
         """Merge data across all files"""
-        data_df = None
-        metadata_df = None
-        for filepath in self.filepaths:
-            # print(f"\n{'-' * 40}\nReading file {filepath.stem}\n{'-' * 40}")
-            try:
-                incoming_data_df, incoming_metadata_df = \
-                    ReadFileType(filepath=filepath, filetypeconfig=self.filetypeconfig,
-                                 output_middle_timestamp=self.output_middle_timestamp).get_filedata()
-                data_df, metadata_df = \
-                    self._merge_with_existing(incoming_data_df=incoming_data_df, data_df=data_df,
-                                              incoming_metadata_df=incoming_metadata_df, metadata_df=metadata_df)
-            except pandas.errors.EmptyDataError:
-                continue
+        filedata = self._read_files()
+        filedata = [fd for fd in filedata if fd is not None]  # Skip empty files
+        if not filedata:
+            return None, None
+        data_df = merge_frames_first_valid(frames=[fd[0] for fd in filedata])
+        metadata_df = merge_frames_first_valid(frames=[fd[1] for fd in filedata])
         data_df = dfun.frames.sort_multiindex_columns_names(df=data_df, priority_vars=None)
         return data_df, metadata_df
 
-    def _merge_with_existing(self,
-                             incoming_data_df: DataFrame, data_df: DataFrame,
-                             incoming_metadata_df: DataFrame, metadata_df: DataFrame
-                             ) -> tuple[DataFrame, DataFrame]:
-        if not isinstance(data_df, DataFrame):
-            data_df = incoming_data_df.copy()
-            metadata_df = incoming_metadata_df.copy()
-        else:
-            data_df = data_df.combine_first(incoming_data_df)
-            metadata_df = metadata_df.combine_first(incoming_metadata_df)
-        return data_df, metadata_df
+    def _read_files(self) -> list:
+        """Read all files, concurrently if *n_jobs* is not 1, and keep the order of *filepaths*"""
+        if self.prefetch and self.n_jobs == 1 and self.filetypeconfig['FILE']['COMPRESSION'] in ['zip', 'gzip']:
+            return self._read_files_prefetched()
+        readfile = partial(_read_datafile,
+                           filetypeconfig=self.filetypeconfig,
+                           output_middle_timestamp=self.output_middle_timestamp,
+                           parsing_engine=self.parsing_engine,
+                           cache=self.cache,
+                           usecols=self.usecols,
+                           dtype_policy=self.dtype_policy)
+        if self.n_jobs == 1 or len(self.filepaths) < 2:
+            return [readfile(filepath) for filepath in self.filepaths]
+        executor = ProcessPoolExecutor if self.pool == 'process' else ThreadPoolExecutor
+        with executor(max_workers=self.n_jobs) as ex:
+            return list(ex.map(readfile, self.filepaths))
+
+    def _read_files_prefetched(self) -> list:
+        """Read compressed files one after another while the next files are decompressed"""
+        filedata = []
+        for filepath, members in iter_decompressed(filepaths=self.filepaths,
+                                                   compression=self.filetypeconfig['FILE']['COMPRESSION'],
+                                                   member_pattern=self.filetypeconfig['FILE']['EXTENSION'],
+                                                   prefetch=self.prefetch):
+            # Cache entries are per file, members of multi-member archives are not cached
+            cache = self.cache if len(members) == 1 else None
+            for _, filebuffer in members:
+                try:
+                    filedata.append(ReadFileType(filepath=filepath, filetypeconfig=self.filetypeconfig,
+                                                 output_middle_timestamp=self.output_middle_timestamp,
+                                                 parsing_engine=self.parsing_engine, cache=cache,
+                                                 usecols=self.usecols, filebuffer=filebuffer,
+                                                 dtype_policy=self.dtype_policy).get_filedata())
+                except pandas.errors.EmptyDataError:
+                    filedata.append(None)
+        return filedata
 
 
 class ReadFileType:
@@ -281,35 +783,94 @@ class ReadFileType:
                  filetypeconfig: dict = None,
                  filetype: str = None,
                  data_nrows: int = None,
-                 output_middle_timestamp: bool = True):
+                 output_middle_timestamp: bool = True,
+                 parsing_engine: Literal['auto', 'c', 'python'] = 'auto',
+                 cache: ParsedFileCache = None,
+                 read_data: bool = True,
+                 usecols: list = None,
+                 filebuffer: bytes = None,
+                 dtype_policy: Literal['default', 'compact'] = 'default'):
         """
 
         Args:
             filepath:
             filetypeconfig:
             filetype:
+            parsing_engine: Parser engine used by pandas to read the file, see
+                *DataFileReader* for details.
+            cache: If given, the parsed file is loaded from this cache if the file and
+                the filetype settings did not change since the file was cached.
+                Otherwise, the file is parsed and the result is stored in the cache.
+            read_data: If *False*, the file is not read when the class is created. The
+                file can then be read in parts with *iter_chunks* or *iter_segments*.
+            usecols: Names of the variables that are read from the file, see
+                *DataFileReader* for details. All variables are read if *None*.
+            filebuffer: Decompressed content of *filepath*, see *DataFileReader*.
+            dtype_policy: With 'compact', the data are converted to data types that need
+                less memory after reading: float32 for measured variables, small integers
+                for flags and categoricals for strings, see *compact_dtypes*. Memory usage
+                before and after the conversion is printed. Cached data are stored with
+                the original data types. With 'default', data types are not changed.
         """
         self.filepath = Path(filepath)
         self.data_nrows = data_nrows
         self.output_middle_timestamp = output_middle_timestamp
+        self.parsing_engine = parsing_engine
+        self.cache = cache
+        self.usecols = usecols
+        self.filebuffer = filebuffer
+        self.dtype_policy = dtype_policy
 
         if filetype:
             # Read settins for specified filetype
-            _available_filetypes = get_filetypes()
-            self.filetypeconfig = ConfigFileReader(_available_filetypes[filetype], validation='filetype').read()
+            self.filetypeconfig = FILETYPES.get_config(filetype=filetype)
         else:
             # Use provided settings dict
             self.filetypeconfig = filetypeconfig
 
-        self.data_df, self.metadata_df = self._readfile()
+        self.data_df = None
+        self.metadata_df = None
+        if read_data:
+            self.data_df, self.metadata_df = self._readfile()
+            if self.dtype_policy == 'compact':
+                self.data_df = compact_dtypes(df=self.data_df)
 
     def get_filedata(self) -> tuple[DataFrame, DataFrame]:
         return self.data_df, self.metadata_df
 
+    def iter_chunks(self, rows: int = 100000):
+        """Read file in chunks of *rows* records, see *DataFileReader.iter_chunks*"""
+        return self.get_datafilereader(read_data=False).iter_chunks(rows=rows)
+
+    def iter_segments(self, duration: str, rows: int = 100000, **timestamp_kwargs):
+        """Read file in segments of *duration*, see *DataFileReader.iter_segments*"""
+        return self.get_datafilereader(read_data=False).iter_segments(duration=duration, rows=rows,
+                                                                       **timestamp_kwargs)
+
     def _readfile(self) -> tuple[DataFrame, DataFrame]:
-        """Load data"""
+        """Load data, from cache if available"""
+        if not self.cache:
+            return self._parsefile()
+        readoptions = dict(data_nrows=self.data_nrows, output_middle_timestamp=self.output_middle_timestamp)
+        if self.usecols:
+            readoptions['usecols'] = sorted(self.usecols)
+        cached = self.cache.get(filepath=self.filepath, filetypeconfig=self.filetypeconfig, **readoptions)
+        if cached:
+            print(f"Reading file {self.filepath.name} from cache ...")
+            return cached
+        data_df, metadata_df = self._parsefile()
+        self.cache.put(filepath=self.filepath, filetypeconfig=self.filetypeconfig,
+                       data_df=data_df, metadata_df=metadata_df, **readoptions)
+        return data_df, metadata_df
+
+    def _parsefile(self) -> tuple[DataFrame, DataFrame]:
+        """Parse data file"""
         print(f"Reading file {self.filepath.name} ...")
-        datafilereader = DataFileReader(
+        return self.get_datafilereader(read_data=True).get_data()
+
+    def get_datafilereader(self, read_data: bool = False) -> 'DataFileReader':
+        """Create *DataFileReader* with the settings of the filetype, reads file if *read_data* is *True*"""
+        return DataFileReader(
             filepath=self.filepath,
             data_skiprows=self.filetypeconfig['DATA']['SKIP_ROWS'],
             data_headerrows=self.filetypeconfig['DATA']['HEADER_ROWS'],
@@ -318,14 +879,140 @@ class ReadFileType:
             data_delimiter=self.filetypeconfig['DATA']['DELIMITER'],
             data_freq=self.filetypeconfig['DATA']['FREQUENCY'],
             data_nrows=self.data_nrows,
+            data_string_cols=self.filetypeconfig['DATA'].get('STRING_COLUMNS', None),
             timestamp_idx_col=self.filetypeconfig['TIMESTAMP']['INDEX_COLUMN'],
             timestamp_datetime_format=self.filetypeconfig['TIMESTAMP']['DATETIME_FORMAT'],
             timestamp_start_middle_end=self.filetypeconfig['TIMESTAMP']['SHOWS_START_MIDDLE_OR_END_OF_RECORD'],
             output_middle_timestamp=self.output_middle_timestamp,
-            compression=self.filetypeconfig['FILE']['COMPRESSION']
+            compression=self.filetypeconfig['FILE']['COMPRESSION'],
+            parsing_engine=self.parsing_engine,
+            usecols=self.usecols,
+            filebuffer=self.filebuffer,
+            read_data=read_data
         )
-        data_df, metadata_df = datafilereader.get_data()
-        return data_df, metadata_df
+
+
+class DataFileProbe:
+    """Probe header, number of columns and number of records of a data file
+
+    Only the first *probe_kb* kilobytes of the file are read (more if the header
+    section is longer), the full file is not scanned. The header and the first
+    data row are parsed the same way as in *DataFileReader*.
+
+    The number of records is estimated from the size of the (uncompressed) file
+    and the mean size of the data rows in the probed part. If the whole file fits
+    into the probed part, the number of records is exact, see *complete*.
+
+    Attributes:
+        header_cols: List of column names, tuples of (variable, units) for two header rows
+        units: List of units from the second header row, *None* for one header row
+        num_header_cols: Number of columns in the header
+        num_data_cols: Number of columns in the first data row
+        header_bytes: Size of the header section in bytes
+        uncompressed_size: Size of the file content in bytes, *None* if unknown
+        estimated_records: Estimated number of data records, *None* if unknown
+        complete: *True* if the probed part contains the whole file
+
+    Example:
+        probe = DataFileProbe(filepath=FILE, data_skiprows=[], data_headerrows=[0, 1], compression='zip')
+        print(probe.num_data_cols, probe.estimated_records)
+    """
+
+    def __init__(self,
+                 filepath: Path,
+                 data_skiprows: list,
+                 data_headerrows: list,
+                 compression: str = None,
+                 filebuffer: bytes = None,
+                 probe_kb: int = 64):
+        """
+        Args:
+            filepath: Data file
+            data_skiprows: Rows that are skipped before the header rows
+            data_headerrows: Rows of the header
+            compression: Compression of the file, e.g. 'zip' or 'gzip'
+            filebuffer: Decompressed content of the file, read instead of *filepath*
+            probe_kb: Number of kilobytes that are read from the start of the file
+        """
+        self.filepath = Path(filepath)
+        self.data_skiprows = data_skiprows
+        self.data_headerrows = data_headerrows
+        self.compression = compression if filebuffer is None else None
+        self.filebuffer = filebuffer
+        self.probe_bytes = probe_kb * 1024
+
+        self.complete = False
+        content = self._read_start()
+
+        # Header and first data row, parsed from the probed part only
+        self.num_header_cols, self.header_cols = dfun.frames.get_len_header(filepath=io.BytesIO(content),
+                                                                            skiprows=self.data_skiprows,
+                                                                            headerrows=self.data_headerrows)
+        self.num_data_cols = dfun.frames.get_len_data(filepath=io.BytesIO(content),
+                                                      skiprows=self.data_skiprows,
+                                                      headerrows=self.data_headerrows)
+        self.units = [col[1] for col in self.header_cols] if len(self.data_headerrows) == 2 else None
+
+        num_header_lines = len(self.data_skiprows) + len(self.data_headerrows)
+        self.header_bytes = len(b''.join(content.splitlines(keepends=True)[:num_header_lines]))
+        self.uncompressed_size = len(content) if self.complete else self._uncompressed_size()
+        self.estimated_records = self._estimate_records(content=content, num_header_lines=num_header_lines)
+
+    def _read_start(self) -> bytes:
+        """Read complete lines from the start of the file, at least the header section and one data row"""
+        num_lines_needed = len(self.data_skiprows) + len(self.data_headerrows) + 1
+        content = b''
+        with self._open() as handle:
+            while True:
+                block = handle.read(self.probe_bytes)
+                content += block
+                if len(block) < self.probe_bytes:
+                    self.complete = True
+                    return content
+                if content.count(b'\n') >= num_lines_needed:
+                    # Incomplete last line is not used
+                    return content[:content.rfind(b'\n') + 1]
+
+    @contextmanager
+    def _open(self):
+        """Open file content for reading, for ZIP files the member that is read (see *decompress_datafile*)"""
+        if self.compression == 'zip':
+            with zipfile.ZipFile(self.filepath) as archive, archive.open(self._zip_member(archive)) as handle:
+                yield handle
+            return
+        source = self.filepath if self.filebuffer is None else io.BytesIO(self.filebuffer)
+        with get_handle(source, 'rb', compression=self.compression, is_text=False) as handles:
+            yield handles.handle
+
+    def _zip_member(self, archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+        members = _zip_members(archive)
+        if not members:
+            raise ValueError(f"Zero files found in ZIP file {self.filepath}")
+        return members[0]
+
+    def _uncompressed_size(self) -> int or None:
+        if self.filebuffer is not None:
+            return len(self.filebuffer)
+        if self.compression in [None, 'None']:
+            return self.filepath.stat().st_size
+        if self.compression == 'zip':
+            with zipfile.ZipFile(self.filepath) as archive:
+                return self._zip_member(archive).file_size
+        if self.compression == 'gzip':
+            # Size of uncompressed data is stored in the last 4 bytes (modulo 2^32)
+            with open(self.filepath, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                return int.from_bytes(f.read(4), 'little')
+        return None
+
+    def _estimate_records(self, content: bytes, num_header_lines: int) -> int or None:
+        num_data_lines = len(content.splitlines()) - num_header_lines
+        if self.complete:
+            return max(num_data_lines, 0)
+        if not self.uncompressed_size or num_data_lines < 1:
+            return None
+        bytes_per_record = (len(content) - self.header_bytes) / num_data_lines
+        return int(round((self.uncompressed_size - self.header_bytes) / bytes_per_record))
 
 
 class DataFileReader:
@@ -341,12 +1028,42 @@ class DataFileReader:
             data_delimiter: str = None,
             data_freq: str = None,
             data_nrows: int = None,
+            data_string_cols: dict = None,
             timestamp_idx_col: list = None,
             timestamp_datetime_format: str = None,
             timestamp_start_middle_end: str = 'END',
             output_middle_timestamp: bool = True,
-            compression: str = None
+            compression: str = None,
+            parsing_engine: Literal['auto', 'c', 'python'] = 'auto',
+            usecols: list = None,
+            filebuffer: bytes = None,
+            read_data: bool = True
     ):
+        """
+        Args:
+            data_string_cols: Columns that contain strings and the action for each of them,
+                e.g. {'filename': 'drop', 'date': 'category'}. Columns with action 'drop'
+                are not parsed, columns with action 'category' are parsed
+                as categoricals and are not converted to numeric. All other columns that
+                are not numeric are converted to numeric, strings become missing values.
+            parsing_engine: Parser engine used by pandas to read the file.
+                - 'auto': use the fast C engine whenever the delimiter of the
+                    filetype allows it, fall back to the python engine if the C
+                    engine fails to parse the file.
+                - 'c': use the C engine only.
+                - 'python': use the (slow) python engine only.
+            usecols: Names of the variables that are read from the file, e.g.
+                ['FC', 'LE']. Names refer to the first header row. Columns that are
+                not listed are skipped by the parser and never loaded into memory.
+                Timestamp columns are always read. Variables that are not in the
+                file are ignored. All variables are read if *None*.
+            filebuffer: Content of the file, already decompressed, e.g. from
+                *decompress_datafile*. If given, data are read from this buffer
+                instead of *filepath*, *compression* is then ignored.
+            read_data: If *False*, the file is not read when the class is created. This
+                is useful for large files that are read in parts with *iter_chunks* or
+                *iter_segments*, which keeps memory usage constant.
+        """
 
         self.filepath = filepath
         self.data_skiprows = data_skiprows
@@ -356,28 +1073,164 @@ class DataFileReader:
         self.data_delimiter = data_delimiter
         self.data_freq = data_freq
         self.data_nrows = data_nrows
+        self.data_string_cols = data_string_cols if data_string_cols else {}
         self.timestamp_datetime_format = timestamp_datetime_format
         self.timestamp_start_middle_end = timestamp_start_middle_end
         self.timestamp_idx_col = timestamp_idx_col
         self.output_middle_timestamp = output_middle_timestamp
-        self.compression = compression
+        self.compression = compression if filebuffer is None else None
+        self.parsing_engine = parsing_engine
+        self.usecols = usecols
+        self.filebuffer = filebuffer
 
         self.data_df = pd.DataFrame()
         self.metadata_df = pd.DataFrame()
         self.generated_missing_header_cols_list = []
+        self.true_resolution = None
+        self._probe = None
 
-        self._read()
+        if read_data:
+            self._read()
 
     def _read(self):
         headercols_list, self.generated_missing_header_cols_list = self._compare_len_header_vs_data()
         self.data_df = self._parse_file(headercols_list=headercols_list)
+        self._process_parsed_data()
+
+    def iter_chunks(self, rows: int = 100000):
+        """Read file in chunks of *rows* data records
+
+        Each chunk is processed the same way as when the full file is read,
+        but only one chunk is kept in memory at a time. For files without
+        timestamp the chunks keep a continuous record number index across
+        chunks, i.e. the second chunk starts with record number *rows*.
+
+        Chunks are parsed with the first engine from *_get_parsing_engines*,
+        the fallback to the next engine is not available for chunks.
+
+        For files with timestamp, the time resolution is detected once from the
+        first chunk and used for all following chunks. Each chunk is regularized
+        to this time resolution, and missing records between the last record of
+        the previous chunk and the first record of the current chunk are added
+        at the start of the current chunk, so that the chunks together have a
+        continuous timestamp. Records are sorted and duplicates removed only
+        within each chunk, not across chunks.
+
+        Args:
+            rows: Number of data records per chunk
+
+        Yields:
+            DataFrame with data of the current chunk
+        """
+        headercols_list, self.generated_missing_header_cols_list = self._compare_len_header_vs_data()
+        freq = None
+        last_timestamp = None
+        for chunk_df in self._parse_file(headercols_list=headercols_list, chunksize=rows):
+            self.data_df = chunk_df
+            self._process_parsed_data(freq=freq)
+            if self.timestamp_idx_col:
+                freq = self.data_df.index.freq
+                if last_timestamp is not None and self.data_df.index[0] > last_timestamp + freq:
+                    # Fill gap between chunks
+                    index = pd.date_range(start=last_timestamp + freq, end=self.data_df.index[-1],
+                                          freq=freq, name=self.data_df.index.name)
+                    self.data_df = self.data_df.reindex(index)
+                last_timestamp = self.data_df.index[-1]
+            yield self.data_df
+
+    def iter_segments(self,
+                      duration: str,
+                      rows: int = 100000,
+                      file_start: str = None,
+                      data_nominal_res: float = None,
+                      expected_duration: int = None):
+        """Read file in time segments of *duration*, e.g. 30-minute segments of 20 Hz data
+
+        The file is read in chunks (see *iter_chunks*), segments are yielded as soon
+        as they are complete. Segments are binned the same way as with
+        *pd.Grouper(freq=duration)*, i.e. starting at midnight of the first day.
+
+        For files without timestamp, the timestamp of each record is created from
+        *file_start* and the true resolution of the data, see *create_timestamp*. The
+        number of records that is needed for the true resolution is counted from the
+        lines in the file before reading, the true resolution is then available
+        as *true_resolution*.
+
+        Args:
+            duration: Duration of one segment, accepts pandas frequency strings, e.g. '30min'
+            rows: Number of data records that are read at once
+            file_start: Start time of the file, only needed for files without timestamp
+            data_nominal_res: Nominal time resolution of the data in seconds, only needed
+                for files without timestamp, e.g. 0.05 for 20 Hz data
+            expected_duration: Expected duration of the file in seconds, only needed
+                for files without timestamp
+
+        Yields:
+            DataFrame with data of the current segment
+        """
+        if not self.timestamp_idx_col:
+            if file_start is None or data_nominal_res is None or expected_duration is None:
+                raise Exception("File has no timestamp: *file_start*, *data_nominal_res* and "
+                                "*expected_duration* are needed to create the timestamp.")
+            expected_records = int(expected_duration / data_nominal_res)
+            self.true_resolution = calc_true_resolution(num_records=self.count_records(),
+                                                        data_nominal_res=data_nominal_res,
+                                                        expected_records=expected_records,
+                                                        expected_duration=expected_duration)
+
+        duration = pd.to_timedelta(duration)
+        origin = None
+        carry_df = None
+        for chunk_df in self.iter_chunks(rows=rows):
+            if not self.timestamp_idx_col:
+                chunk_df, _ = create_timestamp(df=chunk_df, file_start=file_start,
+                                               data_nominal_res=data_nominal_res,
+                                               expected_duration=expected_duration,
+                                               true_resolution=self.true_resolution)
+            if carry_df is not None:
+                chunk_df = pd.concat([carry_df, chunk_df], axis=0)
+            if origin is None:
+                origin = chunk_df.index[0].normalize()
+            segment_keys = (chunk_df.index - origin) // duration
+            # The last segment in the chunk can continue in the next chunk
+            is_last = segment_keys == segment_keys[-1]
+            carry_df = chunk_df[is_last]
+            for _, segment_df in chunk_df[~is_last].groupby(segment_keys[~is_last]):
+                yield segment_df
+        if carry_df is not None and not carry_df.empty:
+            yield carry_df
+
+    def count_records(self) -> int:
+        """Count data records in the file without parsing it, reads the file in blocks"""
+        n_lines = 0
+        last_block = b''
+        with get_handle(self._source(), 'rb', compression=self.compression, is_text=False) as handles:
+            for block in iter(lambda: handles.handle.read(1024 * 1024), b''):
+                n_lines += block.count(b'\n')
+                last_block = block
+        if last_block and not last_block.endswith(b'\n'):
+            n_lines += 1  # Last line without line break
+        n_records = n_lines - len(self.data_headersection_rows)
+        if self.data_nrows:
+            n_records = min(n_records, self.data_nrows)
+        return n_records
+
+    def _process_parsed_data(self, freq=None):
+        """Timestamp, clean and name parsed data in *data_df*, create metadata
+
+        Args:
+            freq: Time resolution of the timestamp, detected from the timestamp if *None*
+        """
         if self.timestamp_idx_col:
             self.data_df = TimestampSanitizer(data=self.data_df,
-                                              output_middle_timestamp=self.output_middle_timestamp).get()
+                                              output_middle_timestamp=self.output_middle_timestamp,
+                                              nominal_freq=freq,
+                                              inplace=True).get()
         self._clean_data()
         if len(self.data_headerrows) == 1:
             self.data_df = self._add_second_header_row(df=self.data_df)
-        self.metadata_df = self._get_metadata()
+        if self.metadata_df.empty:
+            self.metadata_df = self._get_metadata()
         self.data_df = dfun.frames.flatten_multiindex_all_df_cols(df=self.data_df, keep_first_row_only=True)
 
         self.data_df = ColumnNamesSanitizer(df=self.data_df).get()
@@ -427,6 +1280,20 @@ class DataFileReader:
         df.columns = [df.columns, lst_for_empty_units]  ## conv column index to multiindex
         return df
 
+    def get_probe(self) -> DataFileProbe:
+        """Header, number of columns and estimated number of records, from the start of the file"""
+        if not self._probe:
+            self._probe = DataFileProbe(filepath=self.filepath,
+                                        data_skiprows=self.data_skiprows,
+                                        data_headerrows=self.data_headerrows,
+                                        compression=self.compression,
+                                        filebuffer=self.filebuffer)
+        return self._probe
+
+    def _source(self) -> Path or io.BytesIO:
+        """Source the data are read from, the file or the buffer with its content"""
+        return self.filepath if self.filebuffer is None else io.BytesIO(self.filebuffer)
+
     def _compare_len_header_vs_data(self):
         """
         Check whether there are more data columns than given in the header
@@ -437,12 +1304,9 @@ class DataFileReader:
         of the first data row and the length of the header row(s) can be used to
         automatically generate names for the missing header columns.
         """
-        num_headercols, headercols_list = dfun.frames.get_len_header(filepath=self.filepath,
-                                                                     skiprows=self.data_skiprows,
-                                                                     headerrows=self.data_headerrows)
-        num_datacols = dfun.frames.get_len_data(filepath=self.filepath,
-                                                skiprows=self.data_skiprows,
-                                                headerrows=self.data_headerrows)
+        probe = self.get_probe()
+        num_headercols, headercols_list = probe.num_header_cols, list(probe.header_cols)
+        num_datacols = probe.num_data_cols
 
         # Check if there are more data columns than header columns
         more_data_cols_than_header_cols = False
@@ -462,76 +1326,153 @@ class DataFileReader:
 
         return headercols_list, generated_missing_header_cols_list
 
+    def _string_cols_locs(self, columns, action: Literal['drop', 'category']) -> np.ndarray:
+        """Boolean array marking *columns* that are string columns with *action* in the filetype settings"""
+        names = [col[0] if isinstance(col, tuple) else col for col in columns]
+        return np.array([self.data_string_cols.get(n, None) == action for n in names], dtype=bool)
+
     def _clean_data(self):
         """Sanitize time series"""
         # Sanitize time series, numeric data is needed
-        # After this conversion, all columns are of float64 type, strings will be substituted
+        # After this conversion, all columns are numeric, strings will be substituted
         # by NaN. This means columns that contain only strings, e.g. the columns 'date' or
         # 'filename' in the EddyPro full_output file, contain only NaNs after this step.
         # Not too problematic in case of 'date', b/c the index contains the datetime info.
+        # Columns that were already parsed as numeric are not converted again, and string
+        # columns declared as 'category' in the filetype settings are kept as they are.
+        # Columns are addressed by position because column names can be duplicates here.
         # todo For now, columns that contain only NaNs are still in the df.
-        # todo at some point, the string columns should also be considered
-        self.data_df = self.data_df.apply(pd.to_numeric, errors='coerce')
+        category_cols = self._string_cols_locs(columns=self.data_df.columns, action='category')
+        for ix, dtype in enumerate(self.data_df.dtypes):
+            if is_numeric_dtype(dtype) or category_cols[ix]:
+                continue
+            self.data_df.isetitem(ix, pd.to_numeric(self.data_df.iloc[:, ix], errors='coerce'))
 
-    def _configure_timestamp_parsing(self):
-        """Configure column settings for parsing dates / times correctly."""
+    def _configure_timestamp_parsing(self, headercols_list: list) -> tuple[list, str]:
+        """Configure column settings for parsing dates / times correctly.
 
-        # Check filetype settings info about timestamp
+        Returns the names of the columns that are used for creating the timestamp
+        index and the name of the timestamp index.
+        """
         # Column name for timestamp index
         parsed_index_col = f"TIMESTAMP_{self.timestamp_start_middle_end.upper()}"
 
-        # Create temporary column name for parsed index :: v0.41.0
-        # This solves the issue that a column named *parsed_index_col* might already be
-        # present in the dataset. In that case, parsing would not work and the code would
-        # raise an exception (e.g., "ValueError: Date column TIMESTAMP_END already in dict").
-        # The temporary column name will be changed to the correct name after data were
-        # read (see below).
-        _temp_parsed_index_col = f"_temp_{parsed_index_col}"
-
-        parse_dates = self.timestamp_idx_col  # Columns used for creating the timestamp index
-        parse_dates = {_temp_parsed_index_col: parse_dates}
-        # date_parser = lambda x: dt.datetime.strptime(x, self.timestamp_datetime_format)
-        # date_parser = lambda x: pd.to_datetime(x, format=self.timestamp_datetime_format, errors='coerce')
-        return parse_dates, parsed_index_col, _temp_parsed_index_col
-
-    def _parse_file(self, headercols_list):
-        """Parse data file without header"""
+        # Columns used for creating the timestamp index, positions are converted to names
+        timestamp_cols = [headercols_list[c] if isinstance(c, int) else c for c in self.timestamp_idx_col]
+        return timestamp_cols, parsed_index_col
+
+    def _get_parsing_engines(self) -> list:
+        """Parser engines that are tried, in this order, when reading the file"""
+        if self.parsing_engine != 'auto':
+            return [self.parsing_engine]
+        # The C engine does not support regex delimiters (other than whitespace),
+        # files with such delimiters can only be read with the python engine
+        if self.data_delimiter and len(self.data_delimiter) > 1 and self.data_delimiter != r'\s+':
+            return ['python']
+        return ['c', 'python']
+
+    def _parse_file(self, headercols_list, chunksize: int = None):
+        """Parse data file without header
+
+        The file is parsed with the first engine from *_get_parsing_engines*
+        that does not raise an error. The C engine is much faster than the
+        python engine, the python engine is only used as fallback for files
+        the C engine cannot handle.
+
+        If *chunksize* is given, an iterator over chunks of *chunksize* data
+        records is returned instead of one single dataframe.
+        """
 
-        parse_dates = None
+        timestamp_cols = None
         parsed_index_col = None
-        _temp_parsed_index_col = None
 
         if self.timestamp_idx_col:
-            parse_dates, parsed_index_col, _temp_parsed_index_col = self._configure_timestamp_parsing()
-
-        data_df = pd.read_csv(
-            self.filepath,
-            skiprows=self.data_headersection_rows,
-            header=None,
-            names=headercols_list,
-            na_values=self.data_na_vals,
-            encoding='utf-8',
-            delimiter=self.data_delimiter,
-            # mangle_dupe_cols=True,  # deprecated since pandas 2.0
-            keep_date_col=False,
-            parse_dates=parse_dates,
-            # date_parser=date_parser,  # deprecated since pandas 2.0
-            date_format=self.timestamp_datetime_format,
-            index_col=None,
-            dtype=None,
-            skip_blank_lines=True,
-            nrows=self.data_nrows,
-            engine='python',  # todo 'python', 'c'
-            compression=self.compression
-        )
+            timestamp_cols, parsed_index_col = self._configure_timestamp_parsing(headercols_list=headercols_list)
+
+        # Only selected columns are parsed
+        usecols = self._get_usecols(headercols_list=headercols_list)
+
+        # Declared string columns are directly parsed as categoricals
+        category_cols = self._string_cols_locs(columns=headercols_list, action='category')
+        dtype = {col: 'category' for ix, (col, is_cat) in enumerate(zip(headercols_list, category_cols))
+                 if is_cat and (not usecols or ix in usecols)}
 
+        engines = self._get_parsing_engines()
+        data_df = None
+        for engine in engines:
+            try:
+                data_df = pd.read_csv(
+                    self._source(),
+                    skiprows=self.data_headersection_rows,
+                    header=None,
+                    names=headercols_list,
+                    usecols=usecols,
+                    na_values=self.data_na_vals,
+                    encoding='utf-8',
+                    delimiter=self.data_delimiter,
+                    # mangle_dupe_cols=True,  # deprecated since pandas 2.0
+                    # Timestamp columns are converted after parsing, see *_set_parsed_index*
+                    index_col=None,
+                    dtype=dtype if dtype else None,
+                    skip_blank_lines=True,
+                    nrows=self.data_nrows,
+                    engine=engine,
+                    compression=self.compression,
+                    chunksize=chunksize
+                )
+                break
+            except pandas.errors.EmptyDataError:
+                # Empty files are empty for all engines
+                raise
+            except (pandas.errors.ParserError, ValueError) as e:
+                if engine == engines[-1]:
+                    raise
+                print(f"(!)WARNING Parsing file {self.filepath.name} with engine '{engine}' failed ({e}), "
+                      f"trying next engine ...")
+
+        if chunksize:
+            return (self._set_parsed_index(data_df=chunk_df, timestamp_cols=timestamp_cols,
+                                           parsed_index_col=parsed_index_col)
+                    for chunk_df in data_df)
+        return self._set_parsed_index(data_df=data_df, timestamp_cols=timestamp_cols,
+                                      parsed_index_col=parsed_index_col)
+
+    def _get_usecols(self, headercols_list: list) -> list or None:
+        """Positions of the columns in *headercols_list* that are parsed, *None* for all columns
+
+        Columns are selected by position because names can be duplicates. String
+        columns declared as 'drop' in the filetype settings are not parsed. Columns
+        needed for the timestamp index are always selected.
+        """
+        drop_cols = self._string_cols_locs(columns=headercols_list, action='drop')
+        if not self.usecols and not drop_cols.any():
+            return None
+        names = [col[0] if isinstance(col, tuple) else col for col in headercols_list]
+        usecols = [ix for ix, name in enumerate(names)
+                   if (not self.usecols or name in self.usecols) and not drop_cols[ix]]
         if self.timestamp_idx_col:
-            # Rename temporary column name for parsed index to correct name (v0.41.0)
-            data_df = dfun.frames.rename_cols(df=data_df, renaming_dict={_temp_parsed_index_col: parsed_index_col})
-            # if parsed_index_col in headercols_list:
-            #     headercols_list = [item.replace(parsed_index_col, f"{parsed_index_col}_ORIGINAL") for item in headercols_list]
+            for tscol in self.timestamp_idx_col:
+                if isinstance(tscol, int):
+                    usecols.append(tscol)
+                else:
+                    usecols += [ix for ix, col in enumerate(headercols_list) if col == tscol or names[ix] == tscol]
+        return sorted(set(usecols))
+
+    def _set_parsed_index(self, data_df: DataFrame, timestamp_cols: list, parsed_index_col: str) -> DataFrame:
+        """Convert timestamp columns to timestamp index named *parsed_index_col*
 
-            data_df.set_index(parsed_index_col, inplace=True)
+        The timestamp columns are removed from the data. Since the index is set
+        directly from the converted timestamps, it can have the same name as one
+        of the data columns.
+        """
+        if self.timestamp_idx_col:
+            # Columns are addressed by position because names can be duplicates
+            timestamp_locs = [data_df.columns.get_loc(c) for c in timestamp_cols]
+            index = parse_timestamp_columns(columns=[data_df.iloc[:, loc] for loc in timestamp_locs],
+                                            datetime_format=self.timestamp_datetime_format)
+            data_df = data_df.iloc[:, [ix for ix in range(data_df.shape[1]) if ix not in timestamp_locs]]
+            data_df.index = index
+            data_df.index.name = parsed_index_col
 
         return data_df
 
@@ -656,8 +1597,131 @@ def example_hires():
     print(df, meta)
 
 
+def example_benchmark_parsing_engines(repeats: int = 3):
+    """Compare parsing times of the C and python engines on the bundled example files"""
+    import time
+    from diive.configs.exampledata import DIR_PATH
+
+    examplefiles = {
+        'DIIVE-CSV-30MIN': 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv',
+        'EDDYPRO-FLUXNET-30MIN': 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv',
+        'ICOS-H2R-CSVZIP-10S': 'CH-Dav_BM_20230328_L02_F03.zip',
+    }
+
+    results = {}
+    for filetype, filename in examplefiles.items():
+        filepath = Path(DIR_PATH) / filename
+        for engine in ['python', 'c']:
+            times = []
+            for _ in range(repeats):
+                tic = time.time()
+                ReadFileType(filepath=filepath, filetype=filetype, parsing_engine=engine)
+                times.append(time.time() - tic)
+            results[(filetype, engine)] = min(times)
+
+    print(f"\n{'FILETYPE':<25} {'python':>10} {'c':>10} {'speedup':>10}")
+    for filetype in examplefiles.keys():
+        t_python = results[(filetype, 'python')]
+        t_c = results[(filetype, 'c')]
+        print(f"{filetype:<25} {t_python:>9.3f}s {t_c:>9.3f}s {t_python / t_c:>9.1f}x")
+
+
+def example_benchmark_clean_data(repeats: int = 3):
+    """Compare numeric conversion of all columns with the dtype-aware conversion in _clean_data"""
+    import time
+    from diive.configs.exampledata import DIR_PATH
+
+    filepath = Path(DIR_PATH) / \
+               'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+    datafilereader = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN',
+                                  read_data=False).get_datafilereader()
+    headercols_list, _ = datafilereader._compare_len_header_vs_data()
+    parsed_df = datafilereader._parse_file(headercols_list=headercols_list)
+
+    times_before = []
+    times_after = []
+    for _ in range(repeats):
+        tic = time.time()
+        before_df = parsed_df.apply(pd.to_numeric, errors='coerce')
+        times_before.append(time.time() - tic)
+
+        datafilereader.data_df = parsed_df.copy()
+        tic = time.time()
+        datafilereader._clean_data()
+        times_after.append(time.time() - tic)
+
+    pd.testing.assert_frame_equal(before_df, datafilereader.data_df)
+    n_converted = sum(not is_numeric_dtype(d) for d in parsed_df.dtypes)
+    print(f"\nColumns: {len(parsed_df.columns)}, converted to numeric: {n_converted}")
+    print(f"all columns:  {min(times_before):.3f}s")
+    print(f"dtype-aware:  {min(times_after):.3f}s")
+    print(f"speedup:      {min(times_before) / min(times_after):.1f}x")
+
+
+def example_benchmark_timestamp_parsing(repeats: int = 3):
+    """Compare timestamp parsing in pd.read_csv with the specialized timestamp converters
+
+    Uses the bundled 10S ICOS example file and generated files with one month of
+    1-minute ICOS data and one hour of 20 Hz data with full timestamp.
+    """
+    import tempfile
+    import time
+    from diive.configs.exampledata import DIR_PATH
+
+    tempdir = Path(tempfile.mkdtemp())
+    rng = np.random.default_rng(42)
+    timestamps = pd.date_range('2022-06-01 00:01', periods=31 * 1440, freq='1min')
+    icos_df = pd.DataFrame(rng.random((len(timestamps), 20)), columns=[f'VAR{i}' for i in range(20)])
+    icos_df.insert(0, 'TIMESTAMP', timestamps.strftime('%Y%m%d%H%M%S'))
+    icos_df.to_csv(tempdir / 'CH-XXX_ICOS_1MIN.zip', index=False,
+                   compression=dict(method='zip', archive_name='CH-XXX_ICOS_1MIN.csv'))
+    timestamps = pd.date_range('2022-06-01 00:00:00.025', periods=72000, freq='50ms')
+    hires_df = pd.DataFrame(rng.random((len(timestamps), 8)), columns=['U', 'V', 'W', 'TS', 'CO2', 'H2O', 'P', 'T'])
+    hires_df.insert(0, 'TIMESTAMP_MIDDLE', timestamps.strftime('%Y-%m-%d %H:%M:%S.%f'))
+    hires_df.to_csv(tempdir / 'CH-XXX_20HZ.csv', index=False)
+
+    examplefiles = {
+        'ICOS-H2R-CSVZIP-10S': Path(DIR_PATH) / 'CH-Dav_BM_20230328_L02_F03.zip',
+        'ICOS-H1R-CSVZIP-1MIN': tempdir / 'CH-XXX_ICOS_1MIN.zip',
+        'GENERIC-CSV-HEADER-1ROW-TS-MIDDLE-FULL-NS-30MIN': tempdir / 'CH-XXX_20HZ.csv',
+    }
+
+    print(f"\n{'FILETYPE':<50} {'records':>8} {'read_csv':>10} {'converters':>10} {'speedup':>10}")
+    for filetype, filepath in examplefiles.items():
+        datafilereader = ReadFileType(filepath=filepath, filetype=filetype, read_data=False).get_datafilereader()
+        headercols_list, _ = datafilereader._compare_len_header_vs_data()
+        timestamp_cols, _ = datafilereader._configure_timestamp_parsing(headercols_list=headercols_list)
+        times_read_csv = []
+        times_converters = []
+        for _ in range(repeats):
+            # Timestamp conversion during parsing
+            tic = time.time()
+            pd.read_csv(filepath, skiprows=datafilereader.data_headersection_rows, header=None,
+                        names=headercols_list, na_values=datafilereader.data_na_vals,
+                        delimiter=datafilereader.data_delimiter, compression=datafilereader.compression,
+                        parse_dates={'_temp': timestamp_cols},
+                        date_format=datafilereader.timestamp_datetime_format)
+            times_read_csv.append(time.time() - tic)
+
+            # Timestamp conversion after parsing
+            tic = time.time()
+            data_df = datafilereader._parse_file(headercols_list=headercols_list)
+            times_converters.append(time.time() - tic)
+        t_read_csv = min(times_read_csv)
+        t_converters = min(times_converters)
+        print(f"{filetype:<50} {len(data_df):>8} {t_read_csv:>9.3f}s {t_converters:>9.3f}s "
+              f"{t_read_csv / t_converters:>9.1f}x")
+
+    for f in tempdir.iterdir():
+        f.unlink()
+    tempdir.rmdir()
+
+
 if __name__ == '__main__':
     # example_ep_fluxnet()
     # example_icosfile()
     # example_toa5()
+    # example_benchmark_parsing_engines()
+    # example_benchmark_clean_data()
+    # example_benchmark_timestamp_parsing()
     example_hires()
@@ -1,12 +1,21 @@
+import csv
 import os
 import pickle
 import time
 import zipfile as zf
 from pathlib import Path
+from typing import Literal
 
-from pandas import Series, DataFrame, read_parquet
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.fs as pafs
+from pandas import Series, DataFrame, DatetimeIndex, read_parquet, Timestamp, Timedelta
+from pandas.tseries.offsets import MonthBegin, YearBegin
 
-from diive.core.io.filereader import MultiDataFileReader
+from diive.core.io.filereader import MultiDataFileReader, detect_changed_ranges
 from diive.core.times.times import TimestampSanitizer
 
 
@@ -58,12 +67,312 @@ def load_parquet(filepath: str or Path) -> DataFrame:
     df = read_parquet(filepath)
     toc = time.time() - tic
     # Check timestamp, also detects frequency of time series, this info was lost when saving to the parquet file
-    df = TimestampSanitizer(data=df).get()
+    df = TimestampSanitizer(data=df, inplace=True).get()
     print(f"Loaded .parquet file {filepath} ({toc:.3f} seconds). "
           f"Detected time resolution of {df.index.freq} / {df.index.freqstr} ")
     return df
 
 
+def save_feather(filename: str, data: DataFrame or Series, outpath: str or None = None,
+                 compression: Literal['uncompressed', 'lz4', 'zstd'] = 'uncompressed') -> str:
+    """
+    Save pandas Series or DataFrame as Arrow IPC (Feather v2) file
+
+    Uncompressed files can be memory-mapped by *load_feather*, loading is then
+    almost independent of the size of the file. In contrast to pickle files,
+    Arrow files do not depend on the pandas version. The timestamp index,
+    multi-level column headers (e.g. variable names and units) and the
+    frequency of the timestamp index are stored in the file.
+
+    Args:
+        filename: Name of the generated file, without extension
+        data: pandas Series or DataFrame
+        outpath: If *None*, file is saved to system default folder. When used within
+            a notebook, the file is saved in the same location as the notebook.
+        compression: Compression of the file, only uncompressed files can be
+            loaded without copying the data
+
+    Returns:
+        str, filepath to Arrow IPC file
+    """
+    filepath = set_outpath(outpath=outpath, filename=filename, fileextension='feather')
+    tic = time.time()
+    df = data.to_frame() if isinstance(data, Series) else data
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    freq = df.index.freqstr if isinstance(df.index, DatetimeIndex) else None
+    if freq:
+        table = table.replace_schema_metadata({**table.schema.metadata, b'diive_freq': freq.encode()})
+    feather.write_feather(table, filepath, compression=compression)
+    toc = time.time() - tic
+    print(f"Saved file {filepath} ({toc:.3f} seconds).")
+    return str(filepath)
+
+
+def load_feather(filepath: str or Path,
+                 columns: list = None,
+                 memory_map: bool = True,
+                 dtype_backend: Literal['numpy', 'pyarrow'] = 'numpy') -> DataFrame:
+    """
+    Load data from Arrow IPC (Feather v2) file saved with *save_feather*
+
+    Args:
+        filepath: filepath to Arrow IPC file
+        columns: Names of the columns that are loaded, all columns if *None*
+        memory_map: Memory-map the file instead of reading it into memory
+        dtype_backend: With 'numpy', columns are converted to numpy data types.
+            With 'pyarrow', columns use pandas *ArrowDtype* and share memory with
+            the memory-mapped file, the data are not copied. This is fastest for
+            large files, but not all functions in diive support *ArrowDtype* yet.
+            The file is closed after loading, but with *memory_map* the mapping
+            of the file stays open as long as the returned data exist (on Windows,
+            the file cannot be deleted or overwritten meanwhile).
+
+    Returns:
+        pandas DataFrame, data from Arrow IPC file
+    """
+    tic = time.time()
+    with pa.memory_map(str(filepath)) if memory_map else pa.OSFile(str(filepath)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns:
+        index_columns = [c for c in table.schema.pandas_metadata['index_columns'] if isinstance(c, str)]
+        columns = [str(c) if isinstance(c, tuple) else c for c in columns]
+        table = table.select(index_columns + [c for c in columns if c not in index_columns])
+    if dtype_backend == 'pyarrow':
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        if isinstance(df.index.dtype, pd.ArrowDtype) and pa.types.is_timestamp(df.index.dtype.pyarrow_dtype):
+            df.index = DatetimeIndex(df.index.to_numpy(dtype='datetime64[ns]'), name=df.index.name)
+    else:
+        # Data are copied to numpy arrays, the memory-mapped file is released with the table
+        df = table.to_pandas()
+    freq = (table.schema.metadata or {}).get(b'diive_freq')
+    del table
+    if freq and isinstance(df.index, DatetimeIndex):
+        df.index.freq = freq.decode()
+    else:
+        # Detects frequency of time series
+        df = TimestampSanitizer(data=df, inplace=True).get()
+    toc = time.time() - tic
+    print(f"Loaded .feather file {filepath} ({toc:.3f} seconds). "
+          f"Detected time resolution of {df.index.freq} / {df.index.freqstr} ")
+    return df
+
+
+# Names of the partition columns in datasets, reserved so they do not collide with data columns
+_DATASET_YEAR_COL = 'partition_year'
+_DATASET_MONTH_COL = 'partition_month'
+
+
+def _dataset_partitioning(partition: Literal['year', 'month']) -> ds.Partitioning:
+    fields = [(_DATASET_YEAR_COL, pa.int16())]
+    if partition == 'month':
+        fields.append((_DATASET_MONTH_COL, pa.int8()))
+    return ds.partitioning(pa.schema(fields), flavor='hive')
+
+
+def save_dataset(data: DataFrame or Series, outpath: str or Path,
+                 partition: Literal['year', 'month'] = 'month',
+                 fileformat: Literal['parquet', 'arrow'] = 'parquet') -> str:
+    """
+    Save time series as dataset partitioned by year or by year and month
+
+    Each partition is stored in its own folder, e.g. *outpath/partition_year=2022/partition_month=7*.
+    Partitions that are contained in *data* replace existing partitions with
+    the same year (and month) in *outpath*, all other partitions are kept.
+    This way, an archive can be updated by saving only new or changed months.
+
+    Args:
+        data: pandas Series or DataFrame with timestamp index
+        outpath: Folder of the dataset
+        partition: Partition data by 'year' or by 'year' and 'month'
+        fileformat: Store partitions as Parquet ('parquet') or as Arrow IPC ('arrow')
+            files. Arrow IPC files are larger, but can be memory-mapped when read.
+
+    Returns:
+        str, path to dataset folder
+    """
+    tic = time.time()
+    df = data.to_frame() if isinstance(data, Series) else data.copy()
+    partitioncols = _dataset_partitioning(partition=partition).schema.names
+    reserved = [c for c in df.columns if c in partitioncols]
+    if reserved:
+        raise ValueError(f"Columns {reserved} are reserved for partitioning the dataset, "
+                         f"rename them before saving.")
+    df[_DATASET_YEAR_COL] = df.index.year.astype('int16')
+    if partition == 'month':
+        df[_DATASET_MONTH_COL] = df.index.month.astype('int8')
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    ds.write_dataset(table, outpath,
+                     format='ipc' if fileformat == 'arrow' else 'parquet',
+                     partitioning=_dataset_partitioning(partition=partition),
+                     existing_data_behavior='delete_matching')
+    toc = time.time() - tic
+    print(f"Saved dataset {outpath} ({toc:.3f} seconds).")
+    return str(outpath)
+
+
+def load_dataset(path: str or Path,
+                 start: str or Timestamp = None,
+                 end: str or Timestamp = None,
+                 columns: list = None,
+                 partition: Literal['year', 'month'] = 'month',
+                 fileformat: Literal['parquet', 'arrow'] = 'parquet',
+                 memory_map: bool = True) -> DataFrame:
+    """
+    Load time window from dataset saved with *save_dataset*
+
+    Only partitions that overlap with the time window from *start* to *end* are
+    opened, and of those only the requested *columns* are read.
+
+    Args:
+        path: Folder of the dataset
+        start: First timestamp that is loaded, from the start of the dataset if *None*
+        end: Last timestamp that is loaded, until the end of the dataset if *None*
+        columns: Names of the columns that are loaded, all columns if *None*
+        partition: Partitioning of the dataset, same as in *save_dataset*
+        fileformat: File format of the dataset, same as in *save_dataset*
+        memory_map: Memory-map files instead of reading them into memory
+            (only used for Arrow IPC files)
+
+    Returns:
+        pandas DataFrame, data from the time window
+    """
+    tic = time.time()
+    partitioning = _dataset_partitioning(partition=partition)
+    dataset = ds.dataset(path, format='ipc' if fileformat == 'arrow' else 'parquet',
+                         partitioning=partitioning,
+                         filesystem=pafs.LocalFileSystem(use_mmap=memory_map))
+    indexcol = dataset.schema.pandas_metadata['index_columns'][0]
+
+    # Filter on partitions (skips files outside the time window) and on timestamp
+    filters = []
+    if partition == 'month':
+        period = ds.field(_DATASET_YEAR_COL).cast(pa.int32()) * 100 + ds.field(_DATASET_MONTH_COL).cast(pa.int32())
+    else:
+        period = ds.field(_DATASET_YEAR_COL).cast(pa.int32())
+    for timestamp, is_start in [(start, True), (end, False)]:
+        if timestamp is None:
+            continue
+        timestamp = Timestamp(timestamp)
+        timestamp_period = timestamp.year * 100 + timestamp.month if partition == 'month' else timestamp.year
+        timestamp = pa.scalar(timestamp, type=dataset.schema.field(indexcol).type)
+        if is_start:
+            filters += [period >= timestamp_period, ds.field(indexcol) >= timestamp]
+        else:
+            filters += [period <= timestamp_period, ds.field(indexcol) <= timestamp]
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+
+    if columns:
+        columns = [indexcol] + [c for c in columns if c != indexcol]
+    else:
+        columns = [c for c in dataset.schema.names if c not in partitioning.schema.names]
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    df = df.sort_index()
+    toc = time.time() - tic
+    if not df.empty:
+        # Detects frequency of time series, this info was lost when saving the dataset,
+        # timestamp is kept as saved (same name and position in averaging period)
+        df = TimestampSanitizer(data=df, inplace=True, validate_naming=False,
+                                output_middle_timestamp=False).get()
+    print(f"Loaded dataset {path} ({toc:.3f} seconds). "
+          f"Loaded {len(df)} records from {df.index.min()} to {df.index.max()}.")
+    return df
+
+
+def append_to_dataset(path: str or Path,
+                      filepaths: list,
+                      filetype: str,
+                      partition: Literal['year', 'month'] = 'month',
+                      fileformat: Literal['parquet', 'arrow'] = 'parquet',
+                      **readkwargs) -> tuple[DataFrame, list]:
+    """
+    Parse new files and merge their data into dataset saved with *save_dataset*
+
+    Only the files in *filepaths* are parsed, and only the partitions of the
+    dataset that overlap with their data are loaded, updated and saved again,
+    see *MultiDataFileReader.merge_into*. The dataset is created if it does
+    not exist yet.
+
+    Args:
+        path: Folder of the dataset
+        filepaths: New files of type *filetype*
+        filetype: The diive internal filetype of the files as defined in diive/configs/filetypes
+        partition: Partitioning of the dataset, same as in *save_dataset*
+        fileformat: File format of the dataset, same as in *save_dataset*
+        **readkwargs: Passed on to *MultiDataFileReader*, e.g. *usecols* or *cache*
+
+    Returns:
+        updated data of the saved partitions and list of (start, end) timestamp
+        ranges in which values changed or were added
+    """
+    if not filepaths:
+        return DataFrame(), []
+    reader = MultiDataFileReader(filepaths=filepaths, filetype=filetype, **readkwargs)
+    new_df = reader.data_df
+
+    # Time window of all partitions that contain new data
+    first, last = new_df.index[0], new_df.index[-1]
+    if partition == 'month':
+        start = Timestamp(first.year, first.month, 1)
+        end = Timestamp(last.year, last.month, 1) + MonthBegin(1) - Timedelta(1, 'ns')
+    else:
+        start = Timestamp(first.year, 1, 1)
+        end = Timestamp(last.year, 1, 1) + YearBegin(1) - Timedelta(1, 'ns')
+
+    existing_df = DataFrame()
+    if Path(path).is_dir() and any(Path(path).iterdir()):
+        existing_df = load_dataset(path=path, start=start, end=end, partition=partition, fileformat=fileformat)
+    if existing_df.empty:
+        data_df = new_df
+        changed_ranges = detect_changed_ranges(old_df=new_df.iloc[0:0], new_df=new_df)
+    else:
+        data_df, changed_ranges = reader.merge_into(data_df=existing_df)
+    save_dataset(data=data_df, outpath=path, partition=partition, fileformat=fileformat)
+    return data_df, changed_ranges
+
+
+def save_csv(data: DataFrame, outpath: str or Path):
+    """
+    Save DataFrame without index as CSV file, same file as *DataFrame.to_csv(index=False)*
+
+    Numbers are converted to text column by column with the same formatting as
+    in *to_csv*, which is considerably faster for numeric data. Data that contain
+    other than numeric columns are saved with *to_csv*.
+
+    Args:
+        data: Data with numeric columns
+        outpath: Path to the CSV file
+    """
+    numeric = all(data.iloc[:, ix].dtype.kind in 'iuf' for ix in range(len(data.columns)))
+    if not numeric or data.columns.nlevels > 1:
+        data.to_csv(outpath, index=False)
+        return
+    columns = []
+    for ix in range(len(data.columns)):
+        column = data.iloc[:, ix]
+        if isinstance(column.dtype, pd.api.extensions.ExtensionDtype) and column.dtype.kind in 'iu':
+            # Nullable integers (e.g. Int64), missing values are written as empty fields
+            missing = np.flatnonzero(column.isna().to_numpy())
+            values = column.to_numpy(dtype=np.int64 if column.dtype.kind == 'i' else np.uint64, na_value=0)
+        else:
+            values = column.to_numpy()
+            missing = np.flatnonzero(np.isnan(values)) if values.dtype.kind == 'f' else []
+        if values.dtype == np.float64:
+            # Same as numpy (and pandas) string conversion of float64, but faster
+            text = list(map(repr, values.tolist()))
+        else:
+            text = values.astype(str).tolist()
+        for m in missing:
+            text[m] = ''
+        columns.append(text)
+    with open(outpath, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f, lineterminator=os.linesep).writerow(data.columns)
+        if len(data) > 0:
+            f.write(os.linesep.join(map(','.join, zip(*columns))))
+            f.write(os.linesep)
+
+
 def save_as_pickle(outpath: str or None, filename: str, data) -> str:
     """Save data as pickle"""
     filepath = set_outpath(outpath=outpath, filename=filename, fileextension='pickle')
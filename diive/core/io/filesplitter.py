@@ -1,10 +1,18 @@
 import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import Literal
 
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
 from pandas import DataFrame
 
 import diive.core.io.filedetector as fd
+from diive.core.funcs.funcs import validate_n_jobs
+from diive.core.io.filemanifest import FileManifest
 from diive.core.io.filereader import ReadFileType
 from diive.core.io.filereader import search_files
 from diive.core.times.times import create_timestamp
@@ -33,7 +41,10 @@ class FileSplitter:
             v_var: str = None,
             w_var: str = None,
             c_var: str = None,
-            outfile_limit_n_rows: int = None
+            outfile_limit_n_rows: int = None,
+            chunk_rows: int = None,
+            split_format: Literal['csv', 'parquet', 'feather', 'npy'] = 'csv',
+            split_column_stats: bool = False
     ):
         """Split file into multiple smaller parts and export them as multiple CSV files.
 
@@ -64,6 +75,16 @@ class FileSplitter:
             c_var: Name of the scalar for which turbulent fluctuation is calculated
             outfile_limit_n_rows: Limit splits to this number of rows. Mainly implemented
                 for faster testing.
+            chunk_rows: If given, the file is read in chunks of this number of records
+                instead of all at once, and each split is exported as soon as it is complete.
+                Memory usage then stays constant, independent of the size of the file.
+            split_format: File format of the splits. With 'csv', missing values are
+                saved as -9999. The binary formats 'parquet', 'feather' and 'npy' keep
+                missing values as NaN and are much faster to load, *compress_splits*
+                is ignored for them. Splits can be loaded with *load_split*.
+            split_column_stats: If *True*, the split stats also contain the number of
+                values, median, minimum, maximum and fraction of missing values of each
+                numeric column in each split, calculated before wind rotation.
         """
         self.filepath = Path(filepath) if isinstance(filepath, str) else filepath
         self.filename_pattern = filename_pattern
@@ -84,6 +105,9 @@ class FileSplitter:
         self.w_col = w_var
         self.c_col = c_var
         self.outfile_limit_n_rows = outfile_limit_n_rows
+        self.chunk_rows = chunk_rows
+        self.split_format = split_format
+        self.split_column_stats = split_column_stats
 
         # Init new vars
         self._filestats_df = DataFrame()
@@ -109,12 +133,19 @@ class FileSplitter:
     def run(self):
         print(f"\n\nWorking on file '{self.filepath.name}'")
         print(f"    Path to file: {self.filepath}")
+        if self.chunk_rows:
+            self._run_chunked()
+        else:
+            self._run_full()
 
-        # Read file
-        file_df, meta = ReadFileType(filepath=self.filepath,
-                                     filetype=self.filetype,
-                                     data_nrows=None,
-                                     output_middle_timestamp=False).get_filedata()
+    def _run_full(self):
+        # Read file, the probe of the reader is reused for the file stats
+        datafilereader = ReadFileType(filepath=self.filepath,
+                                      filetype=self.filetype,
+                                      data_nrows=None,
+                                      output_middle_timestamp=False,
+                                      read_data=False).get_datafilereader(read_data=True)
+        file_df, meta = datafilereader.get_data()
 
         # Add timestamp to each record
         file_df, true_resolution = create_timestamp(df=file_df,
@@ -123,14 +154,50 @@ class FileSplitter:
                                                     expected_duration=self.expected_duration)
 
         # Collect file data stats
+        probe = datafilereader.get_probe()
         self._filestats_df = fd.add_data_stats(df=file_df,
                                                true_resolution=true_resolution,
                                                filename=self.file_name,
-                                               found_records=len(file_df))
+                                               found_records=len(file_df),
+                                               estimated_records=probe.estimated_records)
 
-        self._splitstats_df = self._loop_splits(file_df=file_df,
+        file_df['index'] = pd.to_datetime(file_df.index)
+        split_grouped = file_df.groupby(pd.Grouper(key='index', freq=self.data_split_duration))
+        self._splitstats_df = self._loop_splits(splits=(split_df for _, split_df in split_grouped),
                                                 outdir_splits=self.outdir)
 
+    def _run_chunked(self):
+        # Read file in chunks, splits are created while reading
+        datafilereader = ReadFileType(filepath=self.filepath,
+                                      filetype=self.filetype,
+                                      data_nrows=None,
+                                      output_middle_timestamp=False,
+                                      read_data=False).get_datafilereader()
+        segments = datafilereader.iter_segments(duration=self.data_split_duration,
+                                                rows=self.chunk_rows,
+                                                file_start=self.file_start,
+                                                data_nominal_res=self.data_nominal_res,
+                                                expected_duration=self.expected_duration)
+
+        found = {'records': 0, 'first': None, 'last': None}
+
+        def splits():
+            for split_df in segments:
+                found['records'] += len(split_df)
+                found['first'] = split_df.index[0] if found['first'] is None else found['first']
+                found['last'] = split_df.index[-1]
+                split_df['index'] = pd.to_datetime(split_df.index)  # Same columns as in full mode
+                yield split_df
+
+        self._splitstats_df = self._loop_splits(splits=splits(), outdir_splits=self.outdir)
+
+        # Collect file data stats, only first and last record are needed
+        self._filestats_df = fd.add_data_stats(df=DataFrame(index=[found['first'], found['last']]),
+                                               true_resolution=datafilereader.true_resolution,
+                                               filename=self.file_name,
+                                               found_records=found['records'],
+                                               estimated_records=datafilereader.get_probe().estimated_records)
+
     def _rotate_split(self, split_df: pd.DataFrame):
         wr = WindRotation2D(u=split_df[self.u_col],
                             v=split_df[self.v_col],
@@ -140,30 +207,39 @@ class FileSplitter:
         split_df = pd.concat([split_df, primes_df], axis=1)
         return split_df
 
-    def _loop_splits(self, file_df, outdir_splits):
+    def _loop_splits(self, splits, outdir_splits):
         counter_splits = -1
-        file_df['index'] = pd.to_datetime(file_df.index)
 
         if self.rotation:
             self.data_split_outfile_suffix = f"{self.data_split_outfile_suffix}_ROT"
 
-        if self.compress_splits:
+        if self.split_format != 'csv':
+            file_extension = f'.{self.split_format}'
+        elif self.compress_splits:
             file_extension = '.csv.gz'
         else:
             file_extension = '.csv'
 
-        # Loop segments
-        splits_overview_df = pd.DataFrame()
-        split_grouped = file_df.groupby(pd.Grouper(key='index', freq=self.data_split_duration))
-        for split_key, split_df in split_grouped:
+        # Loop segments, stats of each split are collected as one record
+        records = []
+        for split_df in splits:
             counter_splits += 1
             split_start = split_df.index[0]
             split_end = split_df.index[-1]
 
+            if self.split_column_stats:
+                column_stats = calc_split_column_stats(split_df=split_df.drop(columns='index', errors='ignore'))
+            else:
+                column_stats = {}
+
             if self.rotation:
                 split_df = self._rotate_split(split_df=split_df)
 
-            split_df = split_df.fillna(-9999, inplace=False)
+            if self.split_format == 'csv':
+                split_df = split_df.fillna(-9999, inplace=False)
+            else:
+                # Binary formats keep the timestamp index, the helper column for grouping is not needed
+                split_df = split_df.drop(columns='index', errors='ignore')
 
             # Name for split file
             split_name = (f"{self.data_split_outfile_prefix}"
@@ -181,26 +257,99 @@ class FileSplitter:
                 split_df = split_df.iloc[
                            0:self.outfile_limit_n_rows]  # Limit number of exported records, useful for testing
 
-            split_df.to_csv(split_filepath, compression=compression)
-
-            splits_overview_df.loc[split_name, 'start'] = split_start
-            splits_overview_df.loc[split_name, 'end'] = split_end
-            splits_overview_df.loc[split_name, 'source_file'] = self.filepath.name
-            splits_overview_df.loc[split_name, 'source_path'] = self.filepath
-            splits_overview_df.loc[split_name, 'n_records'] = len(split_df.index)
-            splits_overview_df.loc[split_name, 'n_columns'] = len(split_df.columns)
-            splits_overview_df.loc[split_name, 'split_filepath'] = split_filepath
-            splits_overview_df.loc[split_name, 'wind_rotation_1=yes'] = int(self.rotation)
-
+            save_split(split_df=split_df, filepath=split_filepath, compression=compression)
+
+            records.append({'split_name': split_name,
+                            'start': split_start,
+                            'end': split_end,
+                            'source_file': self.filepath.name,
+                            'source_path': self.filepath,
+                            'n_records': len(split_df.index),
+                            'n_columns': len(split_df.columns),
+                            'split_filepath': split_filepath,
+                            'wind_rotation_1=yes': int(self.rotation),
+                            **column_stats})
+
+        # Build overview once from all records
+        splits_overview_df = DataFrame.from_records(records)
+        if not splits_overview_df.empty:
+            splits_overview_df = splits_overview_df.set_index('split_name')
+            splits_overview_df.index.name = None
         return splits_overview_df
 
-        # # Stats todo maybe later
-        # for col in split_df.columns:
-        #     self.splits_overview_df.loc[split_name, f'numvals_{col}'] = split_df[col].dropna().size
-        #     try:
-        #         self.splits_overview_df.loc[split_name, f'median_{col}'] = split_df[col].median()
-        #     except TypeError:
-        #         self.splits_overview_df.loc[split_name, f'median_{col}'] = np.nan
+
+def calc_split_column_stats(split_df: DataFrame) -> dict:
+    """Calculate stats of all numeric columns in split
+
+    Stats of all columns are calculated at once. Returns a dict with
+    the entries '<column>_n_vals', '<column>_median', '<column>_min',
+    '<column>_max' and '<column>_nan_fraction' for each column.
+    """
+    numeric_df = split_df.select_dtypes(include='number')
+    stats_df = DataFrame({'n_vals': numeric_df.count(),
+                          'median': numeric_df.median(),
+                          'min': numeric_df.min(),
+                          'max': numeric_df.max(),
+                          'nan_fraction': numeric_df.isna().mean()})
+    return {f"{_column_label(col)}_{stat}": int(val) if stat == 'n_vals' else val
+            for col, row in zip(stats_df.index, stats_df.itertuples(index=False))
+            for stat, val in zip(stats_df.columns, row)}
+
+
+def _column_label(col) -> str:
+    """Column name as string, tuples of multi-row headers are joined"""
+    return '_'.join(str(c) for c in col) if isinstance(col, tuple) else str(col)
+
+
+def save_split(split_df: DataFrame, filepath: Path, compression: str = None):
+    """Save split in the file format given by the extension of *filepath*
+
+    Binary formats keep the timestamp index and missing values (NaN):
+    - '.parquet': Parquet file
+    - '.feather': Feather (Arrow IPC) file, the index is stored in the pandas metadata
+    - '.npy': NumPy structured array, the index is stored as first field. Columns
+      with strings or other objects cannot be saved without pickling and raise
+      an error, use '.parquet' or '.feather' for them.
+    All other extensions are saved as CSV.
+    """
+    suffix = Path(filepath).suffix
+    if suffix == '.parquet':
+        split_df.to_parquet(filepath)
+    elif suffix == '.feather':
+        feather.write_feather(split_df, filepath)
+    elif suffix == '.npy':
+        object_cols = split_df.columns[split_df.dtypes == object].tolist()
+        if object_cols:
+            raise ValueError(f"Columns {object_cols} contain strings or other objects and cannot be "
+                             f"saved as .npy, use split format 'parquet' or 'feather' instead.")
+        np.save(filepath, split_df.to_records(index=True), allow_pickle=False)
+    else:
+        split_df.to_csv(filepath, compression=compression)
+
+
+def load_split(filepath: str or Path) -> DataFrame:
+    """Load split saved by *FileSplitter*, with timestamp index
+
+    Splits in binary formats ('.parquet', '.feather', '.npy') are loaded
+    with their original data types and missing values. Splits saved as CSV
+    are parsed, the missing value code -9999 is converted to NaN.
+
+    Example:
+        split_df = load_split(filepath='CH-DAS_20230828130000_30MIN-SPLIT.parquet')
+        mc = MaxCovariance(df=split_df, var_reference=..., var_lagged=..., ...)
+    """
+    filepath = Path(filepath)
+    suffix = filepath.suffix
+    if suffix == '.parquet':
+        return pd.read_parquet(filepath)
+    elif suffix == '.feather':
+        return pd.read_feather(filepath)
+    elif suffix == '.npy':
+        records = np.load(filepath, allow_pickle=False)
+        return DataFrame.from_records(records, index=records.dtype.names[0])
+    split_df = pd.read_csv(filepath, index_col=0, na_values=[-9999])
+    split_df.index = pd.to_datetime(split_df.index)
+    return split_df
 
 
 def setup_output_dirs(outdir: str, del_previous_results=False):
@@ -234,6 +383,24 @@ def setup_output_dirs(outdir: str, del_previous_results=False):
     return outdirs
 
 
+def _split_file(splitter_kwargs: dict, skip_failed: bool = False) -> tuple[DataFrame, DataFrame, str or None]:
+    """Split one file for FileSplitterMulti, returns file stats, split stats and error message
+
+    Defined on module level so it can be pickled and sent to worker processes.
+    With *skip_failed*, errors are returned instead of raised, so that one failing
+    file does not stop the splitting of all other files.
+    """
+    try:
+        fs = FileSplitter(**splitter_kwargs)
+        fs.run()
+        filestats_df, splitstats_df = fs.get_stats()
+        return filestats_df, splitstats_df, None
+    except Exception:
+        if not skip_failed:
+            raise
+        return DataFrame(), DataFrame(), traceback.format_exc()
+
+
 class FileSplitterMulti:
 
     def __init__(
@@ -255,7 +422,13 @@ class FileSplitterMulti:
             v_var: str = None,
             w_var: str = None,
             c_var: str = None,
-            outfile_limit_n_rows: int = None
+            outfile_limit_n_rows: int = None,
+            chunk_rows: int = None,
+            n_jobs: int = 1,
+            split_format: Literal['csv', 'parquet', 'feather', 'npy'] = 'csv',
+            split_column_stats: bool = False,
+            manifest: FileManifest = None,
+            skip_failed: bool = False
     ):
         """Split multiple files into multiple smaller parts 
         and save them as CSV or compressed CSV.
@@ -292,6 +465,22 @@ class FileSplitterMulti:
             c_var: Name of the scalar for which turbulent fluctuation is calculated
             outfile_limit_n_rows: Limit splits to this number of rows. Mainly implemented
                 for faster testing. 
+            chunk_rows: If given, files are read in chunks of this number of records,
+                see *FileSplitter*.
+            n_jobs: Number of files that are split in parallel, each in its own worker
+                process. With *1* files are split one after another, *-1* uses all
+                available CPUs. Worker processes must be started from within an
+                `if __name__ == '__main__':` block on Windows.
+            split_format: File format of the splits, see *FileSplitter*.
+            split_column_stats: If *True*, stats of each numeric column are added
+                to the split stats, see *FileSplitter*.
+            manifest: If given, only files that are new or changed since the previous
+                run are split, files that were split successfully are added to the
+                manifest. Splits of previous runs are kept in *outdir*, the stats
+                files only contain the files of the current run.
+            skip_failed: If *True*, files that cannot be split are reported and
+                skipped, the other files are still split. Errors are available in
+                *failed_files* after *run*. If *False*, the first error stops the run.
         """
 
         self.outdir = outdir
@@ -308,6 +497,14 @@ class FileSplitterMulti:
         self.compress_splits = compress_splits
         self.rotation = rotation
         self.outfile_limit_n_rows = outfile_limit_n_rows
+        self.chunk_rows = chunk_rows
+        self.n_jobs = validate_n_jobs(n_jobs)
+        self.split_format = split_format
+        self.split_column_stats = split_column_stats
+        self.manifest = manifest
+        self.skip_failed = skip_failed
+
+        self.failed_files = {}
 
         if rotation:
             self.u_var = u_var
@@ -323,24 +520,32 @@ class FileSplitterMulti:
     def run(self):
         outdirs = self._setup_output_dirs()
         filelist = self._search_files()
+        if self.manifest is not None and not filelist:
+            print("\nNo new or changed files found since the previous run.")
+            return
         files_overview_df = self._detect_files(filelist=filelist)
         self._split_files(files_overview_df=files_overview_df, outdirs=outdirs)
+        if self.manifest is not None:
+            self._update_manifest(files_overview_df=files_overview_df)
 
-    def _split_files(self, files_overview_df: DataFrame, outdirs: dict):
-        filecounter = 0
-        coll_filestats_df = DataFrame()
-        coll_splitstats_df = DataFrame()
+    def _update_manifest(self, files_overview_df: DataFrame):
+        # Add files that were split successfully
+        available = files_overview_df['file_available'] == 1
+        split_files = [f for f, name in zip(files_overview_df.loc[available, 'filepath'],
+                                            files_overview_df.loc[available, 'filename'])
+                       if name not in self.failed_files]
+        self.manifest.add(filepaths=split_files)
 
-        # Split files into smaller files
+    def _split_files(self, files_overview_df: DataFrame, outdirs: dict):
+        # Settings for each available file
+        tasks = []
         for file_idx, file_info_row in files_overview_df.iterrows():
 
             # Check file availability
             if file_info_row['file_available'] == 0:
                 continue
 
-            filecounter += 1
-
-            fs = FileSplitter(
+            tasks.append(dict(
                 filepath=file_info_row['filepath'],
                 filename_pattern=self.filename_pattern,  # Accepts regex
                 filename_date_format=self.filename_date_format,  # Date format in filename
@@ -359,26 +564,63 @@ class FileSplitterMulti:
                 w_var=self.w_var,
                 c_var=self.c_var,
                 compress_splits=self.compress_splits,
-                outfile_limit_n_rows=self.outfile_limit_n_rows
-            )
-            fs.run()
-            filestats_df, splitstats_df = fs.get_stats()
-
-            if filecounter == 1:
-                coll_filestats_df = filestats_df.copy()
-                coll_splitstats_df = splitstats_df.copy()
-            else:
-                coll_filestats_df = pd.concat([coll_filestats_df, filestats_df], axis=0, ignore_index=False)
-                coll_splitstats_df = pd.concat([coll_splitstats_df, splitstats_df], axis=0, ignore_index=False)
+                outfile_limit_n_rows=self.outfile_limit_n_rows,
+                chunk_rows=self.chunk_rows,
+                split_format=self.split_format,
+                split_column_stats=self.split_column_stats
+            ))
+
+        # Split files into smaller files
+        results = self._run_tasks(tasks=tasks)
+
+        # Collect stats in file order
+        self.failed_files = {tasks[ix]['file_name']: results[ix][2] for ix in range(len(tasks)) if results[ix][2]}
+        filestats = [results[ix][0] for ix in range(len(tasks)) if not results[ix][2]]
+        splitstats = [results[ix][1] for ix in range(len(tasks)) if not results[ix][2]]
+        coll_filestats_df = pd.concat(filestats, axis=0, ignore_index=False) if filestats else DataFrame()
+        coll_splitstats_df = pd.concat(splitstats, axis=0, ignore_index=False) if splitstats else DataFrame()
 
-            # if filecounter == 3:
-            #     break
+        if self.failed_files:
+            print(f"\n(!)WARNING {len(self.failed_files)} of {len(tasks)} files could not be split:")
+            for filename in self.failed_files.keys():
+                print(f"    --> {filename}")
 
         # Export
         files_overview_df.to_csv(outdirs['stats'] / '0_files_overview.csv')
         coll_filestats_df.to_csv(outdirs['stats'] / '1_filestats.csv')
         coll_splitstats_df.to_csv(outdirs['stats'] / '2_splitstats.csv')
 
+    def _run_tasks(self, tasks: list) -> list:
+        """Split files serially or in worker processes, results are in the order of *tasks*"""
+        results = [None] * len(tasks)
+        tic = time.time()
+
+        def report(ix: int, n_done: int):
+            status = "(!)ERROR" if results[ix][2] else "Finished"
+            print(f"\n[{n_done}/{len(tasks)}] {status} splitting file {tasks[ix]['file_name']} "
+                  f"({time.time() - tic:.1f} seconds since start).")
+            if results[ix][2]:
+                print(results[ix][2])
+
+        if self.n_jobs == 1 or len(tasks) < 2:
+            for ix, task in enumerate(tasks):
+                results[ix] = _split_file(task, skip_failed=self.skip_failed)
+                report(ix=ix, n_done=ix + 1)
+            return results
+
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as ex:
+            futures = {ex.submit(_split_file, task, self.skip_failed): ix for ix, task in enumerate(tasks)}
+            try:
+                for n_done, future in enumerate(as_completed(futures), start=1):
+                    ix = futures[future]
+                    results[ix] = future.result()
+                    report(ix=ix, n_done=n_done)
+            except BaseException:
+                # Files that were not started yet are not split
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise
+        return results
+
     def _detect_files(self, filelist: list) -> DataFrame:
         # Detect expected and unexpected files from filelist
         print("\nDetecting expected and unexpected files from filelist ...")
@@ -395,7 +637,8 @@ class FileSplitterMulti:
     def _setup_output_dirs(self) -> dict:
         # Create output dirs
         print(f"\nCreating output dirs in folder {self.outdir} ...")
-        outdirs = setup_output_dirs(outdir=self.outdir, del_previous_results=True)
+        # Splits of previous runs are kept when only new files are split
+        outdirs = setup_output_dirs(outdir=self.outdir, del_previous_results=self.manifest is None)
         for folder, path in outdirs.items():
             print(f"    --> Created folder {folder} in {path}.")
         return outdirs
@@ -403,7 +646,8 @@ class FileSplitterMulti:
     def _search_files(self) -> list:
         # Search files with PATTERN
         print(f"\nSearching files with pattern {self.filename_pattern} in dir {self.searchdirs} ...")
-        filelist = search_files(searchdirs=self.searchdirs, pattern=self.filename_pattern)
+        filelist = search_files(searchdirs=self.searchdirs, pattern=self.filename_pattern,
+                                manifest=self.manifest, update_manifest=False)
         for filepath in filelist:
             print(f"    --> Found file: {filepath.name} in {filepath}.")
         return filelist
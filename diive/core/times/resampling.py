@@ -109,9 +109,9 @@ def resample_series_to_30MIN(series: Series,
     # Sanitize resampled timestamp index
     if not agg_ser.empty:
         if output_timestamp_shows == 'middle':
-            agg_ser = TimestampSanitizer(data=agg_ser).get()
+            agg_ser = TimestampSanitizer(data=agg_ser, inplace=True).get()
         elif output_timestamp_shows == 'end':
-            agg_ser = TimestampSanitizer(data=agg_ser, output_middle_timestamp=False).get()
+            agg_ser = TimestampSanitizer(data=agg_ser, output_middle_timestamp=False, inplace=True).get()
 
     # agg_df = sanitize_timestamp_index(data=agg_df, freq='30T')
 
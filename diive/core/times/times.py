@@ -1,6 +1,7 @@
 import datetime as dt
 import fnmatch
 import time
+import weakref
 from typing import Literal
 
 import numpy as np
@@ -9,17 +10,31 @@ from pandas import DataFrame, Series, DatetimeIndex
 from pandas.tseries.frequencies import to_offset
 
 
-def format_timestamp_to_fluxnet_format(df: DataFrame, timestamp_col: str) -> Series:
+def format_timestamp_to_fluxnet_format(df: DataFrame, timestamp_col: str, as_integer: bool = False) -> Series:
     """Apply FLUXNET timestamp format (YYYYMMDDhhmm) to timestamp columns (not index).
 
-    Timestamp must be available as data column.
+    Timestamp must be available as data column. The format is calculated from
+    the date and time components of all timestamps at once.
+
+    Args:
+        df: Data with timestamp column
+        timestamp_col: Name of the timestamp column
+        as_integer: If *True*, timestamps are returned as integers (e.g. 202201010030)
+            instead of strings, integers are written the same way to CSV files.
     """
     print(f"\nFormatting timestamp column {timestamp_col} to %Y%m%d%H%M ...")
-    timestamp = df[timestamp_col].dt.strftime('%Y%m%d%H%M')
+    if df[timestamp_col].isnull().any():
+        timestamp = df[timestamp_col].dt.strftime('%Y%m%d%H%M')
+        return timestamp
+    ts = df[timestamp_col].dt
+    timestamp = (ts.year.astype('int64') * 100000000 + ts.month.astype('int64') * 1000000
+                 + ts.day.astype('int64') * 10000 + ts.hour.astype('int64') * 100 + ts.minute.astype('int64'))
+    if not as_integer:
+        timestamp = timestamp.astype(str)
     return timestamp
 
 
-def detect_freq_groups(index: DatetimeIndex) -> Series:
+def detect_freq_groups(index: DatetimeIndex, segments: bool = False) -> Series or tuple[Series, DataFrame]:
     """
     Analyze timestamp for records where the time resolution is absolutely certain
 
@@ -66,85 +81,106 @@ def detect_freq_groups(index: DatetimeIndex) -> Series:
         are discarded. This typically affects only a handful of records during the transition
         period(s).
 
+    The time differences are calculated on the integer representation of the
+    timestamps, no timestamp objects are created.
+
     Args:
-        index: Time series dataframe
+        index: Timestamp index
+        segments: If *True*, also return the table of segments with constant time
+            difference, see *detect_freq_segments*
 
     Returns:
-        df: Time series dataframe with the new column 'FREQ_AUTO_SEC' added
+        Series 'FREQ_AUTO_SEC' with the time resolution of each record in seconds,
+        and the segment table if *segments* is *True*
 
     :: Added in v0.43.0
     """
 
-    groups_ser = pd.Series(index=index, data=np.nan, name='FREQ_AUTO_SEC')
-    # index['FREQ_AUTO_SEC'] = np.nan
-
-    # Analyse data for different time resolutions
-    timedeltas_df = pd.DataFrame()
-    timedeltas_df['TIMESTAMP_CURRENT'] = index
-
-    # Add previous and next timestamps
-    timedeltas_df['TIMESTAMP_PREV'] = timedeltas_df['TIMESTAMP_CURRENT'].shift(1)
-    timedeltas_df['TIMESTAMP_NEXT'] = timedeltas_df['TIMESTAMP_CURRENT'].shift(-1)
-
-    # DELTA is the difference between the current and the previous/next timestamp,
-    # expressed as total seconds
-    timedeltas_df['DELTA_PREV'] = timedeltas_df['TIMESTAMP_PREV'].sub(timedeltas_df['TIMESTAMP_CURRENT'])
-    timedeltas_df['DELTA_NEXT'] = timedeltas_df['TIMESTAMP_NEXT'].sub(timedeltas_df['TIMESTAMP_CURRENT'])
-    timedeltas_df['DELTA_PREV'] = timedeltas_df['DELTA_PREV'].dt.total_seconds()
-    timedeltas_df['DELTA_NEXT'] = timedeltas_df['DELTA_NEXT'].dt.total_seconds()
-
-    # The sum of DELTA_PREV and DELTA_NEXT can identify data records where
-    # the time resolution is unambiguous.
-    # For example: DELTA_PREV = -60, DELTA_NEXT = +60, DELTA_DIFF = 0
-    #   In this case the time differences of the current timestamp to
-    #   the previous and next timestamps are the same (in absolute terms)
-    #   and therefore yields the sum zero.
-    timedeltas_df['DELTA_DIFF'] = timedeltas_df['DELTA_PREV'] + timedeltas_df['DELTA_NEXT']
-    ix = timedeltas_df['DELTA_DIFF'] == 0
-    timedelta_unambiguous_df = timedeltas_df.loc[ix].copy()
-    timedelta_unambiguous_df.set_index(timedelta_unambiguous_df['TIMESTAMP_CURRENT'], inplace=True)
-
-    # Count occurrences of respective DELTA
-    delta_counts_df = timedelta_unambiguous_df['DELTA_NEXT'].groupby(
-        timedelta_unambiguous_df['DELTA_NEXT']).count().sort_values(ascending=False)
-    delta_counts_df = pd.DataFrame(delta_counts_df)
-    delta_counts_df.rename(columns={"DELTA_NEXT": "COUNTS"}, inplace=True)
-
-    # Calculate how much time is covered by each DELTA
-    delta_counts_df['DELTA_NEXT'] = delta_counts_df.index
-    delta_counts_df['DELTA_TOTAL_TIME'] = delta_counts_df['DELTA_NEXT'].multiply(delta_counts_df['COUNTS'])
-    delta_counts_df['TOTAL_TIME'] = delta_counts_df['DELTA_TOTAL_TIME'].sum()
-    delta_counts_df['%_DELTA_TOTAL_TIME'] = delta_counts_df['DELTA_TOTAL_TIME'] / delta_counts_df['TOTAL_TIME']
-    delta_counts_df['%_DELTA_TOTAL_TIME'] = delta_counts_df['%_DELTA_TOTAL_TIME'] * 100
-
-    # List of found time resolutions (unambiguous)
-    deltas = delta_counts_df['DELTA_NEXT'].to_list()
-
-    # Detect first and last date for each delta
-    # First and last dates need to be included by using:
-    #   - 'TIMESTAMP_PREV' for first date
-    #   - 'TIMESTAMP_NEXT' for last date
-    for d in deltas:
-        this_delta = timedelta_unambiguous_df.loc[timedelta_unambiguous_df['DELTA_NEXT'] == d].copy()
-        this_delta.set_index(this_delta['TIMESTAMP_CURRENT'], inplace=True)
-        first_date = this_delta['TIMESTAMP_PREV'].min()
-        last_date = this_delta['TIMESTAMP_NEXT'].max()
-
-        # Add first and last date to df
-        new_index = this_delta.index.union([first_date, last_date])
-        this_delta = this_delta.reindex(new_index)
-
-        groups_ser.loc[this_delta.index] = d
-
-        # freq = f"{int(d)}S"
-        # _index = pd.date_range(start=first_date, end=last_date, freq=freq)
-        # this_delta.reindex(_index)
-        delta_counts_df.loc[d, 'FIRST_DATE'] = first_date
-        delta_counts_df.loc[d, 'LAST_DATE'] = last_date
+    # Timestamps and time differences as integers, in units of the index (e.g. nanoseconds)
+    timestamps = index.asi8
+    per_second = np.timedelta64(1, 's') // np.timedelta64(1, index.unit)
+    deltas_next = np.diff(timestamps)
+    groups = np.full(len(index), np.nan)
+
+    # The time difference to the previous and to the next record is the same for
+    # records where the time resolution is unambiguous. Record i has the previous
+    # delta deltas_next[i - 1] and the next delta deltas_next[i].
+    unambiguous = np.flatnonzero(deltas_next[:-1] == deltas_next[1:]) + 1
+    unambiguous_deltas = deltas_next[unambiguous]
+
+    # Count occurrences of respective delta, most frequent delta first,
+    # records of less frequent deltas overwrite first and last records of
+    # more frequent deltas
+    found_deltas, counts = np.unique(unambiguous_deltas, return_counts=True)
+    delta_counts = pd.Series(counts, index=found_deltas / per_second).sort_values(ascending=False)
+    order = np.argsort(unambiguous_deltas, kind='stable')
+    bounds = np.searchsorted(unambiguous_deltas[order], found_deltas, side='left')
+    bounds = np.append(bounds, len(order))
+    pos_of_delta = {d: k for k, d in enumerate(found_deltas / per_second)}
+
+    # The first and last records of each delta are the previous record of its
+    # earliest record and the next record of its latest record
+    is_sorted_unique = index.is_monotonic_increasing and index.is_unique
+    for d in delta_counts.index:
+        k = pos_of_delta[d]
+        locs = unambiguous[order[bounds[k]:bounds[k + 1]]]
+        first_date = timestamps[locs - 1].min()
+        last_date = timestamps[locs + 1].max()
+        if is_sorted_unique:
+            locs = np.concatenate([locs, np.searchsorted(timestamps, [first_date, last_date])])
+            groups[locs] = d
+        else:
+            # Labels can occur more than once, all records with these labels are set
+            labels = np.concatenate([timestamps[locs], [first_date, last_date]])
+            groups[np.isin(timestamps, labels)] = d
 
+    groups_ser = pd.Series(index=index, data=groups, name='FREQ_AUTO_SEC')
+    if segments:
+        return groups_ser, detect_freq_segments(index=index)
     return groups_ser
 
 
+def detect_freq_segments(index: DatetimeIndex) -> DataFrame:
+    """
+    Detect segments of consecutive records with constant time difference
+
+    A segment starts at a record and continues as long as the time difference
+    between subsequent records stays the same. Neighboring segments share the
+    record where the time difference changes.
+
+    Args:
+        index: Timestamp index
+
+    Returns:
+        DataFrame with one row per segment and the columns 'START' and 'END' (first
+        and last timestamp of the segment), 'DELTA_SEC' (time difference between
+        records in seconds) and 'COUNT' (number of records in the segment)
+
+    Example:
+        For a timestamp with 10MIN time resolution that changes to 1MIN,
+        with a short transition period:
+
+                        START                 END  DELTA_SEC  COUNT
+        0 2020-10-01 00:00:00 2020-10-14 21:10:00      600.0   2000
+        1 2020-10-14 21:10:00 2020-10-14 21:10:07        7.0      2
+        2 2020-10-14 21:10:07 2020-10-14 21:11:05       29.0      3
+        3 2020-10-14 21:11:05 2020-10-18 08:31:05       60.0   5001
+    """
+    timestamps = index.asi8
+    per_second = np.timedelta64(1, 's') // np.timedelta64(1, index.unit)
+    deltas = np.diff(timestamps)
+    # Run-length encoding of the time differences
+    breaks = np.flatnonzero(deltas[1:] != deltas[:-1]) + 1
+    run_starts = np.concatenate([[0], breaks]) if len(deltas) else np.array([], dtype=int)
+    run_ends = np.concatenate([breaks, [len(deltas)]]) if len(deltas) else np.array([], dtype=int)
+    return pd.DataFrame({
+        'START': index[run_starts],
+        'END': index[run_ends],
+        'DELTA_SEC': deltas[run_starts] / per_second,
+        'COUNT': run_ends - run_starts + 1,
+    })
+
+
 class TimestampSanitizer:
 
     def __init__(self,
@@ -155,6 +191,8 @@ class TimestampSanitizer:
                  sort_ascending: bool = True,
                  remove_duplicates: bool = True,
                  regularize: bool = True,
+                 inplace: bool = False,
+                 nominal_freq: str = None,
                  verbose: bool = False):
         """
         Validate and prepare timestamps for further processing
@@ -171,6 +209,13 @@ class TimestampSanitizer:
         The `TimestampSanitizer` class acts as a wrapper to combine various
         timestamp functions.
 
+        Steps are skipped if the timestamp already satisfies them, e.g. a sorted
+        timestamp is not sorted again. A timestamp index that is sorted, unique
+        and has a frequency (*index.freq*) is already continuous, then only the
+        naming is validated and the timestamp converted to the middle of the
+        averaging period (if needed). This makes repeated sanitizing of the
+        same data cheap.
+
         Args:
             data:
             output_middle_timestamp:
@@ -186,6 +231,14 @@ class TimestampSanitizer:
                 Remove duplicates in the timestamp index (keep last)
             regularize:
                 Generate continuous timestamp of given frequency between first and last date of index
+            inplace:
+                If *True*, *data* is not copied before sanitizing. Steps that change the
+                timestamp can then also change *data*, only the data returned by *get*
+                should be used afterward.
+            nominal_freq:
+                Time resolution of the timestamp, e.g. '30min'. If given, the time
+                resolution is not detected from the timestamp, e.g. when parts of
+                the same file are sanitized separately.
             verbose:
                 Generate more text output if *True*
 
@@ -195,7 +248,7 @@ class TimestampSanitizer:
             data: Data with timestamp index
             output_middle_timestamp:
         """
-        self.data = data.copy()
+        self.data = data if inplace else data.copy()
         self.output_middle_timestamp = output_middle_timestamp
         self.validate_naming = validate_naming
         self.convert_to_datetime = convert_to_datetime
@@ -204,7 +257,7 @@ class TimestampSanitizer:
         self.regularize = regularize
         self.verbose = verbose
 
-        self.inferred_freq = None if not data.index.freq else data.index.freq
+        self.inferred_freq = nominal_freq if nominal_freq else data.index.freq
 
         self._run()
 
@@ -219,16 +272,34 @@ class TimestampSanitizer:
         if self.validate_naming:
             _ = validate_timestamp_naming(data=self.data, verbose=self.verbose)
 
+        # Sorted, unique timestamp with freq is already continuous
+        if self._is_clean():
+            if self.verbose:
+                print(f"Timestamp {self.data.index.name} is sorted, unique and continuous "
+                      f"with time resolution {self.data.index.freqstr}, skipping checks ...")
+        else:
+            self._sanitize()
+
+        # Convert timestamp to middle
+        if self.output_middle_timestamp:
+            self.data = convert_series_timestamp_to_middle(data=self.data, verbose=self.verbose)
+
+    def _is_clean(self) -> bool:
+        """Check if sorting, removing duplicates and regularizing would not change the timestamp"""
+        index = self.data.index
+        return isinstance(index, DatetimeIndex) and index.freq is not None and index.freq.n > 0
+
+    def _sanitize(self):
         # Convert timestamp to datetime
-        if self.convert_to_datetime:
+        if self.convert_to_datetime and not isinstance(self.data.index, DatetimeIndex):
             self.data = convert_timestamp_to_datetime(self.data, verbose=self.verbose)
 
         # Sort timestamp index ascending
-        if self.sort_ascending:
+        if self.sort_ascending and not self.data.index.is_monotonic_increasing:
             self.data = sort_timestamp_ascending(self.data, verbose=self.verbose)
 
         # Remove index duplicates
-        if self.remove_duplicates:
+        if self.remove_duplicates and not self.data.index.is_unique:
             self.data = remove_index_duplicates(data=self.data, keep='last', verbose=self.verbose)
 
         # Detect time resolution from data
@@ -239,10 +310,6 @@ class TimestampSanitizer:
         if self.regularize:
             self.data = continuous_timestamp_freq(data=self.data, freq=self.inferred_freq, verbose=self.verbose)
 
-        # Convert timestamp to middle
-        if self.output_middle_timestamp:
-            self.data = convert_series_timestamp_to_middle(data=self.data, verbose=self.verbose)
-
 
 def sort_timestamp_ascending(data: Series or DataFrame, verbose: bool = False) -> Series or DataFrame:
     """Sort timestamp in ascending order"""
@@ -277,6 +344,141 @@ def convert_timestamp_to_datetime(data: Series or DataFrame, verbose: bool = Fal
     return data
 
 
+# Formats of timestamps given as digits only, e.g. 202207010030, and the number
+# of digits of the year, month, day, hour, minute and second fields they contain
+_DIGITS_FORMATS = {
+    '%Y%m%d': 8,
+    '%Y%m%d%H': 10,
+    '%Y%m%d%H%M': 12,
+    '%Y%m%d%H%M%S': 14,
+}
+
+# Directives that refer to the date, timestamp columns after the first column must not contain them
+_DATE_DIRECTIVES = ['%Y', '%y', '%m', '%d', '%j', '%b', '%B', '%U', '%W']
+
+
+def parse_timestamp_columns(columns: list[Series], datetime_format: str) -> pd.Index:
+    """
+    Convert one or more timestamp columns to one datetime index
+
+    Specialized converters are used for the timestamp formats that are found
+    in the filetype settings, which is much faster than joining the columns to
+    strings and parsing these strings:
+    - Timestamps given as digits only, e.g. '%Y%m%d%H%M' or '%Y%m%d%H%M%S' in
+      FLUXNET and ICOS files, are read as integers by the parser and converted
+      with integer arithmetic.
+    - Timestamps in multiple columns, e.g. the date and time columns in EddyPro
+      full_output files (format '%Y-%m-%d %H:%M'), are converted column by column.
+      Only the unique values of each column are converted, the date of a daily
+      file has only one unique value and the time of a 30MIN file has 48.
+    - Timestamps in one column with any other format are converted with the
+      given format.
+
+    If a specialized converter cannot convert the timestamps, they are converted
+    the same way *pd.read_csv* converts them with *parse_dates*: columns are joined
+    to strings and converted with *datetime_format*. If this conversion also fails,
+    the joined strings are returned.
+
+    Args:
+        columns: Timestamp columns, in the order they appear in *datetime_format*
+        datetime_format: Format of the timestamp, e.g. '%Y%m%d%H%M'. For multiple
+            columns, the formats of the columns are separated by a space.
+
+    Returns:
+        datetime index, or index of strings if conversion failed
+    """
+    try:
+        if len(columns) == 1 and datetime_format in _DIGITS_FORMATS:
+            return _digits_to_datetime(values=columns[0], datetime_format=datetime_format)
+        if len(columns) > 1:
+            return _columns_to_datetime(columns=columns, datetime_format=datetime_format)
+        return pd.DatetimeIndex(pd.to_datetime(columns[0], format=datetime_format))
+    except (ValueError, TypeError):
+        pass
+
+    # Fallback, same as pd.read_csv
+    strs = columns[0].astype(str)
+    for col in columns[1:]:
+        strs = strs + ' ' + col.astype(str)
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(strs, format=datetime_format))
+    except (ValueError, TypeError):
+        return pd.Index(strs)
+
+
+def _digits_to_datetime(values: Series, datetime_format: str) -> DatetimeIndex:
+    """Convert integer timestamps like 202207010030 with integer arithmetic
+
+    Missing timestamps make the parser read the digits as floats, missing
+    values are converted to NaT.
+    """
+    if values.dtype.kind == 'f':
+        v = values.to_numpy()
+        missing = np.isnan(v)
+        if np.any(v[~missing] != np.floor(v[~missing])):
+            raise ValueError("Timestamp digits are not integers.")
+        timestamps = np.full(len(v), np.datetime64('NaT'), dtype='datetime64[ns]')
+        timestamps[~missing] = _int_digits_to_datetime64(v=v[~missing].astype(np.int64),
+                                                         datetime_format=datetime_format)
+        return pd.DatetimeIndex(timestamps)
+    if values.dtype.kind not in 'iu':
+        raise ValueError("Timestamp digits were not parsed as numbers.")
+    return pd.DatetimeIndex(_int_digits_to_datetime64(v=values.to_numpy(dtype=np.int64),
+                                                      datetime_format=datetime_format))
+
+
+def _int_digits_to_datetime64(v: np.ndarray, datetime_format: str) -> np.ndarray:
+    n_digits = _DIGITS_FORMATS[datetime_format]
+    if (v < 10 ** (n_digits - 1)).any() or (v >= 10 ** n_digits).any():
+        raise ValueError(f"Timestamps do not have {n_digits} digits.")
+
+    # Split digits into fields, from right to left
+    fields = {}
+    for field in ['second', 'minute', 'hour'][(14 - n_digits) // 2:]:
+        fields[field] = v % 100
+        v = v // 100
+    day = v % 100
+    v = v // 100
+    month = v % 100
+    year = v // 100
+    hour = fields.get('hour', 0)
+    minute = fields.get('minute', 0)
+    second = fields.get('second', 0)
+    if np.any((month < 1) | (month > 12)) or np.any(day < 1) \
+            or np.any(hour > 23) or np.any(minute > 59) or np.any(second > 59):
+        raise ValueError("Timestamps contain invalid dates or times.")
+
+    month_start = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(int)
+    if np.any(day > days_in_month):
+        raise ValueError("Timestamps contain invalid dates.")
+
+    seconds = (day - 1) * 86400 + hour * 3600 + minute * 60 + second
+    timestamps = month_start.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+    return timestamps.astype('datetime64[ns]')
+
+
+def _columns_to_datetime(columns: list[Series], datetime_format: str) -> DatetimeIndex:
+    """Convert multiple timestamp columns separately, only unique values are converted"""
+    formats = datetime_format.split(' ')
+    if len(formats) != len(columns):
+        raise ValueError("Number of timestamp columns and formats do not match.")
+    if any(d in f for f in formats[1:] for d in _DATE_DIRECTIVES):
+        raise ValueError("Only the first timestamp column can contain the date.")
+    timestamps = None
+    for col, fmt in zip(columns, formats):
+        codes, uniques = pd.factorize(col)
+        if (codes < 0).any():
+            raise ValueError("Timestamp columns contain missing values.")
+        converted = pd.to_datetime(uniques.astype(str), format=fmt)
+        if timestamps is None:
+            timestamps = converted.to_numpy()[codes]
+        else:
+            # Time-only formats are converted to times on 1900-01-01
+            timestamps = timestamps + (converted - pd.Timestamp('1900-01-01')).to_numpy()[codes]
+    return pd.DatetimeIndex(timestamps)
+
+
 def validate_timestamp_naming(data: Series or DataFrame, verbose: bool = False) -> str:
     """
     Check if timestamp is correctly named
@@ -512,86 +714,134 @@ def build_timestamp_range(start_dt, df_len, freq):
     return date_rng
 
 
-def include_timestamp_as_cols(df,
-                              year: bool = True,
-                              season: bool = True,
-                              month: bool = True,
-                              week: bool = True,
-                              doy: bool = True,
-                              hour: bool = True,
-                              txt: str = "",
-                              verbose: int = 1) -> DataFrame:
-    """
-    Include timestamp info as data columns
+# Timestamp features of previous calls, by id of the index
+_TIMESTAMP_FEATURES = {}
 
-    Kudos:
-    - https://datascience.stackexchange.com/questions/60951/is-it-necessary-to-convert-labels-in-string-to-integer-for-scikit-learn-and-xgbo
-    - https://scikit-learn.org/stable/modules/generated/sklearn.preprocessing.OneHotEncoder.html
+# Meteorological season of each month (index 1-12): 1=spring, 2=summer, 3=autumn, 4=winter
+_SEASON_OF_MONTH = np.array([0, 4, 4, 1, 1, 1, 2, 2, 2, 3, 3, 3, 4], dtype=np.int8)
 
-    """
-    print("\nAdding timestamp as data columns ...")
 
-    df = df.copy()
-    newcols = []
+def timestamp_features(index: DatetimeIndex,
+                       year: bool = True,
+                       season: bool = True,
+                       month: bool = True,
+                       week: bool = True,
+                       doy: bool = True,
+                       hour: bool = True) -> DataFrame:
+    """Calendar info of timestamps as compact integer columns
 
-    if year:
-        year_col = '.YEAR'
-        newcols.append(year_col)
-        df[year_col] = df.index.year.astype(int)
+    All columns are calculated at once from the int64 representation of the
+    timestamp. Year and day of year are stored as int16, season, month, (ISO) week
+    and hour as int8. Combinations of year with month, day of year and week are
+    stored as int32, e.g. YEAR2023+MONTH8 = 20238, and are only added when both
+    parts are included. Timezone-aware timestamps are used in local time.
 
-    if season:
-        season_col = '.SEASON'
-        newcols.append(season_col)
-        df[season_col] = insert_season(timestamp=df.index)
+    Features are memoized per index as long as the index exists, calling the
+    function again for the same index does not calculate the features again.
 
-    if month:
-        month_col = '.MONTH'
-        newcols.append(month_col)
-        df[month_col] = df.index.month.astype(int)
+    Args:
+        index: timestamp of time series
+        year, season, month, week, doy, hour: include column
 
+    Returns:
+        timestamp features with *index* as index
+    """
+    flags = (year, season, month, week, doy, hour)
+    memoized = _TIMESTAMP_FEATURES.get(id(index))
+    if memoized and memoized[0]() is index and memoized[1] == flags:
+        return DataFrame(memoized[2], index=index)
+
+    local_index = index.tz_localize(None) if index.tz is not None else index
+    ns = np.asarray(local_index, dtype='datetime64[ns]')
+    days = ns.astype('datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    months = days.astype('datetime64[M]')
+    _year = years.astype(np.int64) + 1970
+    _month = (months.astype(np.int64) % 12) + 1
+    _doy = (days - years.astype('datetime64[D]')).astype(np.int64) + 1
+    _hour = (ns - days).astype('timedelta64[h]').astype(np.int64)
+
+    # ISO week: week of the Thursday of the same week (Monday to Sunday)
+    daynum = days.astype(np.int64)
+    thursday = daynum - (daynum + 3) % 7 + 3  # 1970-01-01 was a Thursday
+    thursday_yearstart = thursday.astype('datetime64[D]').astype('datetime64[Y]').astype('datetime64[D]')
+    _week = (thursday - thursday_yearstart.astype(np.int64)) // 7 + 1
+
+    cols = {}
+    if year:
+        cols['.YEAR'] = _year.astype(np.int16)
+    if season:
+        cols['.SEASON'] = _SEASON_OF_MONTH[_month]
+    if month:
+        cols['.MONTH'] = _month.astype(np.int8)
     if week:
-        week_col = '.WEEK'
-        newcols.append(week_col)
-        df[week_col] = df.index.isocalendar().week.astype(int)
-
+        cols['.WEEK'] = _week.astype(np.int8)
     if doy:
-        doy_col = '.DOY'
-        newcols.append(doy_col)
-        df[doy_col] = df.index.dayofyear.astype(int)
-
+        cols['.DOY'] = _doy.astype(np.int16)
     if hour:
-        hour_col = '.HOUR'
-        newcols.append(hour_col)
-        df[hour_col] = df.index.hour.astype(int)
+        cols['.HOUR'] = _hour.astype(np.int8)
 
     # Year and month: YEAR2023+MONTH8 = 20238
-    yearmonth_col = '.YEARMONTH'
-    newcols.append(yearmonth_col)
-    df[yearmonth_col] = (df[year_col].astype(str) + df[month_col].astype(str)).astype(int)
-
     # Year and DOY: YEAR2023+DOY194 = 2023194
-    yeardoy_col = '.YEARDOY'
-    newcols.append(yeardoy_col)
-    df[yeardoy_col] = (df[year_col].astype(str) + df[doy_col].astype(str)).astype(int)
-
     # Year and week: YEAR2023+WEEK15 = 202315
-    yearweek_col = '.YEARWEEK'
-    newcols.append(yearweek_col)
-    df[yearweek_col] = (df[year_col].astype(str) + df[week_col].astype(str)).astype(int)
+    for col, included, part in [('.YEARMONTH', month, _month),
+                                ('.YEARDOY', doy, _doy),
+                                ('.YEARWEEK', week, _week)]:
+        if year and included:
+            cols[col] = (_year * _ndigits_factor(part) + part).astype(np.int32)
+
+    # Forget features when the index is deleted, only the columns are stored
+    # because a stored DataFrame would keep the index alive
+    key = id(index)
+    ref = weakref.ref(index, lambda _, key=key: _TIMESTAMP_FEATURES.pop(key, None))
+    _TIMESTAMP_FEATURES[key] = (ref, flags, cols)
+    return DataFrame(cols, index=index)
+
 
-    # yearmonthweekdoy_col = '.YEARMONTHWEEKDOY'
+def _ndigits_factor(values: np.ndarray) -> np.ndarray:
+    """Power of ten to shift digits left of positive integers *values*, e.g. 10 for 8 and 1000 for 194"""
+    return np.where(values >= 100, 1000, np.where(values >= 10, 100, 10))
 
-    # yearmonthweek_col = '.YEARMONTHWEEK'
-    # weekhour_col = '.WEEKHOUR'
 
-    # Combined variables
+def include_timestamp_as_cols(df,
+                              year: bool = True,
+                              season: bool = True,
+                              month: bool = True,
+                              week: bool = True,
+                              doy: bool = True,
+                              hour: bool = True,
+                              txt: str = "",
+                              verbose: int = 1,
+                              features: DataFrame = None) -> DataFrame:
+    """
+    Include timestamp info as data columns
+
+    Columns are created with *timestamp_features*.
+
+    Kudos:
+    - https://datascience.stackexchange.com/questions/60951/is-it-necessary-to-convert-labels-in-string-to-integer-for-scikit-learn-and-xgbo
+    - https://scikit-learn.org/stable/modules/generated/sklearn.preprocessing.OneHotEncoder.html
+
+    Args:
+        features: timestamp features from *timestamp_features* for the index of *df*,
+            e.g. from a previous call, calculated if *None*
 
-    # Year and month and week: YEAR2023+MONTH8+WEEK15 = 2023815
-    # df[yearmonthweek_col] = (df[year_col].astype(str) + df[month_col].astype(str) + df[week_col].astype(str)).astype(
-    #     int)
+    """
+    print("\nAdding timestamp as data columns ...")
 
-    # Week and hour: WEEK42+HOUR22 = 4222
-    # df[weekhour_col] = (df[week_col].astype(str) + df[hour_col].astype(str)).astype(int)
+    if features is None:
+        features = timestamp_features(index=df.index, year=year, season=season, month=month,
+                                      week=week, doy=doy, hour=hour)
+    newcols = features.columns.tolist()
+    features = features.set_axis(df.index, axis=0)
+    # Columns that already exist are replaced in place, other columns are appended
+    existing = [c for c in newcols if c in df.columns]
+    appended = [c for c in newcols if c not in df.columns]
+    if existing:
+        df = df.copy()
+        for col in existing:
+            df[col] = features[col]
+    df = pd.concat([df, features[appended]], axis=1)
 
     if verbose > 0:
         print(f"Added timestamp as columns: {newcols} {txt}")
@@ -614,29 +864,36 @@ def insert_season(timestamp: DatetimeIndex) -> Series:
     Returns:
         season series with timestamp
     """
+    month = timestamp.month
+    season = pd.Series(data=_SEASON_OF_MONTH[month].astype(month.dtype), index=timestamp)
+    return season
 
-    winter = [1, 2, 12]
-    spring = [3, 4, 5]
-    summer = [6, 7, 8]
-    autumn = [9, 10, 11]
-    season = pd.Series(data=timestamp.month, index=timestamp)
-
-    is_winter = season.isin(winter)
-    is_spring = season.isin(spring)
-    is_summer = season.isin(summer)
-    is_autumn = season.isin(autumn)
-
-    season[is_spring] = 1
-    season[is_summer] = 2
-    season[is_autumn] = 3
-    season[is_winter] = 4
 
-    return season
+# Detected frequencies, memoized per index object, see *DetectFrequency*
+_DETECTED_FREQS = {}
 
 
 class DetectFrequency:
     """Detect data time resolution from time series index
 
+    The time resolution is detected with up to three approaches:
+        - from full data: *pd.infer_freq* on the full index
+        - from timedelta: most frequent time difference between records,
+          used if it occurs for more than 90% of the records
+        - from progressive: *pd.infer_freq* on records at start and end of the index
+
+    The confidence of the detected time resolution is MAXIMUM if all approaches yield
+    the same result or if the full data have a consistent timestamp, HIGH if it was
+    detected from the most frequent time difference and MEDIUM if it was detected from
+    records at start and end.
+
+    The time differences between all records are counted once (histogram of the
+    integer time differences). Approaches that cannot change the result are
+    skipped, e.g. if the full data have no consistent timestamp but the most
+    frequent time difference is found, the progressive approach is not needed.
+
+    Results are memoized per index object, detecting the time resolution of the
+    same index again returns the stored result.
 
     - Example notebook available in:
         notebooks/TimeStamps/Detect_time_resolution.ipynb
@@ -651,15 +908,47 @@ class DetectFrequency:
         # self.freq_expected = freq_expected
         self.num_datarows = self.index.__len__()
         self.freq = None
+        self.confidence = None
         self._run()
 
     def _run(self):
         if self.verbose:
             print(f"Detecting time resolution from timestamp {self.index.name} ...", end=" ")
 
+        memoized = _DETECTED_FREQS.get(id(self.index))
+        if memoized and memoized[0]() is self.index:
+            self.freq, self.confidence = memoized[1:]
+            if self.verbose:
+                print(f"OK\n"
+                      f"   Detected {self.freq} time resolution with {self.confidence} confidence "
+                      f"(result of previous detection for this timestamp).\n")
+            return
+
+        self._detect()
+
+        # Forget result when the index is deleted
+        key = id(self.index)
+        ref = weakref.ref(self.index, lambda _, key=key: _DETECTED_FREQS.pop(key, None))
+        _DETECTED_FREQS[key] = (ref, self.freq, self.confidence)
+
+    def _detect(self):
+        not_checked = (None, '-not-checked-')
+        deltas, counts = timestamp_delta_counts(timestamp_ix=self.index)
         freq_full, freqinfo_full = timestamp_infer_freq_from_fullset(timestamp_ix=self.index)
-        freq_timedelta, freqinfo_timedelta = timestamp_infer_freq_from_timedelta(timestamp_ix=self.index)
-        freq_progressive, freqinfo_progressive = timestamp_infer_freq_progressively(timestamp_ix=self.index)
+        freq_timedelta, freqinfo_timedelta = timestamp_infer_freq_from_timedelta(timestamp_ix=self.index,
+                                                                                 delta_counts=(deltas, counts))
+
+        # The progressive approach is only needed if the result depends on it
+        per_day = np.timedelta64(1, 'D') // np.timedelta64(1, self.index.unit)
+        if len(deltas) == 1 and deltas[0] % per_day != 0 and freq_full and freq_full == freq_timedelta:
+            # Records at start and end have the same constant (sub-daily) time difference as the full data
+            freq_progressive, freqinfo_progressive = freq_full, 'data start+end (same as full data)'
+        elif freq_full and not freq_timedelta:
+            freq_progressive, freqinfo_progressive = not_checked
+        elif not freq_full and freq_timedelta:
+            freq_progressive, freqinfo_progressive = not_checked
+        else:
+            freq_progressive, freqinfo_progressive = timestamp_infer_freq_progressively(timestamp_ix=self.index)
 
         if all(f for f in [freq_full, freq_timedelta, freq_progressive]):
 
@@ -669,6 +958,7 @@ class DetectFrequency:
             if len(freq_list) == 1:
                 # Maximum certainty, one single freq found across all checks
                 self.freq = freq_list[0]
+                self.confidence = 'MAXIMUM'
                 if self.verbose:
                     print(f"OK\n"
                           f"   Detected {self.freq} time resolution with MAXIMUM confidence.\n"
@@ -680,6 +970,7 @@ class DetectFrequency:
         elif freq_full:
             # High certainty, freq found from full range of dataset
             self.freq = freq_full
+            self.confidence = 'MAXIMUM'
             if self.verbose:
                 print(f"OK\n"
                       f"   Detected {self.freq} time resolution with MAXIMUM confidence.\n"
@@ -692,6 +983,7 @@ class DetectFrequency:
             # High certainty, freq found from most frequent timestep that
             # occurred at least 90% of the time
             self.freq = freq_timedelta
+            self.confidence = 'HIGH'
             if self.verbose:
                 print(f"OK\n"
                       f"   Detected {self.freq} time resolution with HIGH confidence.\n"
@@ -703,8 +995,7 @@ class DetectFrequency:
         elif freq_progressive:
             # Medium certainty, freq found from start and end of dataset
             self.freq = freq_progressive
-            if self.verbose:
-                print(f"OK (detected {self.freq} time resolution {self.freq} with MEDIUM confidence)")
+            self.confidence = 'MEDIUM'
             if self.verbose:
                 print(f"OK\n"
                       f"   Detected {self.freq} time resolution with MEDIUM confidence.\n"
@@ -720,10 +1011,27 @@ class DetectFrequency:
         return self.freq
 
 
+def timestamp_delta_counts(timestamp_ix: pd.DatetimeIndex) -> tuple[np.ndarray, np.ndarray]:
+    """Count time differences between successive timestamps
+
+    Returns:
+        unique time differences (as integers in units of the index, e.g. nanoseconds,
+        sorted ascending) and the number of occurrences of each time difference
+    """
+    return np.unique(np.diff(timestamp_ix.asi8), return_counts=True)
+
+
 def timestamp_infer_freq_progressively(timestamp_ix: pd.DatetimeIndex) -> tuple:
     """Try to infer freq from first x and last x rows of data, if these
     match we can be relatively certain that the file has the same freq
     from start to finish.
+
+    Starting with the first 1000 and last 1000 rows, the number of rows is
+    reduced until a freq is inferred for both the start and the end of
+    the data. For sub-daily timestamps, *pd.infer_freq* only finds a freq
+    if all time differences are the same. The number of rows with the same
+    time difference at the start and end is then counted directly and the
+    freq is inferred only once, instead of trying each number of rows.
     """
     # Try to infer freq, starting from first 1000 and last 1000 rows of data, must match
     n_datarows = timestamp_ix.__len__()
@@ -731,19 +1039,50 @@ def timestamp_infer_freq_progressively(timestamp_ix: pd.DatetimeIndex) -> tuple:
     freqinfo = None
     checkrange = 1000
     if n_datarows > 0:
-        for ndr in range(checkrange, 3, -1):  # ndr = number of data rows
-            if n_datarows >= ndr * 2:  # Same amount of ndr needed for start and end of file
-                _inferred_freq_start = pd.infer_freq(timestamp_ix[0:ndr])
-                _inferred_freq_end = pd.infer_freq(timestamp_ix[-ndr:])
-                inferred_freq = _inferred_freq_start if _inferred_freq_start == _inferred_freq_end else None
-                if inferred_freq:
-                    freqinfo = f'data {ndr}+{ndr}' if inferred_freq else '-'
-                    return inferred_freq, freqinfo
-            else:
-                continue
+        max_ndr = min(checkrange, n_datarows // 2)
+        ndr_candidates = range(max_ndr, 3, -1)  # ndr = number of data rows
+        if max_ndr > 3:
+            ndr_same_delta = _rows_with_same_delta(timestamp_ix=timestamp_ix, max_ndr=max_ndr)
+            if ndr_same_delta is not None:
+                ndr_candidates = [ndr_same_delta] if ndr_same_delta > 3 else []
+        for ndr in ndr_candidates:
+            _inferred_freq_start = pd.infer_freq(timestamp_ix[0:ndr])
+            _inferred_freq_end = pd.infer_freq(timestamp_ix[-ndr:])
+            inferred_freq = _inferred_freq_start if _inferred_freq_start == _inferred_freq_end else None
+            if inferred_freq:
+                freqinfo = f'data {ndr}+{ndr}' if inferred_freq else '-'
+                return inferred_freq, freqinfo
     return inferred_freq, freqinfo
 
 
+def _rows_with_same_delta(timestamp_ix: pd.DatetimeIndex, max_ndr: int) -> int or None:
+    """Largest number of rows (up to *max_ndr*) at start and end with the same time difference
+
+    Returns 0 if start and end have different time differences, and *None* if
+    the number of rows cannot be determined this way. This is the case if time
+    differences are multiples of a day (*pd.infer_freq* then also detects e.g.
+    monthly freqs with different time differences), business hours or if the
+    timestamp has a timezone.
+    """
+    if timestamp_ix.tz is not None:
+        # pd.infer_freq uses local time differences
+        return None
+    start_deltas = np.diff(timestamp_ix.asi8[:max_ndr])
+    end_deltas = np.diff(timestamp_ix.asi8[-max_ndr:])
+    per_hour = np.timedelta64(1, 'h') // np.timedelta64(1, timestamp_ix.unit)
+    special = [0, 17 * per_hour, 65 * per_hour]  # Business hours
+    for deltas in [start_deltas, end_deltas]:
+        if np.isin(deltas, special).any() or (deltas % (24 * per_hour) == 0).any():
+            return None
+    if start_deltas[0] <= 0 or start_deltas[0] != end_deltas[-1]:
+        return 0
+    n_start = np.argmax(start_deltas != start_deltas[0]) if (start_deltas != start_deltas[0]).any() \
+        else len(start_deltas)
+    n_end = np.argmax(end_deltas[::-1] != end_deltas[-1]) if (end_deltas != end_deltas[-1]).any() \
+        else len(end_deltas)
+    return min(n_start, n_end) + 1
+
+
 def timestamp_infer_freq_from_fullset(timestamp_ix: pd.DatetimeIndex) -> tuple:
     """
     Infer data frequency from all timestamps in time series index
@@ -771,25 +1110,26 @@ def timestamp_infer_freq_from_fullset(timestamp_ix: pd.DatetimeIndex) -> tuple:
         return inferred_freq, freqinfo
 
 
-def timestamp_infer_freq_from_timedelta(timestamp_ix: pd.DatetimeIndex) -> tuple:
+def timestamp_infer_freq_from_timedelta(timestamp_ix: pd.DatetimeIndex, delta_counts: tuple = None) -> tuple:
     """Check DataFrame index for frequency by subtracting successive timestamps from each other
     and then checking the most frequent difference
 
+    Args:
+        timestamp_ix: Timestamp index
+        delta_counts: Time differences and their counts from *timestamp_delta_counts*,
+            calculated if *None*
+
     - https://stackoverflow.com/questions/16777570/calculate-time-difference-between-pandas-dataframe-indices
     - https://stackoverflow.com/questions/31469811/convert-pandas-freq-string-to-timedelta
     """
     inferred_freq = None
     freqinfo = None
-    df = pd.DataFrame(columns=['tvalue'])
-    df['tvalue'] = timestamp_ix
-    df['tvalue_shifted'] = df['tvalue'].shift()
-    df['delta'] = (df['tvalue'] - df['tvalue_shifted'])
-    n_rows = df['delta'].size  # Total length of data
-    detected_deltas = df['delta'].value_counts()  # Found unique deltas
-    most_frequent_delta = df['delta'].mode()[0]  # Delta with most occurrences
-    most_frequent_delta_counts = detected_deltas[
-        most_frequent_delta]  # Number of occurrences for most frequent delta
-    most_frequent_delta_perc = most_frequent_delta_counts / n_rows  # Fraction
+    deltas, counts = timestamp_delta_counts(timestamp_ix=timestamp_ix) if delta_counts is None else delta_counts
+    n_rows = timestamp_ix.__len__()  # Total length of data
+    # Delta with most occurrences, the smallest delta if several deltas have the same number
+    ix_most_frequent = np.argmax(counts)
+    most_frequent_delta = pd.Timedelta(deltas[ix_most_frequent], unit=timestamp_ix.unit)
+    most_frequent_delta_perc = counts[ix_most_frequent] / n_rows  # Fraction
     # Check whether the most frequent delta appears in >99% of all data rows
     if most_frequent_delta_perc > 0.90:
         inferred_freq = timedelta_to_string(most_frequent_delta)
@@ -1170,7 +1510,7 @@ def calc_true_resolution(num_records: int,
     return true_resolution
 
 
-def create_timestamp(df, file_start, data_nominal_res, expected_duration):
+def create_timestamp(df, file_start, data_nominal_res, expected_duration, true_resolution: float = None):
     """Calculate the timestamp for each record in a dataframe.
 
     Insert true timestamp based on number of records in the file and the
@@ -1204,16 +1544,20 @@ def create_timestamp(df, file_start, data_nominal_res, expected_duration):
             0.05 seconds, 20 Hz).
         expected_duration: Expected duration of the raw data file in seconds, e.g. 1800 for a
             30-minute file.
+        true_resolution: True time resolution of the raw data in seconds. If *None*, it is
+            calculated from the number of records in *df*. Needed when *df* is only a
+            chunk of the file, the index of *df* must then be the record number in the file.
 
     Returns:
         df: pandas DataFrame with timestamp index
         true_resolution: time resolution of raw data measurements
 
     """
-    n_records = len(df)
-    expected_records = int(expected_duration / data_nominal_res, )
-    true_resolution = calc_true_resolution(num_records=n_records, data_nominal_res=data_nominal_res,
-                                           expected_records=expected_records, expected_duration=expected_duration)
+    if not true_resolution:
+        n_records = len(df)
+        expected_records = int(expected_duration / data_nominal_res, )
+        true_resolution = calc_true_resolution(num_records=n_records, data_nominal_res=data_nominal_res,
+                                               expected_records=expected_records, expected_duration=expected_duration)
     df['sec'] = df.index * true_resolution
     df['file_start_dt'] = file_start
     df['TIMESTAMP'] = pd.to_datetime(df['file_start_dt']) \
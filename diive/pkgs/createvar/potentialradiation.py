@@ -1,6 +1,36 @@
+from collections import OrderedDict
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 from pandas import DatetimeIndex, Series
+from pandas.tseries.offsets import Tick
+
+# Solar irradiance, radiation 'constant'
+S = 1361  # W m-2   (According to Iris)
+# S = 1370  # W m-2   (Kyle, et al., 1985)
+
+# Average number of days per year
+D_Y = 365.25
+
+# Day of the summer solstice
+D_R = 173
+
+# Latitude of the Tropic of Cancer (1. Wendekreis)
+# Convert 23.45° to radians
+PHI_R = 23.45 * np.pi / 180
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_DAY = 86400 * NS_PER_SECOND
+
+# Time resolutions (in nanoseconds) for which annual lookup tables are used
+LOOKUP_TABLE_FREQS = [30 * 60 * NS_PER_SECOND, 60 * NS_PER_SECOND]
+
+# Maximum total size of stored results in MB, least recently used results are removed first
+POTRAD_CACHE_MAX_MB = 100
+
+# Stored results per site and period, in order of use
+_POTRAD_RESULTS = OrderedDict()
 
 
 def potrad(timestamp_index: DatetimeIndex, lat: float, lon: float, utc_offset: int) -> Series:
@@ -10,6 +40,14 @@ def potrad(timestamp_index: DatetimeIndex, lat: float, lon: float, utc_offset: i
     - Calculations by Stull (1988), p.257
     - Based on code from the old MeteoScreening Tool
 
+    Results for timestamps with a regular time resolution (*timestamp_index.freq*
+    is set) are stored per site and period, calculating potential radiation again
+    for the same site and period returns the stored result. Stored results use
+    at most *POTRAD_CACHE_MAX_MB*, they can be removed with *clear_potrad_cache*.
+    For 30-minute and 1-minute time resolution, potential radiation is looked up
+    in a table that contains all days of the year and times of the day, see
+    *potrad_annual_table*.
+
     Args:
         timestamp_index: time series index
         lat: latitude
@@ -27,55 +65,142 @@ def potrad(timestamp_index: DatetimeIndex, lat: float, lon: float, utc_offset: i
     if utc_offset < -12 or utc_offset > 12:
         raise Exception(f"UTC-offset {utc_offset} hours is out of range.")
 
-    # Dataframe for collecting results
-    res = pd.DataFrame(index=timestamp_index)
+    if timestamp_index.tz is not None:
+        # Wall time of timezone-aware timestamps is not regular (daylight saving time),
+        # the UTC offset is subtracted before the timezone is removed
+        utc_time = (timestamp_index - pd.Timedelta(hours=utc_offset)).tz_localize(None)
+        values = potrad_values(timestamps=_to_int64(timestamp_index=utc_time), lat=lat, lon=lon, utc_offset=0)
+        return Series(values, index=timestamp_index, name='SW_IN_POT')
 
-    # Solar irradiance, radiation 'constant'
-    res['S'] = 1361  # W m-2   (According to Iris)
-    # S = 1370  # W m-2   (Kyle, et al., 1985)
+    timestamps = _to_int64(timestamp_index=timestamp_index)
+    freq = timestamp_index.freq
+    if isinstance(freq, Tick) and len(timestamps) > 0:
+        values = _potrad_regular(lat=lat, lon=lon, utc_offset=utc_offset,
+                                 start=int(timestamps[0]), periods=len(timestamps), freq=freq.nanos)
+        values = values.copy()  # Stored result stays unchanged
+    else:
+        values = potrad_values(timestamps=timestamps, lat=lat, lon=lon, utc_offset=utc_offset)
+    return Series(values, index=timestamp_index, name='SW_IN_POT')
 
-    # Average number of days per year
-    res['d_y'] = 365.25
 
-    # Day of the summer solstice
-    res['d_r'] = 173
+def potrad_values(timestamps: np.ndarray, lat: float, lon: float, utc_offset: int) -> np.ndarray:
+    """Calculate potential radiation for local timestamps given as int64 nanoseconds, see *potrad*"""
+    utc_time = timestamps - int(utc_offset * 3600 * NS_PER_SECOND)
+    utc_h, utc_doy = _utc_hour_and_doy(utc_time=utc_time)
+    rad = _potrad(utc_h=utc_h, utc_doy=utc_doy, lat=lat, lon=lon)
+    rad[timestamps == np.iinfo(np.int64).min] = np.nan  # NaT
+    return rad
 
-    # Latitude of the Tropic of Cancer (1. Wendekreis)
-    # Convert 23.45° to radians
-    res['phi_r'] = 23.45 * np.pi / 180
 
-    res['utc_time'] = timestamp_index - pd.Timedelta(utc_offset, unit='h')
-    res['utc_h'] = (
-            res.utc_time.dt.hour
-            + res.utc_time.dt.minute / 60
-            + res.utc_time.dt.second / 3600
-    )  # hour fraction
-    res['utc_doy'] = res.utc_time.dt.dayofyear
+def potrad_annual_table(lat: float, lon: float, freq: int, phase: int = 0) -> np.ndarray:
+    """Potential radiation for each day of the year (UTC) and each record of the day
+
+    Args:
+        lat: latitude
+        lon: longitude
+        freq: time resolution in nanoseconds, must be a divisor of one day
+        phase: time of the first record of the day (UTC) in nanoseconds, e.g. the
+            first record of a 30-minute timestamp that shows the middle of
+            the averaging period is at 00:15
 
-    res['lambda_e'] = lon * np.pi / 180
-    res['phi'] = lat * np.pi / 180
+    Returns:
+        table with one row per day of the year (366 rows, first row is January 1)
+        and one column per record of the day, read-only
+    """
+    return _potrad_annual_table(lat=lat, lon=lon, freq=freq, phase=phase)
 
-    res['delta'] = res.phi_r * np.cos(2 * np.pi * (res.utc_doy - res.d_r) / res.d_y)
 
-    res['sin_psi'] = (np.sin(res.phi) * np.sin(res.delta) -
-                      np.cos(res.phi) * np.cos(res.delta) *
-                      np.cos((np.pi * res.utc_h) / 12 + res.lambda_e))
+def clear_potrad_cache():
+    """Remove stored results and annual lookup tables of *potrad*"""
+    _POTRAD_RESULTS.clear()
+    _potrad_annual_table.cache_clear()
+
+
+@lru_cache(maxsize=8)
+def _potrad_annual_table(lat: float, lon: float, freq: int, phase: int) -> np.ndarray:
+    records_per_day = NS_PER_DAY // freq
+    utc_time_of_day = phase + np.arange(records_per_day, dtype=np.int64) * freq
+    utc_h, _ = _utc_hour_and_doy(utc_time=utc_time_of_day)
+    utc_doy = np.arange(1, 367, dtype=np.int64)
+    table = _potrad(utc_h=np.tile(utc_h, len(utc_doy)), utc_doy=np.repeat(utc_doy, records_per_day), lat=lat, lon=lon)
+    table = table.reshape(len(utc_doy), records_per_day)
+    table.flags.writeable = False
+    return table
+
+
+def _potrad_regular(lat: float, lon: float, utc_offset: int, start: int, periods: int, freq: int) -> np.ndarray:
+    """Potential radiation for regular timestamps, stored per site and period"""
+    key = (lat, lon, utc_offset, start, periods, freq)
+    values = _POTRAD_RESULTS.get(key)
+    if values is not None:
+        _POTRAD_RESULTS.move_to_end(key)
+        return values
+    timestamps = start + np.arange(periods, dtype=np.int64) * freq
+    if freq not in LOOKUP_TABLE_FREQS:
+        values = potrad_values(timestamps=timestamps, lat=lat, lon=lon, utc_offset=utc_offset)
+    else:
+        utc_time = timestamps - int(utc_offset * 3600 * NS_PER_SECOND)
+        time_of_day = utc_time % NS_PER_DAY
+        phase = int(time_of_day[0] % freq)
+        table = _potrad_annual_table(lat=lat, lon=lon, freq=freq, phase=phase)
+        _, utc_doy = _utc_hour_and_doy(utc_time=utc_time)
+        values = table[utc_doy - 1, (time_of_day - phase) // freq]
+    values.flags.writeable = False
+    _store_result(key=key, values=values)
+    return values
+
+
+def _store_result(key: tuple, values: np.ndarray):
+    """Store result, remove least recently used results when *POTRAD_CACHE_MAX_MB* is exceeded"""
+    max_bytes = POTRAD_CACHE_MAX_MB * 1024 ** 2
+    if values.nbytes > max_bytes:
+        return
+    _POTRAD_RESULTS[key] = values
+    total_bytes = sum(v.nbytes for v in _POTRAD_RESULTS.values())
+    while total_bytes > max_bytes:
+        _, removed = _POTRAD_RESULTS.popitem(last=False)
+        total_bytes -= removed.nbytes
+
+
+def _potrad(utc_h: np.ndarray, utc_doy: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    lambda_e = lon * np.pi / 180
+    phi = lat * np.pi / 180
+
+    delta = PHI_R * np.cos(2 * np.pi * (utc_doy - D_R) / D_Y)
+
+    sin_psi = (np.sin(phi) * np.sin(delta) -
+               np.cos(phi) * np.cos(delta) *
+               np.cos((np.pi * utc_h) / 12 + lambda_e))
 
     # Calculating radiation
     # in W/m^2
-    rad = res.S * res.sin_psi
-    rad.values[rad < 0] = 0
-    res['SW_IN_POT'] = rad
+    rad = S * sin_psi
+    rad[rad < 0] = 0
+
+    # # Calculating azimut
+    # # in degrees 0-360, S is 0
+    # azimut = (360 * utc_h / 24 + lon + 180) % 360
+    #
+    # # Calculating elevation
+    # # in deg (-90) to 90
+    # elevation = np.arcsin(sin_psi) * 180 / np.pi
+
+    return rad
 
-    # Calculating azimut
-    # in degrees 0-360, S is 0
-    res['azimut'] = (360 * res.utc_h / 24 + lon + 180) % 360
 
-    # Calculating elevation
-    # in deg (-90) to 90
-    res['elevation'] = np.arcsin(res.sin_psi) * 180 / np.pi
+def _utc_hour_and_doy(utc_time: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Hour fraction (without fractions of seconds) and day of year of UTC timestamps in nanoseconds"""
+    seconds_of_day = (utc_time % NS_PER_DAY) // NS_PER_SECOND
+    utc_h = seconds_of_day // 3600 + (seconds_of_day % 3600 // 60) / 60 + (seconds_of_day % 60) / 3600
+    days = utc_time // NS_PER_DAY
+    year_start = days.astype('datetime64[D]').astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+    utc_doy = days - year_start + 1
+    return utc_h, utc_doy
 
-    return res['SW_IN_POT']
+
+def _to_int64(timestamp_index: DatetimeIndex) -> np.ndarray:
+    """Timezone-naive timestamps as int64 nanoseconds"""
+    return np.asarray(timestamp_index, dtype='datetime64[ns]').view(np.int64)
 
 
 def example():
@@ -96,8 +221,22 @@ def example():
     # plt.show()
 
 
+def example_benchmark_potrad(n_years: int = 20):
+    """Compare calculation times of potential radiation for a long 30-minute time series"""
+    import time
+    ix = pd.date_range('2004-01-01 00:15', periods=n_years * 17520, freq='30min', name='TIMESTAMP_MIDDLE')
+    irregular_ix = ix.delete(1)  # No freq, values are calculated directly
+    for label, ts_ix in [('calculated (irregular timestamp)', irregular_ix),
+                         ('annual lookup table', ix),
+                         ('stored result (same site and period)', ix)]:
+        tic = time.perf_counter()
+        potrad(timestamp_index=ts_ix, lat=47.286417, lon=7.733750, utc_offset=1)
+        print(f"Potential radiation for {len(ts_ix)} records, {label}: {time.perf_counter() - tic:.4f}s")
+
+
 if __name__ == '__main__':
     example()
+    # example_benchmark_potrad()
 
 # def solar(data, var, idx, param):
 #     """
@@ -7,7 +7,9 @@ from pandas import DataFrame, Series
 
 from diive.core.dfun.frames import detect_new_columns
 from diive.core.funcs.funcs import filter_strings_by_elements
-from diive.core.io.filereader import MultiDataFileReader, search_files
+from diive.core.io.filecache import ParsedFileCache
+from diive.core.io.filemanifest import FileManifest
+from diive.core.io.filereader import MultiDataFileReader, merge_frames_first_valid, search_files
 from diive.pkgs.createvar.daynightflag import daytime_nighttime_flag_from_swinpot
 from diive.pkgs.createvar.potentialradiation import potrad
 from diive.pkgs.flux.common import detect_basevar
@@ -405,6 +407,7 @@ class LoadEddyProOutputFiles:
         self._maindf = None
         self._filepaths = None
         self._metadata = None
+        self._manifest = None
 
     @property
     def maindf(self) -> DataFrame:
@@ -428,19 +431,69 @@ class LoadEddyProOutputFiles:
                             'Note that units are only available in _full_output_ files.')
         return self._metadata
 
-    def searchfiles(self, extension: str = '*.csv'):
-        """Search CSV files in source folder and keep selected filetypes."""
+    def searchfiles(self, extension: str = '*.csv', manifest: FileManifest = None):
+        """Search CSV files in source folder and keep selected filetypes.
+
+        Args:
+            extension: Pattern of file names
+            manifest: If given, only files that are new or changed since they
+                were last loaded are kept, see *FileManifest*. Found files are
+                added to the manifest after they were loaded successfully with
+                *loadfiles* or *appendfiles*.
+        """
         fileids = self._init_filetype()
-        self._filepaths = search_files(self.sourcedir, extension)
+        self._manifest = manifest
+        self._filepaths = search_files(self.sourcedir, extension, manifest=manifest, update_manifest=False)
         self._filepaths = filter_strings_by_elements(list1=self.filepaths, list2=fileids)
         print(f"Found {len(self.filepaths)} files with extension {extension} and file IDs {fileids}:")
         [print(f" Found file #{ix + 1}: {f}") for ix, f in enumerate(self.filepaths)]
 
-    def loadfiles(self):
-        """Load data files"""
-        loaddatafile = MultiDataFileReader(filetype=self.filetype, filepaths=self.filepaths)
+    def loadfiles(self, cache: ParsedFileCache = None, usecols: list = None):
+        """Load data files
+
+        Args:
+            cache: If given, files that did not change since they were last
+                loaded are read from this cache instead of being parsed again.
+            usecols: Names of the variables that are loaded, e.g. ['FC', 'FC_SSITC_TEST'].
+                All variables are loaded if *None*.
+        """
+        loaddatafile = MultiDataFileReader(filetype=self.filetype, filepaths=self.filepaths, cache=cache,
+                                           usecols=usecols)
         self._maindf = loaddatafile.data_df
         self._metadata = loaddatafile.metadata_df
+        self._update_manifest()
+
+    def appendfiles(self, data_df: DataFrame = None, cache: ParsedFileCache = None, usecols: list = None) -> list:
+        """Load only the found files and merge their data into already loaded data
+
+        Use this to add new files, e.g. found by *searchfiles* with a *manifest*,
+        without loading all previous files again, see *MultiDataFileReader.merge_into*.
+
+        Args:
+            data_df: Existing data the files are merged into, e.g. data from a
+                dataset loaded with *load_dataset*. If *None*, the data of the
+                previous *loadfiles* or *appendfiles* are used.
+            cache: See *loadfiles*
+            usecols: See *loadfiles*
+
+        Returns:
+            list of (start, end) timestamp ranges in which values changed or were added
+        """
+        data_df = self.maindf if data_df is None else data_df
+        loaddatafile = MultiDataFileReader(filetype=self.filetype, filepaths=self.filepaths, cache=cache,
+                                           usecols=usecols)
+        self._maindf, changed_ranges = loaddatafile.merge_into(data_df=data_df)
+        if loaddatafile.metadata_df is not None:
+            self._metadata = loaddatafile.metadata_df if self._metadata is None \
+                else merge_frames_first_valid(frames=[self._metadata, loaddatafile.metadata_df])
+        print(f"Merged {len(self.filepaths)} files, data changed in {len(changed_ranges)} time ranges.")
+        self._update_manifest()
+        return changed_ranges
+
+    def _update_manifest(self):
+        """Add loaded files to the manifest of *searchfiles*"""
+        if self._manifest is not None:
+            self._manifest.add(filepaths=self.filepaths)
 
     def _init_filetype(self):
         if self.filetype == 'EDDYPRO-FLUXNET-30MIN':
@@ -836,6 +889,59 @@ def example():
     # print("X")
 
 
+def example_benchmark_timestamp_sanitizer(n_files: int = 31):
+    """Profile time spent in TimestampSanitizer during a full processing chain run
+
+    The example EddyPro file is split into *n_files* files, which are loaded and
+    processed from Level-2 to Level-3.2.
+    """
+    import cProfile
+    import pstats
+    import tempfile
+    import time
+    from pathlib import Path
+    import diive.configs.exampledata as ed
+    from diive.core.times.times import TimestampSanitizer
+
+    filepath = Path(ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+    lines = filepath.read_text().splitlines(keepends=True)
+    header, records = lines[0:1], lines[1:]
+    chunksize = -(-len(records) // n_files)
+
+    with tempfile.TemporaryDirectory() as sourcedir:
+        for ix in range(0, len(records), chunksize):
+            (Path(sourcedir) / f'eddypro_{ix:05d}_fluxnet_adv.csv').write_text(''.join(header + records[ix:ix + chunksize]))
+        profile = cProfile.Profile()
+        tic = time.perf_counter()
+        profile.enable()
+        ep = LoadEddyProOutputFiles(sourcedir=[sourcedir], filetype='EDDYPRO-FLUXNET-30MIN')
+        ep.searchfiles()
+        ep.loadfiles()
+        fpc = FluxProcessingChain(maindf=ep.maindf, filetype='EDDYPRO-FLUXNET-30MIN', fluxcol='FC',
+                                  site_lat=46.583056, site_lon=9.790639, utc_offset=1, metadata=ep.metadata)
+        fpc.level2_quality_flag_expansion(ssitc=True, gas_completeness=True, spectral_correction_factor=True)
+        fpc.finalize_level2(nighttime_threshold=50, daytime_accept_qcf_below=2, nighttimetime_accept_qcf_below=2)
+        fpc.level31_storage_correction(gapfill_storage_term=False)
+        fpc.finalize_level31()
+        fpc.level32_stepwise_outlier_detection()
+        fpc.level32_flag_outliers_zscore_dtnt_test(thres_zscore=4, showplot=False, verbose=False, repeat=True)
+        fpc.level32_addflag()
+        fpc.level32_flag_outliers_localsd_test(n_sd=4, winsize=480, showplot=False, verbose=False, repeat=True)
+        fpc.level32_addflag()
+        fpc.level32_flag_outliers_abslim_test(minval=-50, maxval=50, showplot=False, verbose=False)
+        fpc.level32_addflag()
+        fpc.finalize_level32(nighttime_threshold=50, daytime_accept_qcf_below=2, nighttimetime_accept_qcf_below=2)
+        profile.disable()
+        toc = time.perf_counter() - tic
+
+    code = TimestampSanitizer.__init__.__code__
+    key = (code.co_filename, code.co_firstlineno, code.co_name)
+    _, n_calls, _, cumtime, _ = pstats.Stats(profile).stats.get(key, (0, 0, 0, 0, None))
+    print(f"\nProcessing chain for {n_files} files: {toc:.3f} seconds in total, "
+          f"{cumtime:.3f} seconds in {n_calls} calls of TimestampSanitizer")
+
+
 if __name__ == '__main__':
     example_quick()
     # example()
+    # example_benchmark_timestamp_sanitizer()
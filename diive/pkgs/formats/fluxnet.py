@@ -1,10 +1,14 @@
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 from pandas import DataFrame
 
-from diive.core.io.files import loadfiles
+from diive.core.funcs.funcs import validate_n_jobs
+from diive.core.io.files import loadfiles, save_csv
 from diive.core.times.times import current_date_str_condensed
 from diive.core.times.times import format_timestamp_to_fluxnet_format
 from diive.core.times.times import insert_timestamp
@@ -188,25 +192,44 @@ class FormatEddyProFluxnetFileForUpload:
         self._subset_fluxnet['TIMESTAMP_START'] = \
             format_timestamp_to_fluxnet_format(df=self._subset_fluxnet, timestamp_col='TIMESTAMP_START')
 
-    def export_yearly_files(self):
-        """Create one file per year"""
-        self._save_one_file_per_year(df=self._subset_fluxnet)
+    def export_yearly_files(self, n_jobs: int = 1):
+        """Create one file per year
+
+        Args:
+            n_jobs: Number of yearly files that are written in parallel, each in its
+                own worker process. With *1* files are written one after another,
+                *-1* uses all available CPUs. Worker processes must be started from
+                within an `if __name__ == '__main__':` block on Windows.
+        """
+        self._save_one_file_per_year(df=self._subset_fluxnet, n_jobs=n_jobs)
 
     def get_data(self):
         return self._subset_fluxnet
 
-    def _save_one_file_per_year(self, df: DataFrame):
+    def _save_one_file_per_year(self, df: DataFrame, n_jobs: int = 1):
         """Save data to yearly files"""
         print(f"\nSaving yearly CSV files ...")
+        # Timestamps (YYYYMMDDhhmm) are written faster as integers, the files are the same,
+        # missing timestamps stay missing (nullable integers)
+        for col in ['TIMESTAMP_START', 'TIMESTAMP_END']:
+            if col in df.columns and df[col].dtype == object:
+                df = df.assign(**{col: pd.to_numeric(df[col]).astype('Int64')})
         uniq_years = list(df.index.year.unique())
         runid = f"_{current_date_str_condensed()}" if self.add_runid else ""
+        years = df.index.year
+        tasks = []
         for year in uniq_years:
             outname = f"{self.site}_{year}_fluxes_meteo{runid}.csv"
             outpath = Path(self.outdir) / outname
-            yearlocs = df.index.year == year
-            yeardata = df[yearlocs].copy()
-            yeardata.to_csv(outpath, index=False)
-            print(f"    --> Saved file {outpath}.")
+            tasks.append((df[years == year], outpath))
+        n_jobs = validate_n_jobs(n_jobs)
+        if n_jobs == 1 or len(tasks) < 2:
+            for outpath in map(_save_year, tasks):
+                print(f"    --> Saved file {outpath}.")
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as ex:
+                for outpath in ex.map(_save_year, tasks):
+                    print(f"    --> Saved file {outpath}.")
 
     @staticmethod
     def _missing_values(df: DataFrame):
@@ -321,6 +344,54 @@ class FormatEddyProFluxnetFileForUpload:
         self._merged_df = df[keepcols].copy()
 
 
+def _save_year(task: tuple) -> Path:
+    """Save data of one year, module-level to be usable in worker processes"""
+    yeardata, outpath = task
+    save_csv(data=yeardata, outpath=outpath)
+    return outpath
+
+
+def example_benchmark_export(n_jobs: int = 1):
+    """Compare export of yearly files with *to_csv* and with the fast export, for a 10-year site
+
+    Uses the 10-year example dataset (2013-2022) with the same number of variables
+    as a typical FLUXNET upload and checks that both exports are byte-identical.
+    """
+    import tempfile
+    from pandas import Timedelta
+    from diive.configs.exampledata import load_exampledata_parquet
+    df = load_exampledata_parquet()
+    df = df[df.columns[0:len(VARIABLES)]].fillna(-9999)
+    df.insert(0, 'TIMESTAMP_END', df.index + Timedelta('15min'))
+    df.insert(0, 'TIMESTAMP_START', df.index - Timedelta('15min'))
+
+    with tempfile.TemporaryDirectory() as outdir:
+        # Previous export: timestamps as strings, to_csv for each year
+        tic = time.time()
+        strdf = df.copy()
+        for col in ['TIMESTAMP_START', 'TIMESTAMP_END']:
+            strdf[col] = strdf[col].dt.strftime('%Y%m%d%H%M')
+        for year in strdf.index.year.unique():
+            strdf[strdf.index.year == year].copy().to_csv(Path(outdir) / f"to_csv_{year}.csv", index=False)
+        toc_to_csv = time.time() - tic
+
+        # Fast export
+        tic = time.time()
+        fxn = FormatEddyProFluxnetFileForUpload(site='CH-DAV', sourcedir=outdir, outdir=outdir, add_runid=False)
+        for col in ['TIMESTAMP_START', 'TIMESTAMP_END']:
+            df[col] = format_timestamp_to_fluxnet_format(df=df, timestamp_col=col)
+        fxn._save_one_file_per_year(df=df, n_jobs=n_jobs)
+        toc_fast = time.time() - tic
+
+        identical = all((Path(outdir) / f"to_csv_{year}.csv").read_bytes() ==
+                        (Path(outdir) / f"CH-DAV_{year}_fluxes_meteo.csv").read_bytes()
+                        for year in df.index.year.unique())
+    print(f"\n{len(df)} records, {len(df.columns)} columns, {df.index.year.nunique()} years")
+    print(f"    to_csv:       {toc_to_csv:.2f} seconds")
+    print(f"    fast export:  {toc_fast:.2f} seconds (n_jobs={n_jobs})")
+    print(f"    byte-identical files: {identical}")
+
+
 def example():
     # from diive.configs.exampledata import load_exampledata_eddypro_fluxnet_CSV_30MIN
     # data_df, metadata_df = load_exampledata_eddypro_fluxnet_CSV_30MIN()
@@ -380,3 +451,4 @@ def example():
 
 if __name__ == '__main__':
     example()
+    # example_benchmark_export(n_jobs=1)
@@ -32,7 +32,7 @@ import diive.core.dfun.frames as fr
 from diive.core.ml.common import prediction_scores_regr, plot_prediction_residuals_error_regr
 from diive.core.times.neighbors import neighboring_years
 from diive.core.times.times import TimestampSanitizer
-from diive.core.times.times import include_timestamp_as_cols
+from diive.core.times.times import include_timestamp_as_cols, timestamp_features
 
 pd.set_option('display.max_rows', 50)
 pd.set_option('display.max_columns', 12)
@@ -232,15 +232,20 @@ class RandomForestTS:
         if self.features_lag and (len(self.model_df.columns) > 1):
             self.model_df = self._lag_features()
 
+        # Timestamp features, also used by the fallback model
+        self._timestamp_features = None
+
         if include_timestamp_as_features:
-            self.model_df = include_timestamp_as_cols(df=self.model_df, txt="")
+            self._timestamp_features = timestamp_features(index=self.model_df.index)
+            self.model_df = include_timestamp_as_cols(df=self.model_df, features=self._timestamp_features, txt="")
 
         if add_continuous_record_number:
             self.model_df = fr.add_continuous_record_number(df=self.model_df)
 
         if sanitize_timestamp:
             verbose = True if verbose > 0 else False
-            tss = TimestampSanitizer(data=self.model_df, output_middle_timestamp=True, verbose=verbose)
+            tss = TimestampSanitizer(data=self.model_df, output_middle_timestamp=True, inplace=True,
+                                     verbose=verbose)
             self.model_df = tss.get()
 
         self._check_n_cols()
@@ -849,7 +854,12 @@ class RandomForestTS:
     def _predict_fallback(self, series: pd.Series):
         """Fill data gaps using timestamp features only, fallback for still existing gaps"""
         gf_fallback_df = pd.DataFrame(series)
-        gf_fallback_df = include_timestamp_as_cols(df=gf_fallback_df, txt="(ONLY FALLBACK)")
+
+        # Reuse timestamp features of the full model if the timestamp did not change
+        features = self._timestamp_features
+        if features is not None and not features.index.equals(gf_fallback_df.index):
+            features = None
+        gf_fallback_df = include_timestamp_as_cols(df=gf_fallback_df, features=features, txt="(ONLY FALLBACK)")
 
         # Build model for target predictions *from timestamp*
         y_fallback, X_fallback, _, _ = \
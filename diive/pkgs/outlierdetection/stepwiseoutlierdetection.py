@@ -272,7 +272,7 @@ class StepwiseOutlierDetection:
         _series = self._series.copy()  # Data for this field
 
         # Sanitize timestamp
-        _series = TimestampSanitizer(data=_series).get()
+        _series = TimestampSanitizer(data=_series, inplace=True).get()
 
         # Initialize hires quality flags
         hires_flags = pd.DataFrame(index=_series.index)
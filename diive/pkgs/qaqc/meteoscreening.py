@@ -564,7 +564,7 @@ class StepwiseMeteoScreeningDb:
         """
         offset = to_offset(pd.Timedelta(f'{targetfreq}S'))
         data_detailed = data_detailed.asfreq(offset.freqstr)
-        data_detailed = TimestampSanitizer(data=data_detailed).get()
+        data_detailed = TimestampSanitizer(data=data_detailed, inplace=True).get()
         return data_detailed
 
     @staticmethod
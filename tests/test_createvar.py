@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import diive.pkgs.createvar.potentialradiation as potentialradiation
+from diive.pkgs.createvar.potentialradiation import clear_potrad_cache, potrad, potrad_annual_table
+
+
+def _potrad_reference(timestamp_index, lat, lon, utc_offset):
+    """Potential radiation calculated with pandas datetime attributes"""
+    utc_time = timestamp_index - pd.Timedelta(hours=utc_offset)
+    utc_h = (utc_time.hour + utc_time.minute / 60 + utc_time.second / 3600).to_numpy()
+    utc_doy = utc_time.dayofyear.to_numpy()
+    delta = 23.45 * np.pi / 180 * np.cos(2 * np.pi * (utc_doy - 173) / 365.25)
+    phi = lat * np.pi / 180
+    sin_psi = (np.sin(phi) * np.sin(delta) -
+               np.cos(phi) * np.cos(delta) * np.cos((np.pi * utc_h) / 12 + lon * np.pi / 180))
+    return np.clip(1361 * sin_psi, 0, None)
+
+
+class TestCreateVar(unittest.TestCase):
+
+    def test_potrad(self):
+        """Lookup tables and stored results give the same potential radiation as the direct calculation"""
+        for freq, start in [('30min', '2019-12-31 00:15'), ('1min', '2020-02-28 23:00'), ('10min', '2021-06-01')]:
+            ix = pd.date_range(start, periods=5000, freq=freq, name='TIMESTAMP_MIDDLE')
+            irregular_ix = ix.delete([10, 11, 500])
+            for ts_ix in [ix, irregular_ix, ix.tz_localize('Europe/Zurich', ambiguous='NaT', nonexistent='NaT')]:
+                sw_in_pot = potrad(timestamp_index=ts_ix, lat=47.286417, lon=7.733750, utc_offset=1)
+                self.assertEqual(sw_in_pot.name, 'SW_IN_POT')
+                pd.testing.assert_index_equal(sw_in_pot.index, ts_ix)
+                np.testing.assert_array_equal(
+                    sw_in_pot.to_numpy(), _potrad_reference(ts_ix, lat=47.286417, lon=7.733750, utc_offset=1))
+
+        # Stored result is returned as copy
+        sw_in_pot = potrad(timestamp_index=ix, lat=47.286417, lon=7.733750, utc_offset=1)
+        sw_in_pot.iloc[:] = -9999
+        sw_in_pot = potrad(timestamp_index=ix, lat=47.286417, lon=7.733750, utc_offset=1)
+        self.assertGreaterEqual(sw_in_pot.min(), 0)
+
+        table = potrad_annual_table(lat=47.286417, lon=7.733750, freq=30 * 60 * 10 ** 9)
+        self.assertEqual(table.shape, (366, 48))
+        self.assertEqual(table[:, 0:8].max(), 0)  # Night
+        self.assertGreater(table[172, 23], table[0, 23])  # Summer solstice
+
+    def test_potrad_cache_size(self):
+        """Stored results do not exceed the maximum cache size"""
+        clear_potrad_cache()
+        ix = pd.date_range('2000-01-01', periods=100000, freq='30min')  # 0.8 MB
+        with mock.patch.object(potentialradiation, 'POTRAD_CACHE_MAX_MB', 2):
+            for lat in range(5):
+                potrad(timestamp_index=ix, lat=lat, lon=7.733750, utc_offset=1)
+                # Same table for different UTC offsets
+                potrad(timestamp_index=ix, lat=lat, lon=7.733750, utc_offset=2)
+            self.assertEqual(len(potentialradiation._POTRAD_RESULTS), 2)
+            self.assertEqual(potentialradiation._potrad_annual_table.cache_info().currsize, 5)
+            potrad(timestamp_index=pd.date_range('2000-01-01', periods=300000, freq='10min'),
+                   lat=0, lon=0, utc_offset=0)  # 2.4 MB, not stored
+            self.assertEqual(len(potentialradiation._POTRAD_RESULTS), 2)
+        clear_potrad_cache()
+        self.assertEqual(len(potentialradiation._POTRAD_RESULTS), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
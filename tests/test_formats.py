@@ -1,7 +1,12 @@
+import tempfile
 import unittest
+from pathlib import Path
+
+import numpy as np
 
 import diive.configs.exampledata as ed
-from diive.core.times.times import DetectFrequency
+from diive.core.io.files import save_csv
+from diive.core.times.times import DetectFrequency, format_timestamp_to_fluxnet_format
 from diive.pkgs.formats.fluxnet import FormatEddyProFluxnetFileForUpload
 
 
@@ -15,6 +20,48 @@ class TestFormats(unittest.TestCase):
         # freq = f.get()
         # self.assertEqual(freq, '30T')  # add assertion here
 
+    def test_fluxnet_export_identical(self):
+        """Fast export of FLUXNET files gives the same file as to_csv"""
+        data_df, _ = ed.load_exampledata_eddypro_fluxnet_CSV_30MIN()
+        data_df = data_df.select_dtypes(include='number').iloc[:, 0:40].fillna(-9999)
+        data_df.iloc[0:10, 3] = np.nan
+        data_df['TIMESTAMP_END'] = data_df.index
+        expected_df = data_df.copy()
+        expected_df['TIMESTAMP_END'] = data_df.index.strftime('%Y%m%d%H%M')
+        data_df['TIMESTAMP_END'] = format_timestamp_to_fluxnet_format(df=data_df, timestamp_col='TIMESTAMP_END',
+                                                                      as_integer=True)
+        with tempfile.TemporaryDirectory() as outdir:
+            expected_df.to_csv(Path(outdir) / 'expected.csv', index=False)
+            save_csv(data=data_df, outpath=Path(outdir) / 'fast.csv')
+            self.assertEqual((Path(outdir) / 'expected.csv').read_bytes(), (Path(outdir) / 'fast.csv').read_bytes())
+
+    def test_fluxnet_yearly_export_string_timestamps(self):
+        """Timestamps stay strings in the data, yearly files are the same as with to_csv"""
+        data_df, _ = ed.load_exampledata_eddypro_fluxnet_CSV_30MIN()
+        data_df = data_df.select_dtypes(include='number').iloc[:, 0:10].fillna(-9999)
+        data_df.insert(0, 'TIMESTAMP_END', data_df.index)
+        data_df['TIMESTAMP_END'] = format_timestamp_to_fluxnet_format(df=data_df, timestamp_col='TIMESTAMP_END')
+        self.assertEqual(data_df['TIMESTAMP_END'].iloc[0], data_df.index[0].strftime('%Y%m%d%H%M'))
+        with tempfile.TemporaryDirectory() as outdir:
+            fxn = FormatEddyProFluxnetFileForUpload(site='CH-AWS', sourcedir=outdir, outdir=outdir, add_runid=False)
+            fxn._save_one_file_per_year(df=data_df)
+            self.assertEqual(data_df['TIMESTAMP_END'].dtype, object)
+            data_df.to_csv(Path(outdir) / 'expected.csv', index=False)
+            year = data_df.index.year[0]
+            self.assertEqual((Path(outdir) / 'expected.csv').read_bytes(),
+                             (Path(outdir) / f'CH-AWS_{year}_fluxes_meteo.csv').read_bytes())
+
+            # Missing timestamp is written as empty field, same as with to_csv
+            data_df['TIMESTAMP_END'] = data_df['TIMESTAMP_END'].astype(object)
+            data_df.iloc[3, 0] = np.nan
+            fxn._save_one_file_per_year(df=data_df)
+            data_df.to_csv(Path(outdir) / 'expected.csv', index=False)
+            self.assertEqual((Path(outdir) / 'expected.csv').read_bytes(),
+                             (Path(outdir) / f'CH-AWS_{year}_fluxes_meteo.csv').read_bytes())
+            for n_jobs in [0, -2, 1.5]:
+                with self.assertRaises(ValueError):
+                    fxn._save_one_file_per_year(df=data_df, n_jobs=n_jobs)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,28 @@
+import gzip
+import os
+import tempfile
 import unittest
+import warnings
+import zipfile
+from pathlib import Path
+from unittest import mock
 
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
+from pandas.testing import assert_frame_equal
 
 import diive.configs.exampledata as ed
+from diive.core.io.filecache import ParsedFileCache
+from diive.core.io.filedetector import FileDetector
+from diive.core.io.filemanifest import FileManifest
+from diive.core.io.files import append_to_dataset, load_dataset, load_feather, save_dataset, save_feather
+from diive.core.io.filereader import DataFileProbe, FiletypeRegistry, MultiDataFileReader, ReadFileType, \
+    compact_dtypes, merge_frames_first_valid, search_files
+from diive.core.io.filesplitter import FileSplitter, FileSplitterMulti, calc_split_column_stats, load_split, save_split
+from diive.pkgs.fluxprocessingchain.fluxprocessingchain import LoadEddyProOutputFiles
+from diive.pkgs.outlierdetection.zscore import zScore
+from diive.pkgs.qaqc.qcf import FlagQCF
 
 
 class TestLoadFiletypes(unittest.TestCase):
@@ -27,6 +47,208 @@ class TestLoadFiletypes(unittest.TestCase):
         self.assertEqual(len(metadata_df.columns), 4)
         self.assertEqual(len(metadata_df), 488)
 
+    def test_parsing_engines_same_result(self):
+        """Fast C engine and python engine yield the same data"""
+        filepath = Path(
+            ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        c_df, c_meta = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN',
+                                    parsing_engine='c').get_filedata()
+        py_df, py_meta = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN',
+                                      parsing_engine='python').get_filedata()
+        assert_frame_equal(c_df, py_df)
+        self.assertEqual(c_meta['UNITS'].to_list(), py_meta['UNITS'].to_list())
+
+    def test_string_columns(self):
+        """Declared string columns are dropped or kept as categoricals"""
+        filepath = Path(
+            ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        rft = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN', read_data=False)
+        rft.filetypeconfig['DATA']['STRING_COLUMNS'] = {'FILENAME_HF': 'drop', 'MANUFACTURER_SA': 'category'}
+        data_df, metadata_df = rft.get_datafilereader(read_data=True).get_data()
+        self.assertEqual(len(data_df.columns), 487)
+        self.assertNotIn('FILENAME_HF', data_df.columns)
+        self.assertEqual(data_df['MANUFACTURER_SA'].dtype, 'category')
+        self.assertEqual(data_df['MANUFACTURER_SA'].cat.categories.to_list(), ['gill'])
+        self.assertEqual(len(metadata_df), 487)
+        # Undeclared string columns are converted to numeric
+        self.assertTrue(data_df['MANUFACTURER_GA_CO2'].isnull().all())
+        # Dropped columns are not parsed, also not if selected
+        datafilereader = rft.get_datafilereader()
+        headercols_list, _ = datafilereader._compare_len_header_vs_data()
+        parsed_df = datafilereader._parse_file(headercols_list=headercols_list)
+        self.assertNotIn('FILENAME_HF', parsed_df.columns)
+        self.assertEqual(len(parsed_df.columns), 487)
+        rft.usecols = ['FILENAME_HF', 'FC']
+        data_df, _ = rft.get_datafilereader(read_data=True).get_data()
+        self.assertEqual(list(data_df.columns), ['FC'])
+
+    def test_usecols(self):
+        """Only selected variables are read, data are the same as in the full file"""
+        filepath = Path(
+            ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        full_df, full_meta = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN').get_filedata()
+        data_df, metadata_df = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN',
+                                            usecols=['FC', 'LE', 'H', 'NOT_IN_FILE']).get_filedata()
+        self.assertEqual(sorted(data_df.columns), ['FC', 'H', 'LE'])
+        self.assertEqual(sorted(metadata_df.index), ['FC', 'H', 'LE'])
+        assert_frame_equal(data_df, full_df[data_df.columns])
+        self.assertEqual(metadata_df['UNITS'].to_list(), full_meta.loc[metadata_df.index, 'UNITS'].to_list())
+
+    def test_read_in_chunks(self):
+        """Data read in chunks are the same as data read all at once"""
+        filepath = Path(
+            ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        rft = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN', read_data=False)
+        chunks = list(rft.iter_chunks(rows=500))
+        self.assertEqual(len(chunks), 3)
+        full_df, _ = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN').get_filedata()
+        assert_frame_equal(full_df, pd.concat(chunks), check_freq=False)
+        segments = list(rft.iter_segments(duration='1D', rows=500))
+        self.assertEqual(len(segments), 31)
+        self.assertEqual(sum(len(s) for s in segments), len(full_df))
+
+        # Gap at the boundary between the first two chunks and last chunk with only one record
+        lines = filepath.read_text().splitlines(keepends=True)
+        with tempfile.TemporaryDirectory() as outdir:
+            gapfile = Path(outdir) / filepath.name
+            gapfile.write_text(''.join(lines[0:501] + lines[506:1007]))
+            rft = ReadFileType(filepath=gapfile, filetype='EDDYPRO-FLUXNET-30MIN', read_data=False)
+            chunks = list(rft.iter_chunks(rows=500))
+            self.assertEqual([len(c) for c in chunks], [500, 505, 1])
+            full_df, _ = ReadFileType(filepath=gapfile, filetype='EDDYPRO-FLUXNET-30MIN').get_filedata()
+            assert_frame_equal(full_df, pd.concat(chunks), check_freq=False)
+
+    def test_probe_datafile(self):
+        """Header and number of records from the start of the file"""
+        filepath = Path(ed.DIR_PATH) / 'CH-Dav_BM_20230328_L02_F03.zip'
+        probe = DataFileProbe(filepath=filepath, data_skiprows=[], data_headerrows=[0, 1], compression='zip')
+        self.assertFalse(probe.complete)
+        self.assertEqual(probe.num_header_cols, 27)
+        self.assertEqual(probe.num_data_cols, 27)
+        self.assertEqual(probe.header_cols[0], ('TIMESTAMP', 'TS'))
+        self.assertEqual(probe.units[:3], ['TS', 'RN', 'mV'])
+        self.assertAlmostEqual(probe.estimated_records / 8640, 1, delta=0.1)
+        probe = DataFileProbe(filepath=filepath, data_skiprows=[], data_headerrows=[0, 1], compression='zip',
+                              probe_kb=10000)
+        self.assertTrue(probe.complete)
+        self.assertEqual(probe.estimated_records, 8640)
+        # Leading directory entry, size of the data member is used
+        with zipfile.ZipFile(filepath) as archive:
+            content = archive.read(archive.namelist()[0])
+        with tempfile.TemporaryDirectory() as tempdir:
+            dirzip = Path(tempdir) / 'withdir.zip'
+            with zipfile.ZipFile(dirzip, 'w') as archive:
+                archive.writestr('data/', '')
+                archive.writestr('data/file.csv', content)
+            probe = DataFileProbe(filepath=dirzip, data_skiprows=[], data_headerrows=[0, 1], compression='zip')
+            self.assertEqual(probe.uncompressed_size, len(content))
+            self.assertEqual(probe.header_cols[0], ('TIMESTAMP', 'TS'))
+            self.assertAlmostEqual(probe.estimated_records / 8640, 1, delta=0.1)
+
+    def test_prefetch_multimember_zip(self):
+        """ZIP file with multiple members gives the same data as single-member ZIP files"""
+        filepath = Path(ed.DIR_PATH) / 'CH-Dav_BM_20230328_L02_F03.zip'
+        with zipfile.ZipFile(filepath) as archive:
+            lines = archive.read(archive.namelist()[0]).decode('utf-8').splitlines(keepends=True)
+        header, records = lines[:2], lines[2:]
+        half = len(records) // 2
+        with tempfile.TemporaryDirectory() as tempdir:
+            single_files = []
+            for ix, part in enumerate([records[:half], records[half:]]):
+                single_files.append(Path(tempdir) / f'part{ix}.zip')
+                with zipfile.ZipFile(single_files[-1], 'w') as archive:
+                    archive.writestr(f'part{ix}.csv', ''.join(header + part))
+            multi_file = Path(tempdir) / 'multi.zip'
+            with zipfile.ZipFile(multi_file, 'w') as archive:
+                archive.writestr('part0.csv', ''.join(header + records[:half]))
+                archive.writestr('part1.csv', ''.join(header + records[half:]))
+                archive.writestr('readme.txt', 'not data')
+            expected = MultiDataFileReader(filepaths=single_files, filetype='ICOS-H2R-CSVZIP-10S')
+            prefetched = MultiDataFileReader(filepaths=single_files, filetype='ICOS-H2R-CSVZIP-10S', prefetch=2)
+            multi = MultiDataFileReader(filepaths=[multi_file], filetype='ICOS-H2R-CSVZIP-10S', prefetch=1)
+            assert_frame_equal(prefetched.data_df, expected.data_df)
+            assert_frame_equal(multi.data_df, expected.data_df)
+            self.assertEqual(len(multi.data_df), len(records))
+
+    def test_parsed_file_cache(self):
+        """Data loaded from cache are the same as parsed data"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        with tempfile.TemporaryDirectory() as cachedir:
+            cache = ParsedFileCache(cachedir=cachedir)
+            parsed = ReadFileType(filepath=filepath, filetype='DIIVE-CSV-30MIN', cache=cache)
+            self.assertIsNotNone(cache.get(filepath=filepath, filetypeconfig=parsed.filetypeconfig,
+                                           data_nrows=None, output_middle_timestamp=True))
+            cached_df, cached_meta = ReadFileType(filepath=filepath, filetype='DIIVE-CSV-30MIN',
+                                                  cache=cache).get_filedata()
+            assert_frame_equal(parsed.data_df, cached_df)
+            assert_frame_equal(parsed.metadata_df, cached_meta)
+            self.assertEqual(parsed.data_df.index.freq, cached_df.index.freq)
+            cache.invalidate(filepath=filepath)
+            self.assertEqual(cache.size_mb, 0)
+
+            # Entries with other read options are kept, entries of a previous file state are removed
+            copied = Path(cachedir) / 'copy' / filepath.name
+            copied.parent.mkdir()
+            copied.write_bytes(filepath.read_bytes())
+            ReadFileType(filepath=copied, filetype='DIIVE-CSV-30MIN', cache=cache)
+            ReadFileType(filepath=copied, filetype='DIIVE-CSV-30MIN', cache=cache, usecols=['Tair_f'])
+            self.assertEqual(len(list(Path(cachedir).glob('*.parquet'))), 2)
+            size_mb = cache.size_mb
+            (Path(cachedir) / 'partial_entry.tmp').write_bytes(b'x' * 1024 ** 2)
+            self.assertEqual(cache.size_mb, size_mb)
+            os.utime(copied, ns=(copied.stat().st_atime_ns, copied.stat().st_mtime_ns + 10 ** 9))
+            ReadFileType(filepath=copied, filetype='DIIVE-CSV-30MIN', cache=cache)
+            self.assertEqual(len(list(Path(cachedir).glob('*.parquet'))), 1)
+
+    def test_parsed_file_cache_parallel(self):
+        """Concurrent readers can share the cache, failing to store an entry only gives a warning"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        lines = filepath.read_text().splitlines(keepends=True)
+        with tempfile.TemporaryDirectory() as outdir, tempfile.TemporaryDirectory() as cachedir:
+            filepaths = []
+            for i, start in enumerate(range(1, len(lines), 300)):
+                filepaths.append(Path(outdir) / f'eddypro_{i}_fluxnet.csv')
+                filepaths[-1].write_text(''.join(lines[0:1] + lines[start:start + 300]))
+            filetype = 'EDDYPRO-FLUXNET-30MIN'
+            expected = MultiDataFileReader(filepaths=filepaths, filetype=filetype).data_df
+            # Small cache, entries are evicted while other workers read and write
+            cache = ParsedFileCache(cachedir=cachedir, max_size_mb=2)
+            for _ in range(2):
+                data_df = MultiDataFileReader(filepaths=filepaths, filetype=filetype, n_jobs=4, pool='thread',
+                                              cache=cache).data_df
+                assert_frame_equal(data_df, expected)
+            self.assertEqual(list(Path(cachedir).glob('*.tmp')), [])
+
+            # Column that cannot be stored as Parquet
+            df = DataFrame(index=expected.index[0:2], data={'a': [1, 'x']})
+            cache.put(filepath=filepaths[0], filetypeconfig={}, data_df=df, metadata_df=DataFrame())
+            self.assertIsNone(cache.get(filepath=filepaths[0], filetypeconfig={}))
+            self.assertEqual(list(Path(cachedir).glob('*.tmp')), [])
+
+    def test_merge_frames_first_valid(self):
+        """One-pass merge gives the same result as chained combine_first"""
+        index = pd.date_range('2022-07-01 00:30', periods=10, freq='30T', name='TIMESTAMP_END')
+        df1 = DataFrame(index=index[0:6], data={'a': [1, np.nan, 3, 4, 5, 6], 'b': np.arange(6.)})
+        df2 = DataFrame(index=index[4:10], data={'a': np.arange(10., 16.), 'c': np.arange(6.)})
+        df3 = DataFrame(index=index[1:3], data={'a': [20., 21.], 'b': [np.nan, 22.]})
+        expected = df1.combine_first(df2).combine_first(df3)
+        merged = merge_frames_first_valid(frames=[df1, df2, df3])
+        assert_frame_equal(expected, merged, check_freq=False)
+        # Records with missing timestamp are kept
+        df4 = DataFrame(index=pd.DatetimeIndex([index[0], pd.NaT], name='TIMESTAMP_END'), data={'a': [30., 31.]})
+        expected = df1.combine_first(df4).combine_first(df2)
+        merged = merge_frames_first_valid(frames=[df1, df4, df2])
+        assert_frame_equal(expected, merged, check_freq=False)
+        self.assertEqual(merged.index.isna().sum(), 1)
+
+    def test_multi_reader_n_jobs(self):
+        """Invalid number of jobs is rejected"""
+        filepath = Path(
+            ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        for n_jobs in [0, -2, 1.5]:
+            with self.assertRaises(ValueError):
+                MultiDataFileReader(filepaths=[filepath], filetype='EDDYPRO-FLUXNET-30MIN', n_jobs=n_jobs)
+
     def test_exampledata_pickle(self):
         """Load pickled file"""
         data_df = ed.load_exampledata_pickle()
@@ -41,6 +263,310 @@ class TestLoadFiletypes(unittest.TestCase):
         self.assertEqual(len(data_df.columns), 49)
         self.assertEqual(len(data_df), 175296)
 
+    def test_feather(self):
+        """Save and load Arrow IPC file with multi-level column headers"""
+        data_df = ed.load_exampledata_parquet()
+        data_df = data_df[['NEE_CUT_REF_orig', 'Tair_f', 'VPD_f']]
+        data_df.columns = pd.MultiIndex.from_tuples([('NEE_CUT_REF_orig', 'umol m-2 s-1'),
+                                                     ('Tair_f', 'degC'), ('VPD_f', 'hPa')])
+        with tempfile.TemporaryDirectory() as outdir:
+            filepath = save_feather(filename='data', data=data_df, outpath=outdir)
+            loaded_df = load_feather(filepath=filepath)
+            assert_frame_equal(loaded_df, data_df)
+            self.assertEqual(loaded_df.index.freq, data_df.index.freq)
+            arrow_df = load_feather(filepath=filepath, columns=[('Tair_f', 'degC')], dtype_backend='pyarrow')
+            self.assertIsInstance(arrow_df.dtypes.iloc[0], pd.ArrowDtype)
+            assert_frame_equal(arrow_df.astype('float64'), data_df[[('Tair_f', 'degC')]])
+            del arrow_df  # Release memory-mapped file
+            # File is closed after loading and can be deleted while the data exist
+            loaded_df = load_feather(filepath=filepath)
+            if os.path.isdir('/proc/self/fd'):
+                openfiles = [os.path.realpath(f'/proc/self/fd/{fd}') for fd in os.listdir('/proc/self/fd')]
+                self.assertNotIn(os.path.realpath(filepath), openfiles)
+            os.remove(filepath)
+            assert_frame_equal(loaded_df, data_df)
+
+    def test_partitioned_dataset(self):
+        """Save partitioned dataset and load time window with selected columns"""
+        data_df = ed.load_exampledata_parquet()
+        data_df = data_df[['NEE_CUT_REF_orig', 'Tair_f', 'VPD_f']]
+        for fileformat in ['parquet', 'arrow']:
+            with tempfile.TemporaryDirectory() as outdir:
+                save_dataset(data=data_df, outpath=outdir, fileformat=fileformat)
+                loaded_df = load_dataset(path=outdir, fileformat=fileformat)
+                assert_frame_equal(loaded_df, data_df)
+                window_df = load_dataset(path=outdir, start='2016-06-10', end='2017-02-03 12:00',
+                                         columns=['Tair_f'], fileformat=fileformat)
+                assert_frame_equal(window_df, data_df.loc['2016-06-10':'2017-02-03 12:00', ['Tair_f']])
+        # Data columns named like the partitions are kept, unnamed index stays unnamed
+        other_df = data_df.iloc[:1000].rename_axis(None)
+        other_df = other_df.assign(year=1.5, month='x')
+        with tempfile.TemporaryDirectory() as outdir:
+            save_dataset(data=other_df, outpath=outdir)
+            loaded_df = load_dataset(path=outdir)
+            assert_frame_equal(loaded_df, other_df)
+            window_df = load_dataset(path=outdir, start=other_df.index[10], columns=['year'])
+            assert_frame_equal(window_df, other_df.iloc[10:][['year']])
+            with self.assertRaises(ValueError):
+                save_dataset(data=other_df.assign(partition_year=1), outpath=outdir)
+
+    def test_split_formats(self):
+        """Splits saved in binary formats keep index, data types and missing values"""
+        index = pd.date_range('2023-08-28 13:00', periods=100, freq='50L', name='TIMESTAMP')
+        split_df = DataFrame(index=index, data={'U': np.random.rand(100), 'W': np.random.rand(100)})
+        split_df.iloc[5:10, 0] = np.nan
+        with tempfile.TemporaryDirectory() as outdir:
+            for fileformat in ['parquet', 'feather', 'npy']:
+                filepath = Path(outdir) / f'split.{fileformat}'
+                save_split(split_df=split_df, filepath=filepath)
+                assert_frame_equal(load_split(filepath=filepath), split_df, check_freq=False)
+            filepath = Path(outdir) / 'split.csv'
+            save_split(split_df=split_df.fillna(-9999), filepath=filepath)
+            assert_frame_equal(load_split(filepath=filepath), split_df, check_freq=False)
+
+    def test_filesplitter_formats(self):
+        """Splits of a file in all formats contain the same data"""
+        with tempfile.TemporaryDirectory() as outdir:
+            filepath = _write_highres_file(outdir=Path(outdir))
+            splits = {}
+            for split_format in ['csv', 'parquet', 'feather', 'npy']:
+                splitdir = Path(outdir) / split_format
+                splitdir.mkdir()
+                fs = FileSplitter(filepath=filepath, filename_pattern='CH-TEST_*.csv.gz',
+                                  filename_date_format='CH-TEST_%Y%m%d%H%M.csv.gz', filetype='ETH-SONICREAD-BICO-CSVGZ-20HZ',
+                                  data_nominal_res=0.05, data_split_duration='30s', expected_duration=60,
+                                  file_name=filepath.name, file_start='2023-08-28 13:00', outdir=splitdir,
+                                  split_format=split_format)
+                fs.run()
+                splitfiles = sorted(splitdir.glob('*'))
+                self.assertEqual(len(splitfiles), 2)
+                splits[split_format] = [load_split(filepath=f) for f in splitfiles]
+            for split_format in ['parquet', 'feather', 'npy']:
+                for split_df, csv_split_df in zip(splits[split_format], splits['csv']):
+                    self.assertNotIn('index', split_df.columns)
+                    assert_frame_equal(split_df, csv_split_df.drop(columns='index'), check_names=False)
+            self.assertEqual(len(splits['npy'][0]), 600)
+            self.assertTrue(splits['npy'][0].iloc[:, 0].isnull().any())
+
+            # Strings cannot be saved as .npy
+            split_df = splits['parquet'][0].assign(FLAG='a')
+            with self.assertRaises(ValueError):
+                save_split(split_df=split_df, filepath=Path(outdir) / 'split.npy')
+
+    def test_filesplitter_multi(self):
+        """Files are split in parallel with the same results, failing files stop the run or are skipped"""
+        with tempfile.TemporaryDirectory() as outdir:
+            indir = Path(outdir) / 'in'
+            indir.mkdir()
+            for start in ['202308281300', '202308281301']:
+                _write_highres_file(outdir=indir, start=start)
+            (indir / 'CH-TEST_202308281302.csv.gz').write_bytes(b'not a gzip file')
+            kwargs = dict(searchdirs=[str(indir)], filename_pattern='CH-TEST_*.csv.gz',
+                          filename_date_format='CH-TEST_%Y%m%d%H%M.csv.gz', file_generation_freq='1min',
+                          data_nominal_res=0.05, files_split_how_many=None, filetype='ETH-SONICREAD-BICO-CSVGZ-20HZ',
+                          data_split_duration='30s', split_format='parquet')
+            with self.assertRaises(gzip.BadGzipFile):
+                FileSplitterMulti(outdir=Path(outdir) / 'serial', **kwargs).run()
+            with self.assertRaises(gzip.BadGzipFile):
+                FileSplitterMulti(outdir=Path(outdir) / 'parallel', n_jobs=2, **kwargs).run()
+
+            splits = {}
+            for n_jobs in [1, 2]:
+                fsm = FileSplitterMulti(outdir=Path(outdir) / f'skip{n_jobs}', n_jobs=n_jobs, skip_failed=True,
+                                        **kwargs)
+                fsm.run()
+                self.assertEqual(list(fsm.failed_files.keys()), ['CH-TEST_202308281302.csv.gz'])
+                splitfiles = sorted((Path(outdir) / f'skip{n_jobs}' / 'splits').glob('*.parquet'))
+                self.assertEqual(len(splitfiles), 4)
+                splits[n_jobs] = [load_split(filepath=f) for f in splitfiles]
+            for split_df, parallel_split_df in zip(splits[1], splits[2]):
+                assert_frame_equal(split_df, parallel_split_df)
+
+    def test_filesplitter_multi_n_jobs(self):
+        """Invalid number of jobs is rejected"""
+        for n_jobs in [0, -2, 1.5]:
+            with self.assertRaises(ValueError):
+                FileSplitterMulti(outdir='splits', searchdirs=['in'], filename_pattern='CH-TEST_*.csv.gz',
+                                  filename_date_format='CH-TEST_%Y%m%d%H%M.csv.gz', file_generation_freq='1min',
+                                  data_nominal_res=0.05, files_split_how_many=None,
+                                  filetype='ETH-SONICREAD-BICO-CSVGZ-20HZ', data_split_duration='30s',
+                                  n_jobs=n_jobs)
+
+    def test_split_column_stats(self):
+        """Stats of numeric columns in split"""
+        split_df = DataFrame({'U': [1., np.nan, 3., 4.], 'W': [0., 0., 0., 2.], 'FLAG': ['a', 'b', 'c', 'd']})
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            stats = calc_split_column_stats(split_df=split_df)
+        self.assertEqual(len(stats), 10)
+        self.assertEqual(list(stats)[:5], ['U_n_vals', 'U_median', 'U_min', 'U_max', 'U_nan_fraction'])
+        self.assertEqual(stats['U_n_vals'], 3)
+        self.assertEqual(stats['U_median'], 3)
+        self.assertEqual(stats['U_nan_fraction'], 0.25)
+        self.assertEqual(stats['W_min'], 0)
+        self.assertEqual(stats['W_max'], 2)
+
+    def test_file_detector(self):
+        """Expected, missing and unexpected files, restricted to number of available files"""
+        starts = ['202308281300', '202308281400', '202308281600', '202308281610', '202308281700']
+        with tempfile.TemporaryDirectory() as indir:
+            filelist = []
+            for start in starts:
+                filepath = Path(indir) / f'CH-DAS_{start}.csv.gz'
+                filepath.write_bytes(b'x' * 10)
+                filelist.append(filepath)
+            fd = FileDetector(filelist=filelist, file_date_format='CH-DAS_%Y%m%d%H%M.csv.gz',
+                              file_generation_res='1h', data_res=0.05, files_how_many=4)
+            fd.run()
+            files_df = fd.get_results()
+        self.assertEqual(len(files_df), 5)
+        self.assertEqual(files_df['file_available'].tolist(), [1, 1, 0, 1, 1])
+        self.assertTrue(pd.isnull(files_df.loc['2023-08-28 16:10', 'expected_file']))
+        self.assertEqual(files_df['filesize'].sum(), 40)
+        self.assertEqual(files_df.loc['2023-08-28 16:00', 'expected_duration'], 600)
+        self.assertNotIn('estimated_records', files_df.columns)
+
+        # Records are only estimated for available files within the limit
+        with tempfile.TemporaryDirectory() as indir:
+            filelist = [_write_highres_file(outdir=Path(indir), n_records=100, start=s) for s in starts]
+            fd = FileDetector(filelist=filelist, file_date_format='CH-TEST_%Y%m%d%H%M.csv.gz',
+                              file_generation_res='1h', data_res=0.05, files_how_many=2,
+                              filetype='ETH-SONICREAD-BICO-CSVGZ-20HZ')
+            with mock.patch.object(FileDetector, '_estimate_records', return_value=100) as estimate:
+                fd.run()
+            files_df = fd.get_results()
+        self.assertEqual(estimate.call_count, 2)
+        self.assertEqual(files_df['estimated_records'].tolist(), [100, 100])
+
+    def test_file_manifest(self):
+        """Incremental search returns only new and changed files"""
+        with tempfile.TemporaryDirectory() as indir:
+            indir = Path(indir)
+            (indir / 'sub').mkdir()
+            for name in ['a.csv', 'b.csv', 'sub/c.csv', 'd.txt']:
+                (indir / name).write_text('1')
+            manifest = FileManifest(manifestfile=indir / 'manifest.sqlite')
+            self.assertEqual(search_files(searchdirs=str(indir), pattern='*.csv', manifest=manifest),
+                             search_files(searchdirs=str(indir), pattern='*.csv'))
+            self.assertEqual(len(manifest), 3)
+            self.assertEqual(search_files(searchdirs=str(indir), pattern='*.csv', manifest=manifest), [])
+            (indir / 'b.csv').write_text('12')
+            (indir / 'sub' / 'e.csv').write_text('1')
+            newfiles = search_files(searchdirs=str(indir), pattern='*.csv', manifest=manifest, update_manifest=False)
+            self.assertEqual(newfiles, [indir / 'b.csv', indir / 'sub' / 'e.csv'])
+            self.assertEqual(len(manifest), 3)
+            manifest.add(filepaths=newfiles)
+            self.assertEqual(len(manifest), 4)
+
+            # Symbolic link loop is not followed
+            try:
+                os.symlink(indir, indir / 'sub' / 'loop', target_is_directory=True)
+            except OSError:
+                pass  # No permission to create symbolic links
+            self.assertEqual(search_files(searchdirs=str(indir), pattern='*.csv', manifest=manifest), [])
+
+    def test_file_manifest_processing_chain(self):
+        """Files are added to the manifest after they were loaded, filtered files are not added"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        with tempfile.TemporaryDirectory() as indir:
+            indir = Path(indir)
+            (indir / 'eddypro_1_fluxnet_2022.csv').write_text(filepath.read_text())
+            (indir / 'other.csv').write_text('1')
+            manifest = FileManifest(manifestfile=indir / 'manifest.sqlite')
+            ep = LoadEddyProOutputFiles(sourcedir=str(indir), filetype='EDDYPRO-FLUXNET-30MIN')
+            ep.searchfiles(manifest=manifest)
+            self.assertEqual(len(manifest), 0)
+            ep.loadfiles()
+            self.assertEqual(manifest.files_df.index.tolist(), [str(indir / 'eddypro_1_fluxnet_2022.csv')])
+            ep.searchfiles(manifest=manifest)
+            self.assertEqual(ep.filepaths, [])
+
+    def test_append_files(self):
+        """Merging new files into loaded data gives the same result as loading all files"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        lines = filepath.read_text().splitlines(keepends=True)
+        with tempfile.TemporaryDirectory() as outdir:
+            file1 = Path(outdir) / 'eddypro_1_fluxnet.csv'
+            file2 = Path(outdir) / 'eddypro_2_fluxnet.csv'
+            file1.write_text(''.join(lines[0:900]))
+            # Overlaps with first file, with different values in the overlap, values of the first file are kept
+            overlap = [','.join(line.split(',')[0:5] + ['999.0'] + line.split(',')[6:]) for line in lines[850:900]]
+            file2.write_text(''.join(lines[0:1] + overlap + lines[900:]))
+            filetype = 'EDDYPRO-FLUXNET-30MIN'
+            all_df = MultiDataFileReader(filepaths=[file1, file2], filetype=filetype).data_df
+            data_df = MultiDataFileReader(filepaths=[file1], filetype=filetype).data_df
+            data_df, changed_ranges = MultiDataFileReader(filepaths=[file2], filetype=filetype).merge_into(data_df)
+            assert_frame_equal(data_df, all_df)
+            self.assertNotIn(999, data_df['SW_IN_POT'].to_numpy())
+            self.assertEqual(changed_ranges, [(all_df.index[899], all_df.index[-1])])
+
+            dataset = Path(outdir) / 'dataset'
+            append_to_dataset(path=dataset, filepaths=[file1], filetype=filetype)
+            _, changed_ranges = append_to_dataset(path=dataset, filepaths=[file2], filetype=filetype)
+            self.assertEqual(changed_ranges, [(all_df.index[899], all_df.index[-1])])
+            assert_frame_equal(load_dataset(path=dataset), all_df)
+
+    def test_filetype_registry(self):
+        """Filetype settings are parsed once and again after the file was modified"""
+        registry = FiletypeRegistry()
+        parsed = registry.get(filetype='EDDYPRO-FLUXNET-30MIN')
+        self.assertIs(registry.get(filetype='EDDYPRO-FLUXNET-30MIN'), parsed)
+        config = registry.get_config(filetype='EDDYPRO-FLUXNET-30MIN')
+        config['DATA']['FREQUENCY'] = '1min'
+        self.assertEqual(registry.get_config(filetype='EDDYPRO-FLUXNET-30MIN')['DATA']['FREQUENCY'], '30T')
+        with tempfile.TemporaryDirectory() as customdir:
+            customfile = Path(customdir) / 'MY-EDDYPRO-FLUXNET.yml'
+            customfile.write_bytes(parsed.filepath.read_bytes())
+            registry.add_dir(customdir)
+            custom = registry.get(filetype='MY-EDDYPRO-FLUXNET')
+            self.assertEqual(custom.config, parsed.config)
+            customfile.write_text(customfile.read_text().replace('FREQUENCY: "30T"', 'FREQUENCY: "1T"'))
+            os.utime(customfile, ns=(custom.mtime_ns + 10 ** 9, custom.mtime_ns + 10 ** 9))
+            self.assertEqual(registry.get_config(filetype='MY-EDDYPRO-FLUXNET')['DATA']['FREQUENCY'], '1T')
+
+    def test_compact_dtypes(self):
+        """Compact data types need less memory, flags and QCF give the same results"""
+        filepath = Path(ed.__file__).parent / \
+                   'exampledata_CH-AWS_2022.07_FR-20220127-164245_eddypro_fluxnet_2022-01-28T112538_adv.csv'
+        data_df, _ = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN').get_filedata()
+        data_df['FC_SSITC_TEST'] = data_df['FC_SSITC_TEST'].fillna(2)
+        data_df['SITE'] = 'CH-AWS'
+        compact_df = compact_dtypes(df=data_df)
+        self.assertEqual(compact_df['FC'].dtype, np.float32)
+        self.assertEqual(compact_df['FC_SSITC_TEST'].dtype, np.int8)
+        self.assertEqual(compact_df['SITE'].dtype, 'category')
+        self.assertLess(compact_df.memory_usage(deep=True).sum(), data_df.memory_usage(deep=True).sum() / 1.5)
+        numeric = data_df.columns != 'SITE'
+        np.testing.assert_allclose(compact_df.loc[:, numeric].astype(float), data_df.loc[:, numeric], rtol=1e-6)
+
+        reader_df, _ = ReadFileType(filepath=filepath, filetype='EDDYPRO-FLUXNET-30MIN',
+                                    dtype_policy='compact').get_filedata()
+        self.assertEqual(reader_df['FC'].dtype, np.float32)
+
+        results = []
+        for df in [data_df, compact_df]:
+            zscore = zScore(series=df['FC'], thres_zscore=3)
+            zscore.calc(repeat=True)
+            flags_df = pd.concat([df['FC'], df['FC_SSITC_TEST'].rename('FLAG_L2_FC_SSITC_TEST'),
+                                  zscore.overall_flag], axis=1)
+            qcf = FlagQCF(df=flags_df, series=df['FC'])
+            qcf.calculate()
+            results.append(qcf.get().astype(float))
+        assert_frame_equal(results[1], results[0], rtol=1e-6)
+
+
+def _write_highres_file(outdir: Path, n_records: int = 1200, start: str = '202308281300') -> Path:
+    """Write gzipped 20 Hz file of filetype ETH-SONICREAD-BICO-CSVGZ-20HZ without timestamp"""
+    rng = np.random.default_rng(42)
+    data_df = DataFrame({'U': rng.normal(size=n_records), 'V': rng.normal(size=n_records),
+                         'W': rng.normal(size=n_records)}).round(4)
+    data_df.iloc[10:20, 0] = -9999
+    filepath = outdir / f'CH-TEST_{start}.csv.gz'
+    header = "U,V,W\nm s-1,m s-1,m s-1\n-,-,-\n"
+    with gzip.open(filepath, 'wt') as f:
+        f.write(header + data_df.to_csv(header=False, index=False))
+    return filepath
+
 
 if __name__ == '__main__':
     unittest.main()
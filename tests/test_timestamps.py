@@ -1,7 +1,15 @@
+import gc
+import io
 import unittest
+from unittest import mock
+
+import pandas as pd
+from pandas import Series
 
 import diive.configs.exampledata as ed
-from diive.core.times.times import DetectFrequency
+import diive.core.times.times as times
+from diive.core.times.times import DetectFrequency, TimestampSanitizer, detect_freq_groups, parse_timestamp_columns, \
+    include_timestamp_as_cols, timestamp_features
 
 
 class TestTimestamps(unittest.TestCase):
@@ -12,6 +20,124 @@ class TestTimestamps(unittest.TestCase):
         freq = f.get()
         self.assertEqual(freq, '30T')  # add assertion here
 
+    def test_detect_freq_confidence(self):
+        regular = pd.date_range('2020-01-01', periods=3000, freq='10T')
+        f = DetectFrequency(index=regular)
+        self.assertEqual((f.get(), f.confidence), ('10T', 'MAXIMUM'))
+        gaps = regular.delete(range(100, 200))  # Most frequent timestep
+        f = DetectFrequency(index=gaps)
+        self.assertEqual((f.get(), f.confidence), ('10T', 'HIGH'))
+        irregular = regular[:100].append(pd.date_range('2020-01-02', periods=300, freq='7T')).append(regular[-100:])
+        f = DetectFrequency(index=irregular)
+        self.assertEqual((f.get(), f.confidence), ('10T', 'MEDIUM'))
+        with mock.patch('pandas.infer_freq', side_effect=AssertionError('not memoized')):
+            f = DetectFrequency(index=irregular)  # Memoized per index
+        self.assertEqual((f.get(), f.confidence), ('10T', 'MEDIUM'))
+
+    def test_timestamp_sanitizer(self):
+        index = pd.date_range('2022-07-01 00:30', periods=500, freq='30T', name='TIMESTAMP_END')
+        series = Series(range(500), index=index, dtype=float, name='x')
+        unsorted = series.iloc[::-1]
+        unsorted.index.freq = None
+        sanitized = TimestampSanitizer(data=unsorted).get()
+        self.assertEqual(sanitized.index.name, 'TIMESTAMP_MIDDLE')
+        self.assertEqual(sanitized.index.freq, '30T')
+        self.assertEqual(unsorted.index.name, 'TIMESTAMP_END')  # Input not changed
+
+        # Clean timestamp, steps are skipped
+        with mock.patch('diive.core.times.times.DetectFrequency', side_effect=AssertionError('not skipped')):
+            clean = TimestampSanitizer(data=series).get()
+            inplace = TimestampSanitizer(data=series.copy(), inplace=True).get()
+        pd.testing.assert_series_equal(clean, sanitized)
+        pd.testing.assert_series_equal(inplace, sanitized)
+        self.assertEqual(series.index.name, 'TIMESTAMP_END')
+
+    def test_detect_freq_groups(self):
+        tenmin = pd.date_range('2020-10-01 00:00', periods=100, freq='10T')
+        transition = pd.DatetimeIndex(['2020-10-01 16:30:07', '2020-10-01 16:30:36'])
+        onemin = pd.date_range('2020-10-01 16:31', periods=200, freq='1T')
+        index = tenmin.append(transition).append(onemin).delete(50)
+        groups, segments = detect_freq_groups(index=index, segments=True)
+        self.assertEqual(groups.name, 'FREQ_AUTO_SEC')
+        self.assertEqual(groups.iloc[0], 600)
+        self.assertTrue(groups.iloc[49:51].isnull().all())  # Gap from deleted record
+        self.assertEqual(groups.iloc[-1], 60)
+        self.assertEqual(groups.count(), 99 + 200 - 2)
+        self.assertEqual(segments['DELTA_SEC'].tolist(), [600, 1200, 600, 7, 29, 24, 60])
+        self.assertEqual(segments['START'].iloc[-1], onemin[0])
+        self.assertEqual(segments['END'].iloc[-1], onemin[-1])
+        self.assertEqual(segments['COUNT'].iloc[-1], 200)
+
+    def test_parse_timestamp_columns(self):
+        timestamps = pd.date_range('2020-02-28 23:00', periods=200, freq='30T')
+        expected = pd.DatetimeIndex(timestamps)
+
+        # Digits only, parsed as integers
+        digits = Series(timestamps.strftime('%Y%m%d%H%M').astype('int64'))
+        parsed = parse_timestamp_columns(columns=[digits], datetime_format='%Y%m%d%H%M')
+        pd.testing.assert_index_equal(parsed, expected)
+        digits = Series(timestamps.strftime('%Y%m%d%H%M%S').astype('int64'))
+        parsed = parse_timestamp_columns(columns=[digits], datetime_format='%Y%m%d%H%M%S')
+        pd.testing.assert_index_equal(parsed, expected)
+
+        # Date and time in separate columns
+        dates = Series(timestamps.strftime('%Y-%m-%d'))
+        times = Series(timestamps.strftime('%H:%M'))
+        parsed = parse_timestamp_columns(columns=[dates, times], datetime_format='%Y-%m-%d %H:%M')
+        pd.testing.assert_index_equal(parsed, expected)
+
+        # Invalid date (February 30) is not converted, same as in pd.read_csv
+        digits = Series([202002290000, 202002300000])
+        parsed = parse_timestamp_columns(columns=[digits], datetime_format='%Y%m%d%H%M')
+        self.assertEqual(parsed.to_list(), ['202002290000', '202002300000'])
+
+        # Missing timestamp, digits are parsed as floats, same result as in pd.read_csv
+        csv = "TIMESTAMP_END,TA\n202207010030,1\n-9999,2\n202207010130,3\n"
+        digits = pd.read_csv(io.StringIO(csv), na_values=[-9999])['TIMESTAMP_END']
+        self.assertEqual(digits.dtype, 'float64')
+        parsed = parse_timestamp_columns(columns=[digits], datetime_format='%Y%m%d%H%M')
+        expected = pd.read_csv(io.StringIO(csv), na_values=[-9999], parse_dates=['TIMESTAMP_END'],
+                               date_format='%Y%m%d%H%M', index_col='TIMESTAMP_END').index
+        pd.testing.assert_index_equal(parsed, expected.rename(None))
+        self.assertTrue(parsed.isna()[1])
+
+    def test_timestamp_features(self):
+        """Timestamp features are the same as the datetime attributes of the timestamp"""
+        ix = pd.date_range('1968-12-20 00:15', periods=30000, freq='37min', name='TIMESTAMP_MIDDLE')
+        features = timestamp_features(index=ix)
+        self.assertIn(id(ix), times._TIMESTAMP_FEATURES)  # Memoized
+        pd.testing.assert_frame_equal(timestamp_features(index=ix), features)
+        self.assertEqual(features['.YEAR'].dtype, 'int16')
+        self.assertEqual(features['.HOUR'].dtype, 'int8')
+        self.assertEqual(features['.YEAR'].tolist(), ix.year.tolist())
+        self.assertEqual(features['.SEASON'].tolist(), (ix.month % 12 // 3).map({0: 4, 1: 1, 2: 2, 3: 3}).tolist())
+        self.assertEqual(features['.MONTH'].tolist(), ix.month.tolist())
+        self.assertEqual(features['.WEEK'].tolist(), ix.isocalendar().week.tolist())
+        self.assertEqual(features['.DOY'].tolist(), ix.dayofyear.tolist())
+        self.assertEqual(features['.HOUR'].tolist(), ix.hour.tolist())
+        self.assertEqual(features['.YEARDOY'].tolist(),
+                         (ix.year.astype(str) + ix.dayofyear.astype(str)).astype(int).tolist())
+        self.assertEqual(features['.YEARWEEK'].tolist(),
+                         (ix.year.astype(str) + ix.isocalendar().week.astype(str)).astype(int).tolist())
+
+        df = pd.DataFrame({'TA': range(len(ix))}, index=ix)
+        df = include_timestamp_as_cols(df=df, week=False)
+        self.assertEqual(df.columns.tolist(), ['TA', '.YEAR', '.SEASON', '.MONTH', '.DOY', '.HOUR',
+                                               '.YEARMONTH', '.YEARDOY'])
+        # Existing columns are replaced in place
+        df = pd.DataFrame({'.MONTH': 0, 'TA': range(len(ix))}, index=ix)
+        df = include_timestamp_as_cols(df=df, week=False)
+        self.assertEqual(df.columns.tolist(), ['.MONTH', 'TA', '.YEAR', '.SEASON', '.DOY', '.HOUR',
+                                               '.YEARMONTH', '.YEARDOY'])
+        self.assertEqual(df['.MONTH'].tolist(), ix.month.tolist())
+
+        # Memoized features are removed with their index
+        n_memoized = len(times._TIMESTAMP_FEATURES)
+        for _ in range(5):
+            timestamp_features(index=pd.date_range('2022-01-01', periods=100, freq='30min'))
+        gc.collect()
+        self.assertEqual(len(times._TIMESTAMP_FEATURES), n_memoized)
+
 
 if __name__ == '__main__':
     unittest.main()